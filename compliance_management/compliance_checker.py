@@ -1,13 +1,16 @@
 """Run compliance checks on the dataset."""
 
-from pathlib import Path
-
 from nsms.compliance import ComplianceChecker
-from nsms.data import load_logs
+from nsms.config import Config
+from nsms.data import load_batch
+from nsms.metrics import count_bits, count_nonzero
 
 
 if __name__ == "__main__":
-    checker = ComplianceChecker.load(Path("data/compliance_rules.json"))
-    records = load_logs(Path("data/sample_logs.csv"))
-    violations = sum(1 for record in records if checker.evaluate(record))
-    print(f"Compliance violations: {violations}")
+    config = Config.load()
+    checker = ComplianceChecker.load(config.compliance_rules_path)
+    batch = load_batch(config.data_path, start=config.window_start, end=config.window_end)
+    masks = checker.violation_masks(batch)
+    print(f"Compliance violations: {count_nonzero(masks)}")
+    for rule, count in zip(checker.rules, count_bits(masks, len(checker.rules))):
+        print(f"  {rule.rule_id}: {count}")
@@ -1,12 +1,12 @@
 """Preprocess log data for NSMS."""
 
-from pathlib import Path
-
-from nsms.data import load_logs
-from nsms.preprocessing import extract_features
+from nsms.config import Config
+from nsms.data import load_batch
+from nsms.preprocessing import extract_feature_matrix
 
 
 if __name__ == "__main__":
-    records = load_logs(Path("data/sample_logs.csv"))
-    features = extract_features(records)
+    config = Config.load()
+    batch = load_batch(config.data_path, start=config.window_start, end=config.window_end)
+    features = extract_feature_matrix(batch)
     print(f"Extracted {len(features)} feature vectors")
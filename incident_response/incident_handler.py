@@ -1,18 +1,20 @@
 """Local incident handler for NSMS runs."""
 
-from pathlib import Path
-
+from nsms.config import Config
+from nsms.data import load_batch
+from nsms.feature_store import load_features
 from nsms.incident import create_incident
 from nsms.model_io import load_model
-from nsms.preprocessing import extract_features
-from nsms.data import load_logs
 
 
 if __name__ == "__main__":
-    model = load_model(Path("models/anomaly_model.json"))
-    records = load_logs(Path("data/sample_logs.csv"))
-    features = extract_features(records)
-    anomalies = model.predict(features)
+    config = Config.load()
+    model = load_model(config.model_path)
+    batch = None
+    if model.needs_batch:
+        batch = load_batch(config.data_path, start=config.window_start, end=config.window_end)
+    features = load_features(config, batch, names=model.required_features)
+    anomalies = model.predict(features, batch)
     for idx, is_anomaly in enumerate(anomalies):
         if is_anomaly:
             incident = create_incident(
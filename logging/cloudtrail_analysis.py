@@ -1,11 +1,14 @@
 """Simulated CloudTrail analysis for NSMS."""
 
-from pathlib import Path
-
-from nsms.data import load_logs
+from nsms.config import Config
+from nsms.data import load_batch
 
 
 if __name__ == "__main__":
-    records = load_logs(Path("data/sample_logs.csv"))
-    failed = [record for record in records if record.status.lower() != "ok"]
-    print(f"Failed events: {len(failed)}")
+    config = Config.load()
+    batch = load_batch(config.data_path, start=config.window_start, end=config.window_end)
+    failed_codes = {
+        code for code, status in enumerate(batch.status.values) if status.lower() != "ok"
+    }
+    failed = sum(1 for code in batch.status.codes if code in failed_codes)
+    print(f"Failed events: {failed}")
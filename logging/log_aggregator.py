@@ -1,11 +1,11 @@
 """Aggregate logs for NSMS."""
 
-from pathlib import Path
-
-from nsms.data import load_logs, summarize_protocols
+from nsms.config import Config
+from nsms.data import load_batch, summarize_protocols
 
 
 if __name__ == "__main__":
-    records = load_logs(Path("data/sample_logs.csv"))
-    summary = summarize_protocols(records)
+    config = Config.load()
+    batch = load_batch(config.data_path, start=config.window_start, end=config.window_end)
+    summary = summarize_protocols(batch)
     print("Protocol summary:", summary)
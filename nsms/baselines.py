@@ -0,0 +1,519 @@
+"""Per-entity byte baselines stored in a compact, array-backed hash table.
+
+A single global byte mean makes a busy backup host look anomalous all day
+and hides a quiet account's unusual transfer. :class:`EntityBaselines` keeps
+a count, mean and M2 (Welford) of ``bytes_transferred`` for every value of
+the fields it tracks (``user``, ``source_ip``) and scores each row against
+the first of those entities with at least ``min_count`` training rows,
+falling back to the global baseline for rare entities.
+
+Statistics live in an :class:`EntityTable`: open addressing with linear
+probing over four flat arrays (64-bit key, count, mean, M2), 32 bytes per
+slot at a load factor of at most 0.7. Keys are the first 8 bytes of a
+BLAKE2b digest of the value, so the table never stores the strings
+themselves and its contents are stable across processes; a key collision
+between two entities (about one in 10**7 pairs at ten million entities)
+would merge their statistics. Keys are hashed once per distinct value of a
+batch through :meth:`Vocabulary.facts`, so lookups cost O(1) per distinct
+value and one array gather per row.
+
+:class:`SeasonalBaselines` does the same per hour of the week, so that
+03:00 on a Sunday is not held to the volume of 14:00 on a Tuesday: 168
+buckets indexed directly by each row's timestamp, and optionally one
+:class:`EntityTable` slot per (entity, hour) pair.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import math
+import sys
+from array import array
+from typing import Any, Dict, List, Sequence, Tuple
+
+from nsms.config import ENTITY_BASELINE_FIELDS
+from nsms.data import LogBatch, StringColumn
+from nsms.model_format import ModelFile, SectionWriter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; groups are then accumulated in dicts.
+    np = None
+
+
+DEFAULT_MIN_COUNT = 30
+MAX_LOAD_FACTOR = 0.7
+_TABLE_ARRAYS = (("keys", "Q"), ("counts", "q"), ("means", "d"), ("m2", "d"))
+HOURS_PER_WEEK = 168
+_MICROS_PER_HOUR = 3_600_000_000
+# 1970-01-01, the epoch, was a Thursday: hour 72 of its Monday-based week.
+_EPOCH_HOUR_OF_WEEK = 72
+# Odd 64-bit multiplier (2**64 / golden ratio) spreading entity keys apart
+# before the hour is added, so (entity, hour) keys stay distinct.
+_KEY_MULTIPLIER = 0x9E3779B97F4A7C15
+_KEY_MASK = (1 << 64) - 1
+
+
+def entity_key(value: str) -> int:
+    """Stable, non-zero 64-bit key of an entity value (0 marks an empty slot)."""
+
+    return (
+        int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+        or 1
+    )
+
+
+class EntityTable:
+    """Open-addressing hash table of per-key (count, mean, M2) statistics."""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        capacity = 1 << max(capacity - 1, 1).bit_length()
+        self.keys = array("Q", bytes(8 * capacity))
+        self.counts = array("q", bytes(8 * capacity))
+        self.means = array("d", bytes(8 * capacity))
+        self.m2 = array("d", bytes(8 * capacity))
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return len(self.keys)
+
+    def find(self, key: int) -> int:
+        """Return the slot holding ``key``, or -1."""
+
+        keys = self.keys
+        mask = len(keys) - 1
+        slot = key & mask
+        while True:
+            current = keys[slot]
+            if current == key:
+                return slot
+            if not current:
+                return -1
+            slot = (slot + 1) & mask
+
+    def lookup(self, key: int) -> Tuple[int, float, float] | None:
+        """Return ``(count, mean, std)`` for ``key``; std is 1.0 when zero."""
+
+        slot = self.find(key)
+        if slot < 0:
+            return None
+        count = self.counts[slot]
+        return count, self.means[slot], math.sqrt(self.m2[slot] / count) or 1.0
+
+    def add(self, key: int, count: int, mean: float, m2: float) -> None:
+        """Merge a group's ``(count, mean, M2)`` into ``key`` (Chan et al.)."""
+
+        if not count:
+            return
+        if self.size + 1 > MAX_LOAD_FACTOR * len(self.keys):
+            self._resize(2 * len(self.keys))
+        keys = self.keys
+        mask = len(keys) - 1
+        slot = key & mask
+        while keys[slot] and keys[slot] != key:
+            slot = (slot + 1) & mask
+        if not keys[slot]:
+            keys[slot] = key
+            self.counts[slot] = count
+            self.means[slot] = mean
+            self.m2[slot] = m2
+            self.size += 1
+            return
+        _merge_stats(self.counts, self.means, self.m2, slot, count, mean, m2)
+
+    def merge(self, other: "EntityTable") -> None:
+        for slot, key in enumerate(other.keys):
+            if key:
+                self.add(key, other.counts[slot], other.means[slot], other.m2[slot])
+
+    def as_dict(self, sections: SectionWriter | None = None) -> Dict[str, object]:
+        """Little-endian slot arrays, base64-encoded, so loading is a copy.
+
+        With ``sections`` the arrays are stored as sections of a binary
+        model file instead, and loading maps them without copying.
+        """
+
+        payload: Dict[str, object] = {"size": self.size}
+        for name, _ in _TABLE_ARRAYS:
+            values = getattr(self, name)
+            if sections is not None:
+                payload[name] = sections.add(values)
+                continue
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            payload[name] = base64.b64encode(values.tobytes()).decode("ascii")
+        return payload
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any], sections: ModelFile | None = None) -> "EntityTable":
+        """Rebuild a table; one read from ``sections`` is read-only and maps its slots."""
+
+        table = cls(1)
+        for name, typecode in _TABLE_ARRAYS:
+            if isinstance(payload[name], dict):
+                setattr(table, name, sections.section(payload[name]))
+                continue
+            values = array(typecode)
+            values.frombytes(base64.b64decode(payload[name]))
+            if sys.byteorder != "little":
+                values.byteswap()
+            setattr(table, name, values)
+        table.size = payload["size"]
+        return table
+
+    def _resize(self, capacity: int) -> None:
+        old = (self.keys, self.counts, self.means, self.m2)
+        self.__init__(capacity)
+        for slot, key in enumerate(old[0]):
+            if key:
+                self.add(key, old[1][slot], old[2][slot], old[3][slot])
+
+
+class EntityBaselines:
+    """Byte baselines per value of each of ``fields``, consulted in order."""
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        min_count: int = DEFAULT_MIN_COUNT,
+        tables: Dict[str, EntityTable] | None = None,
+    ) -> None:
+        unknown = [name for name in fields if name not in ENTITY_BASELINE_FIELDS]
+        if not fields or unknown:
+            raise ValueError(
+                f"entity baselines must use fields from {', '.join(ENTITY_BASELINE_FIELDS)}"
+            )
+        if min_count <= 0:
+            raise ValueError("min_count must be greater than 0")
+        self.fields = tuple(fields)
+        self.min_count = min_count
+        self.tables = (
+            tables if tables is not None else {name: EntityTable() for name in self.fields}
+        )
+
+    @property
+    def entities(self) -> int:
+        return sum(len(table) for table in self.tables.values())
+
+    def update(self, batch: LogBatch) -> None:
+        """Fold ``batch``'s byte counts into every field's table."""
+
+        for name in self.fields:
+            column: StringColumn = getattr(batch, name)
+            keys = column.facts("entity_key", entity_key)
+            table = self.tables[name]
+            for code, count, mean, m2 in _group_stats(column.codes, batch.bytes_transferred):
+                table.add(keys[code], count, mean, m2)
+
+    def merge(self, other: "EntityBaselines") -> None:
+        if other.fields != self.fields:
+            raise ValueError("Cannot merge entity baselines over different fields")
+        for name in self.fields:
+            self.tables[name].merge(other.tables[name])
+
+    def row_baselines(
+        self, batch: LogBatch, mean: float, std: float, is_ndarray: bool
+    ) -> Tuple[Any, Any]:
+        """Per-row byte mean and std: the first trusted entity's, else ``mean``/``std``.
+
+        Float64 ndarrays when ``is_ndarray``, ``array('d')`` otherwise.
+        """
+
+        means, stds, resolved = baseline_rows(len(batch), mean, std, is_ndarray)
+        self.fill(batch, means, stds, resolved, is_ndarray)
+        return means, stds
+
+    def fill(self, batch: LogBatch, means: Any, stds: Any, resolved: Any, is_ndarray: bool) -> None:
+        """Set the baseline of every unresolved row whose entity is trusted."""
+
+        for name in self.fields:
+            column: StringColumn = getattr(batch, name)
+            keys = column.facts("entity_key", entity_key)
+            table = self.tables[name]
+            trusted: Dict[int, Tuple[float, float]] = {}
+            for code in dict.fromkeys(column.codes):
+                stats = table.lookup(keys[code])
+                if stats is not None and stats[0] >= self.min_count:
+                    trusted[code] = stats[1:]
+            _fill_groups(column.codes, trusted, means, stds, resolved, is_ndarray)
+
+    def as_dict(self, sections: SectionWriter | None = None) -> Dict[str, object]:
+        return {
+            "fields": list(self.fields),
+            "min_count": self.min_count,
+            "tables": {name: table.as_dict(sections) for name, table in self.tables.items()},
+        }
+
+    @classmethod
+    def from_dict(
+        cls, payload: Dict[str, Any], sections: ModelFile | None = None
+    ) -> "EntityBaselines":
+        tables = {
+            name: EntityTable.from_dict(table, sections)
+            for name, table in payload["tables"].items()
+        }
+        return cls(payload["fields"], payload["min_count"], tables)
+
+
+class SeasonalBaselines:
+    """Hour-of-week byte baselines, optionally per value of one entity field.
+
+    Every row falls in one of 168 buckets (:func:`hour_of_week`), each
+    holding the count, mean and M2 of the bytes seen in that hour of the
+    week in three flat arrays. With ``entity`` (``user`` or ``source_ip``),
+    every (entity, hour) pair also gets a slot in an :class:`EntityTable`.
+    """
+
+    def __init__(
+        self,
+        entity: str | None = None,
+        min_count: int = DEFAULT_MIN_COUNT,
+        hours: Tuple[array, array, array] | None = None,
+        table: EntityTable | None = None,
+    ) -> None:
+        if entity is not None and entity not in ENTITY_BASELINE_FIELDS:
+            raise ValueError(
+                "seasonal baselines must be global or per one of "
+                f"{', '.join(ENTITY_BASELINE_FIELDS)}"
+            )
+        if min_count <= 0:
+            raise ValueError("min_count must be greater than 0")
+        self.entity = entity
+        self.min_count = min_count
+        if hours is None:
+            empty = bytes(8 * HOURS_PER_WEEK)
+            hours = (array("q", empty), array("d", empty), array("d", empty))
+        self.counts, self.means, self.m2 = hours
+        self.table = table if table is not None or entity is None else EntityTable()
+
+    def update(self, batch: LogBatch) -> None:
+        """Fold ``batch``'s byte counts into its hour (and entity-hour) buckets."""
+
+        hours = hour_of_week(batch.timestamps)
+        for hour, count, mean, m2 in _group_stats(hours, batch.bytes_transferred):
+            _merge_stats(self.counts, self.means, self.m2, hour, count, mean, m2)
+        if self.table is None:
+            return
+        column: StringColumn = getattr(batch, self.entity)
+        keys = column.facts("entity_key", entity_key)
+        pairs, rows = _pair_groups(column.codes, hours)
+        for group, count, mean, m2 in _group_stats(rows, batch.bytes_transferred):
+            code, hour = pairs[group]
+            self.table.add(seasonal_key(keys[code], hour), count, mean, m2)
+
+    def merge(self, other: "SeasonalBaselines") -> None:
+        if other.entity != self.entity:
+            raise ValueError("Cannot merge seasonal baselines over different entities")
+        for hour in range(HOURS_PER_WEEK):
+            _merge_stats(
+                self.counts,
+                self.means,
+                self.m2,
+                hour,
+                other.counts[hour],
+                other.means[hour],
+                other.m2[hour],
+            )
+        if self.table is not None:
+            self.table.merge(other.table)
+
+    def fill_entities(
+        self, batch: LogBatch, means: Any, stds: Any, resolved: Any, is_ndarray: bool
+    ) -> None:
+        """Set unresolved rows whose (entity, hour) pair is trusted."""
+
+        if self.table is None:
+            return
+        column: StringColumn = getattr(batch, self.entity)
+        keys = column.facts("entity_key", entity_key)
+        pairs, rows = _pair_groups(column.codes, hour_of_week(batch.timestamps))
+        trusted: Dict[int, Tuple[float, float]] = {}
+        for group, (code, hour) in enumerate(pairs):
+            stats = self.table.lookup(seasonal_key(keys[code], hour))
+            if stats is not None and stats[0] >= self.min_count:
+                trusted[group] = stats[1:]
+        _fill_groups(rows, trusted, means, stds, resolved, is_ndarray)
+
+    def fill_hours(
+        self, batch: LogBatch, means: Any, stds: Any, resolved: Any, is_ndarray: bool
+    ) -> None:
+        """Set unresolved rows whose hour-of-week bucket is trusted."""
+
+        trusted = {
+            hour: (self.means[hour], math.sqrt(self.m2[hour] / count) or 1.0)
+            for hour, count in enumerate(self.counts)
+            if count >= self.min_count
+        }
+        _fill_groups(hour_of_week(batch.timestamps), trusted, means, stds, resolved, is_ndarray)
+
+    def as_dict(self, sections: SectionWriter | None = None) -> Dict[str, object]:
+        return {
+            "entity": self.entity,
+            "min_count": self.min_count,
+            "counts": self.counts.tolist(),
+            "means": self.means.tolist(),
+            "m2": self.m2.tolist(),
+            "table": self.table.as_dict(sections) if self.table is not None else None,
+        }
+
+    @classmethod
+    def from_dict(
+        cls, payload: Dict[str, Any], sections: ModelFile | None = None
+    ) -> "SeasonalBaselines":
+        hours = (
+            array("q", payload["counts"]),
+            array("d", payload["means"]),
+            array("d", payload["m2"]),
+        )
+        table = (
+            EntityTable.from_dict(payload["table"], sections)
+            if payload["table"] is not None
+            else None
+        )
+        return cls(payload["entity"], payload["min_count"], hours, table)
+
+
+def hour_of_week(timestamps: Sequence[int]) -> Any:
+    """Hour of the week (0 is Monday 00:00 UTC) of each epoch-microsecond timestamp.
+
+    An int64 ndarray with NumPy, an ``array('q')`` otherwise.
+    """
+
+    if np is not None:
+        return (
+            np.asarray(timestamps, dtype=np.int64) // _MICROS_PER_HOUR + _EPOCH_HOUR_OF_WEEK
+        ) % HOURS_PER_WEEK
+    return array(
+        "q",
+        [
+            (value // _MICROS_PER_HOUR + _EPOCH_HOUR_OF_WEEK) % HOURS_PER_WEEK
+            for value in timestamps
+        ],
+    )
+
+
+def seasonal_key(key: int, hour: int) -> int:
+    """Non-zero table key of an entity's ``key`` in hour-of-week ``hour``."""
+
+    return (key * _KEY_MULTIPLIER + hour + 1) & _KEY_MASK or 1
+
+
+def baseline_rows(rows: int, mean: float, std: float, is_ndarray: bool) -> Tuple[Any, Any, Any]:
+    """Per-row ``(means, stds, resolved)`` all set to the global baseline."""
+
+    if is_ndarray:
+        return (
+            np.full(rows, mean, dtype=np.float64),
+            np.full(rows, std, dtype=np.float64),
+            np.zeros(rows, dtype=bool),
+        )
+    return array("d", [mean]) * rows, array("d", [std]) * rows, bytearray(rows)
+
+
+def _fill_groups(
+    codes: Sequence[int],
+    trusted: Dict[int, Tuple[float, float]],
+    means: Any,
+    stds: Any,
+    resolved: Any,
+    is_ndarray: bool,
+) -> None:
+    """Set unresolved rows whose group ``codes[row]`` has a ``trusted`` baseline."""
+
+    if not trusted:
+        return
+    if is_ndarray:
+        codes = np.asarray(codes)
+        size = max(trusted) + 1
+        code_means = np.zeros(size, dtype=np.float64)
+        code_stds = np.ones(size, dtype=np.float64)
+        code_trusted = np.zeros(size, dtype=bool)
+        for code, (code_mean, code_std) in trusted.items():
+            code_means[code], code_stds[code], code_trusted[code] = code_mean, code_std, True
+        clipped = np.minimum(codes, size - 1)
+        rows_trusted = code_trusted[clipped] & (codes < size) & ~resolved
+        means[rows_trusted] = code_means[clipped[rows_trusted]]
+        stds[rows_trusted] = code_stds[clipped[rows_trusted]]
+        resolved |= rows_trusted
+        return
+    for row, code in enumerate(codes):
+        if not resolved[row] and code in trusted:
+            means[row], stds[row] = trusted[code]
+            resolved[row] = 1
+
+
+def _pair_groups(codes: Sequence[int], hours: Sequence[int]) -> Tuple[List[Tuple[int, int]], Any]:
+    """Distinct ``(code, hour)`` pairs of the rows, and each row's index into them."""
+
+    if np is not None:
+        pairs = np.asarray(codes).astype(np.int64) * HOURS_PER_WEEK + np.asarray(hours)
+        uniques, rows = np.unique(pairs, return_inverse=True)
+        return [divmod(pair, HOURS_PER_WEEK) for pair in uniques.tolist()], rows.reshape(-1)
+    groups: Dict[Tuple[int, int], int] = {}
+    rows = array("q", [groups.setdefault(pair, len(groups)) for pair in zip(codes, hours)])
+    return list(groups), rows
+
+
+def _merge_stats(
+    counts: array, means: array, m2s: array, slot: int, count: int, mean: float, m2: float
+) -> None:
+    """Merge a group's ``(count, mean, M2)`` into ``slot`` of the arrays (Chan et al.)."""
+
+    if not count:
+        return
+    seen = counts[slot]
+    total = seen + count
+    delta = mean - means[slot]
+    means[slot] += delta * count / total
+    m2s[slot] += m2 + delta * delta * seen * count / total
+    counts[slot] = total
+
+
+def _group_stats(
+    codes: Sequence[int], byte_counts: Sequence[int]
+) -> List[Tuple[int, int, float, float]]:
+    """``(code, count, mean, M2)`` of ``byte_counts`` grouped by the non-negative ``codes``."""
+
+    if not len(codes):
+        return []
+    if np is not None:
+        codes = np.asarray(codes).astype(np.intp)
+        values = np.frombuffer(byte_counts, dtype=np.int64).astype(np.float64)
+        counts = np.bincount(codes)
+        present = np.flatnonzero(counts)
+        group_means = np.bincount(codes, weights=values) / np.maximum(counts, 1)
+        deviations = values - group_means[codes]
+        m2 = np.bincount(codes, weights=deviations * deviations)
+        return list(
+            zip(
+                present.tolist(),
+                counts[present].tolist(),
+                group_means[present].tolist(),
+                m2[present].tolist(),
+            )
+        )
+    groups: Dict[int, List[float]] = {}
+    for code, value in zip(codes, byte_counts):
+        group = groups.get(code)
+        if group is None:
+            groups[code] = [value]
+        else:
+            group.append(value)
+    result = []
+    for code, values in groups.items():
+        group_mean = math.fsum(values) / len(values)
+        result.append(
+            (
+                code,
+                len(values),
+                group_mean,
+                math.fsum((value - group_mean) ** 2 for value in values),
+            )
+        )
+    return result
@@ -0,0 +1,195 @@
+"""Columnar binary log format with zero-copy, memory-mapped reads.
+
+Layout of an ``.nsmscol`` file::
+
+    b"NSMSCOL1"             magic
+    uint32 (little endian)  length of the JSON header
+    JSON header             row count, byte order, column offsets, vocabularies
+    padding                 to an 8-byte boundary
+    column data             raw ``array`` bytes, each column 8-byte aligned
+
+Numeric columns (timestamps in epoch microseconds and byte counts) are stored
+as ``int64``; string columns as ``uint32`` codes into the vocabulary stored in
+the header. Reading maps the file and exposes each column as a ``memoryview``
+cast to its type, so no column data is copied or parsed.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator
+
+from nsms.compression import strip_compression_suffix
+from nsms.data import STRING_COLUMNS, LogBatch, StringColumn, iter_batches
+from nsms.logging_utils import get_logger
+
+
+logger = get_logger("binary_log")
+
+MAGIC = b"NSMSCOL1"
+FORMAT_VERSION = 1
+BINARY_SUFFIX = ".nsmscol"
+NUMERIC_COLUMNS = {"timestamps": "q", "bytes_transferred": "q"}
+CODE_TYPECODE = "I"
+ALIGNMENT = 8
+
+
+def is_binary_log(path: Path) -> bool:
+    """Return True when ``path`` starts with the columnar format magic."""
+
+    if not path.is_file():
+        return False
+    with path.open("rb") as handle:
+        return handle.read(len(MAGIC)) == MAGIC
+
+
+def convert_csv_to_binary(csv_path: Path, output_path: Path, batch_size: int = 100000) -> int:
+    """Convert a CSV log file into the columnar format and return the row count.
+
+    Column data is spilled to per-column temporary files while the CSV is
+    parsed in batches, so memory is bounded by ``batch_size`` and the
+    vocabularies rather than by the file size. The output is written to a
+    temporary name and renamed into place.
+    """
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    column_names = list(NUMERIC_COLUMNS) + STRING_COLUMNS
+    spill_paths = {
+        name: output_path.with_name(f"{output_path.name}.{name}.tmp") for name in column_names
+    }
+    vocabularies = {name: StringColumn() for name in STRING_COLUMNS}
+    rows = 0
+    spills = {name: spill_paths[name].open("wb") for name in column_names}
+    try:
+        for batch in iter_batches(csv_path, batch_size):
+            rows += len(batch)
+            for name in NUMERIC_COLUMNS:
+                getattr(batch, name).tofile(spills[name])
+            for name in STRING_COLUMNS:
+                column: StringColumn = getattr(batch, name)
+                # Shared vocabularies may hold values this file never uses, so
+                # only codes present in the batch are registered.
+                remap = {
+                    code: vocabularies[name].encode(column.values[code])
+                    for code in dict.fromkeys(column.codes)
+                }
+                array(CODE_TYPECODE, map(remap.__getitem__, column.codes)).tofile(spills[name])
+    finally:
+        for handle in spills.values():
+            handle.close()
+
+    try:
+        columns: Dict[str, Dict[str, object]] = {}
+        offset = 0
+        for name in column_names:
+            typecode = NUMERIC_COLUMNS.get(name, CODE_TYPECODE)
+            size = spill_paths[name].stat().st_size
+            columns[name] = {
+                "typecode": typecode,
+                "itemsize": array(typecode).itemsize,
+                "offset": offset,
+                "size": size,
+            }
+            offset += _aligned(size)
+        header = {
+            "version": FORMAT_VERSION,
+            "rows": rows,
+            "byteorder": sys.byteorder,
+            "columns": columns,
+            "vocabularies": {name: vocabularies[name].values for name in STRING_COLUMNS},
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        prefix_size = len(MAGIC) + 4 + len(header_bytes)
+        with tmp_path.open("wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<I", len(header_bytes)))
+            out.write(header_bytes)
+            out.write(b"\0" * (_aligned(prefix_size) - prefix_size))
+            for name in column_names:
+                with spill_paths[name].open("rb") as spill:
+                    shutil.copyfileobj(spill, out, 1024 * 1024)
+                size = columns[name]["size"]
+                out.write(b"\0" * (_aligned(size) - size))
+        os.replace(tmp_path, output_path)
+    finally:
+        for spill_path in spill_paths.values():
+            spill_path.unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
+
+    logger.info("Converted %s rows from %s to %s", rows, csv_path, output_path)
+    return rows
+
+
+def read_binary_log(path: Path) -> LogBatch:
+    """Memory-map a columnar log file and return a read-only :class:`LogBatch`.
+
+    Column arrays are ``memoryview`` objects over the mapping; the mapping
+    stays open for as long as any column of the batch is referenced.
+    """
+
+    with path.open("rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    # Validate everything before any view is exported, so the mapping can
+    # still be closed on error.
+    try:
+        if mapped[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not an NSMS columnar log file: {path}")
+        (header_size,) = struct.unpack_from("<I", mapped, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(mapped[header_start : header_start + header_size].decode("utf-8"))
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar log version {header['version']} in {path}")
+        for name, spec in header["columns"].items():
+            if array(spec["typecode"]).itemsize != spec["itemsize"]:
+                raise ValueError(f"Column {name} in {path} has an incompatible item size")
+    except BaseException:
+        mapped.close()
+        raise
+    data_start = _aligned(header_start + header_size)
+    base = memoryview(mapped)
+
+    def column(name: str):
+        spec = header["columns"][name]
+        typecode = spec["typecode"]
+        start = data_start + spec["offset"]
+        view = base[start : start + spec["size"]]
+        if header["byteorder"] != sys.byteorder:
+            swapped = array(typecode, view.tobytes())
+            swapped.byteswap()
+            return swapped
+        return view.cast(typecode)
+
+    strings = {
+        name: StringColumn.from_codes(column(name), header["vocabularies"][name])
+        for name in STRING_COLUMNS
+    }
+    return LogBatch(
+        timestamps=column("timestamps"),
+        bytes_transferred=column("bytes_transferred"),
+        **strings,
+    )
+
+
+def iter_binary_batches(path: Path, batch_size: int) -> Iterator[LogBatch]:
+    """Yield zero-copy slices of a columnar log file."""
+
+    batch = read_binary_log(path)
+    for start in range(0, len(batch), batch_size):
+        yield batch.slice(start, start + batch_size)
+
+
+def default_binary_path(csv_path: Path) -> Path:
+    return strip_compression_suffix(csv_path).with_suffix(BINARY_SUFFIX)
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
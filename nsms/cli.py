@@ -6,19 +6,111 @@ import argparse
 import json
 from pathlib import Path
 
-from nsms.config import Config
+from nsms.binary_log import convert_csv_to_binary, default_binary_path
+from nsms.config import SAMPLE_STRATA, Config
+from nsms.follow import follow_logs
+from nsms.log_index import DEFAULT_STRIDE, build_log_index, load_log_index, update_log_index
 from nsms.logging_utils import setup_logging
-from nsms.monitoring import run_pipeline, train_model
+from nsms.model_registry import ModelRegistry
+from nsms.monitoring import (
+    compare_sampled_model,
+    run_pipeline,
+    run_pipeline_streaming,
+    sample_logs,
+    train_model,
+    train_model_streaming,
+    train_on_sample,
+)
+from nsms.partitions import partition_log_file
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Local NSMS pipeline")
     parser.add_argument("--config", type=Path, help="Path to config JSON")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes used to parse a directory or glob of log files (overrides config)",
+    )
+    parser.add_argument(
+        "--start", help="Only use logs at or after this ISO-8601 time (overrides config)"
+    )
+    parser.add_argument("--end", help="Only use logs before this ISO-8601 time (overrides config)")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    subparsers.add_parser("train", help="Train the anomaly model")
-    subparsers.add_parser("run", help="Run the monitoring pipeline")
+    train_parser = subparsers.add_parser("train", help="Train the anomaly model")
+    train_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Train in one pass over bounded chunks instead of loading the input",
+    )
+    train_parser.add_argument("--chunk-size", type=int, help="Records per chunk when streaming")
+    train_parser.add_argument(
+        "--sample-size",
+        type=int,
+        help="Train on a reservoir sample of this many records (overrides config)",
+    )
+    train_parser.add_argument(
+        "--stratify",
+        choices=SAMPLE_STRATA,
+        help="Give each value of this field an equal share of the sample (overrides config)",
+    )
+    train_parser.add_argument("--seed", type=int, default=0, help="Random seed of the sample")
+    train_parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also train on every record and write sampling_report.json comparing the two models",
+    )
+    run_parser = subparsers.add_parser("run", help="Run the monitoring pipeline")
+    run_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process the input in bounded chunks instead of loading it all",
+    )
+    run_parser.add_argument("--chunk-size", type=int, help="Records per chunk when streaming")
+    follow_parser = subparsers.add_parser(
+        "follow", help="Tail data_path and process new rows as they are appended"
+    )
+    follow_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds to wait when no new rows are available",
+    )
+    follow_parser.add_argument(
+        "--max-polls", type=int, help="Stop after this many polls (default: run until Ctrl-C)"
+    )
+    partition_parser = subparsers.add_parser(
+        "partition", help="Copy logs into a dt=YYYY-MM-DD/hour=HH partitioned directory"
+    )
+    partition_parser.add_argument(
+        "--input", type=Path, help="Logs to partition (defaults to data_path)"
+    )
+    partition_parser.add_argument(
+        "--output", type=Path, required=True, help="Partition root directory"
+    )
+    index_parser = subparsers.add_parser(
+        "index", help="Build or refresh the timestamp index used to seek into a sorted CSV"
+    )
+    index_parser.add_argument("--input", type=Path, help="CSV file (defaults to data_path)")
+    index_parser.add_argument(
+        "--stride", type=int, default=DEFAULT_STRIDE, help="Rows between index entries"
+    )
     subparsers.add_parser("show-config", help="Print the effective configuration")
+    models_parser = subparsers.add_parser(
+        "models", help="List the versions in model_registry, marking the current one"
+    )
+    models_parser.add_argument(
+        "--activate", type=int, help="Make this published version current (e.g. to roll back)"
+    )
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="Convert CSV logs to the memory-mappable columnar format"
+    )
+    convert_parser.add_argument("--input", type=Path, help="CSV file (defaults to data_path)")
+    convert_parser.add_argument(
+        "--output", type=Path, help="Output file (defaults to the input with a .nsmscol suffix)"
+    )
 
     return parser
 
@@ -27,13 +119,75 @@ def main() -> int:
     parser = build_parser()
     args = parser.parse_args()
     config = Config.load(args.config)
+    overrides = {
+        key: value
+        for key, value in (
+            ("workers", args.workers),
+            ("window_start", args.start),
+            ("window_end", args.end),
+        )
+        if value is not None
+    }
+    if overrides:
+        config = config.from_mapping({**config.__dict__, **overrides})
     setup_logging(config.output_dir)
 
     if args.command == "train":
-        train_model(config)
+        sample_overrides = {
+            key: value
+            for key, value in (
+                ("sample_size", args.sample_size),
+                ("sample_stratify", args.stratify),
+            )
+            if value is not None
+        }
+        if sample_overrides:
+            config = config.from_mapping({**config.__dict__, **sample_overrides})
+        if config.sample_size:
+            sampler = sample_logs(config, chunk_size=args.chunk_size, seed=args.seed)
+            model = train_on_sample(config, sampler)
+            if args.compare:
+                compare_sampled_model(config, model, sampler, chunk_size=args.chunk_size)
+        elif args.compare:
+            parser.error("--compare needs --sample-size or sample_size in the config")
+        elif args.stream:
+            train_model_streaming(config, chunk_size=args.chunk_size)
+        else:
+            train_model(config)
         return 0
     if args.command == "run":
-        run_pipeline(config)
+        if args.stream:
+            run_pipeline_streaming(config, chunk_size=args.chunk_size)
+        else:
+            run_pipeline(config)
+        return 0
+    if args.command == "follow":
+        follow_logs(config, poll_interval=args.poll_interval, max_polls=args.max_polls)
+        return 0
+    if args.command == "convert":
+        source = args.input or config.data_path
+        convert_csv_to_binary(source, args.output or default_binary_path(source))
+        return 0
+    if args.command == "partition":
+        partition_log_file(args.input or config.data_path, args.output)
+        return 0
+    if args.command == "index":
+        source = args.input or config.data_path
+        index = load_log_index(source)
+        if index is None or index.stride != args.stride:
+            build_log_index(source, args.stride)
+        else:
+            update_log_index(source)
+        return 0
+    if args.command == "models":
+        if config.model_registry is None:
+            parser.error("models needs model_registry in the config (or NSMS_MODEL_REGISTRY)")
+        registry = ModelRegistry(config.model_registry)
+        if args.activate is not None:
+            registry.activate(args.activate)
+        current = registry.current()
+        for version in registry.versions():
+            print(f"{'*' if version == current else ' '} {version}  {registry.path(version)}")
         return 0
     if args.command == "show-config":
         print(json.dumps(config.__dict__, default=str, indent=2))
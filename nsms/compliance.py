@@ -5,25 +5,61 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from nsms.data import LogRecord
+from nsms.data import FactTables, LogBatch, LogRecord
 from nsms.logging_utils import get_logger
+from nsms.rule_expressions import RuleProgram
+
+try:  # Optional: whole-column mask lookups.
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is absent
+    np = None
 
 
 logger = get_logger("compliance")
 
+# (region, protocol, action) triples and masks memoized by
+# ``ComplianceChecker``; a table is cleared when it fills, which only
+# unbounded vocabularies reach.
+VIOLATION_TABLE_LIMIT = 1 << 16
+# Rule sets this small have their batch masks stored as int64.
+INT64_MASK_RULES = 63
+
+LIST_FIELDS = ("allowed_regions", "allowed_protocols", "high_risk_actions")
+
 
 @dataclass(frozen=True)
 class ComplianceRule:
+    """A rule given by allowed/high-risk value lists, or by a ``condition``.
+
+    A ``condition`` (see :mod:`nsms.rule_expressions`) describes the records
+    that violate the rule, and replaces the three lists.
+    """
+
     rule_id: str
     description: str
     allowed_regions: List[str]
     allowed_protocols: List[str]
     high_risk_actions: List[str]
+    condition: Optional[str] = None
 
     @classmethod
     def from_mapping(cls, mapping: Dict[str, object]) -> "ComplianceRule":
+        if "condition" in mapping:
+            listed = [name for name in LIST_FIELDS if name in mapping]
+            if listed:
+                raise ValueError(
+                    f"Rule {mapping['rule_id']} has a condition and {', '.join(listed)}"
+                )
+            return cls(
+                rule_id=mapping["rule_id"],
+                description=mapping["description"],
+                allowed_regions=[],
+                allowed_protocols=[],
+                high_risk_actions=[],
+                condition=str(mapping["condition"]),
+            )
         return cls(
             rule_id=mapping["rule_id"],
             description=mapping["description"],
@@ -34,29 +70,167 @@ class ComplianceRule:
 
 
 class ComplianceChecker:
+    """Evaluates records against compiled rules as violation bitmasks.
+
+    Bit ``i`` of a mask is ``rules[i]``; a mask of 0 means no violations.
+    """
+
     def __init__(self, rules: List[ComplianceRule]):
         self.rules = rules
+        self._rule_ids = tuple(rule.rule_id for rule in rules)
+        listed = [rule if rule.condition is None else None for rule in rules]
+        self._listed_rules = sum(
+            1 << index for index, rule in enumerate(listed) if rule is not None
+        )
+        self._region_masks = _allowed_masks([rule and rule.allowed_regions for rule in listed])
+        self._protocol_masks = _allowed_masks([rule and rule.allowed_protocols for rule in listed])
+        self._action_masks = _listed_masks(
+            [rule.high_risk_actions if rule else [] for rule in listed]
+        )
+        conditions = [
+            (index, rule.condition)
+            for index, rule in enumerate(rules)
+            if rule.condition is not None
+        ]
+        self.program: RuleProgram | None = None
+        if conditions:
+            self.program = RuleProgram(
+                [text for _, text in conditions], bits=[index for index, _ in conditions]
+            )
+        self._field_masks: Dict[Tuple[str, str, str], int] = {}
+        self._ids_by_mask: Dict[int, Tuple[str, ...]] = {0: ()}
+        self._facts = FactTables()
 
     @classmethod
     def load(cls, path: Path) -> "ComplianceChecker":
         if not path.exists():
             raise FileNotFoundError(f"Compliance rules file not found: {path}")
-        payload = json.loads(path.read_text())
+        return cls.from_payload(json.loads(path.read_text()))
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, object]) -> "ComplianceChecker":
+        """Build a checker from the parsed contents of a rules file."""
+
         rules = [ComplianceRule.from_mapping(item) for item in payload["rules"]]
+        checker = cls(rules)
         logger.info("Loaded %s compliance rules", len(rules))
-        return cls(rules)
+        if checker.program is not None:
+            logger.info(
+                "Compiled %s rule conditions into %s distinct subexpressions",
+                len(checker.program.roots),
+                len(checker.program),
+            )
+        return checker
 
     def evaluate(self, record: LogRecord) -> List[str]:
         """Return a list of violated rule IDs."""
 
-        violations: List[str] = []
-        for rule in self.rules:
-            if record.region not in rule.allowed_regions:
-                violations.append(rule.rule_id)
-                continue
-            if record.protocol not in rule.allowed_protocols:
-                violations.append(rule.rule_id)
-                continue
-            if record.action in rule.high_risk_actions:
-                violations.append(rule.rule_id)
-        return violations
+        mask = self._fields_mask(record.region, record.protocol, record.action)
+        if self.program is not None:
+            mask |= self.program.record_mask(record)
+        return list(self.rule_ids(mask))
+
+    def violation_masks(self, batch: LogBatch) -> Sequence[int]:
+        """Return the bitmask of violated rules of every row.
+
+        An int64 ndarray with NumPy and at most 63 rules; otherwise a list.
+        """
+
+        # Per-value masks are memoized per vocabulary of each column.
+        columns = (
+            (batch.region, "region", self._region_mask),
+            (batch.protocol, "protocol", self._protocol_mask),
+            (batch.action, "action", self._action_mask),
+        )
+        tables = [self._facts.facts(column, name, derive) for column, name, derive in columns]
+        int64 = len(self.rules) <= INT64_MASK_RULES
+        if np is not None and int64:
+            masks = np.zeros(len(batch), dtype=np.int64)
+            for table, (column, _, _) in zip(tables, columns):
+                codes = np.frombuffer(column.codes, dtype=f"u{column.codes.itemsize}")
+                masks |= np.asarray(table, dtype=np.int64)[codes]
+            if self.program is not None:
+                masks |= self.program.batch_masks(batch, int64)
+            return masks
+        regions, protocols, actions = tables
+        masks = [
+            regions[r] | protocols[p] | actions[a]
+            for r, p, a in zip(batch.region.codes, batch.protocol.codes, batch.action.codes)
+        ]
+        if self.program is not None:
+            masks = [
+                mask | other for mask, other in zip(masks, self.program.batch_masks(batch, False))
+            ]
+        return masks
+
+    def rule_ids(self, mask: int) -> Tuple[str, ...]:
+        """Return the IDs of the rules set in ``mask``, in rule order."""
+
+        mask = int(mask)
+        ids = self._ids_by_mask.get(mask)
+        if ids is None:
+            ids = tuple(
+                rule_id for index, rule_id in enumerate(self._rule_ids) if mask >> index & 1
+            )
+            if len(self._ids_by_mask) >= VIOLATION_TABLE_LIMIT:
+                self._ids_by_mask.clear()
+            self._ids_by_mask[mask] = ids
+        return ids
+
+    def evaluate_batch(self, batch: LogBatch) -> List[Tuple[str, ...]]:
+        """Return violated rule IDs for every row of ``batch``.
+
+        Built from :meth:`violation_masks`; rows with the same mask share
+        one tuple.
+        """
+
+        return list(map(self.rule_ids, self.violation_masks(batch)))
+
+    def _region_mask(self, region: str) -> int:
+        return self._region_masks.get(region, self._listed_rules)
+
+    def _protocol_mask(self, protocol: str) -> int:
+        return self._protocol_masks.get(protocol, self._listed_rules)
+
+    def _action_mask(self, action: str) -> int:
+        return self._action_masks.get(action, 0)
+
+    def _fields_mask(self, region: str, protocol: str, action: str) -> int:
+        # Memoized per (region, protocol, action), so list rules cost one dict
+        # lookup per record however many there are.
+        key = (region, protocol, action)
+        mask = self._field_masks.get(key)
+        if mask is None:
+            mask = (
+                self._region_mask(region)
+                | self._protocol_mask(protocol)
+                | self._action_mask(action)
+            )
+            if len(self._field_masks) >= VIOLATION_TABLE_LIMIT:
+                self._field_masks.clear()
+            self._field_masks[key] = mask
+        return mask
+
+
+def _allowed_masks(allowed: List[Optional[List[str]]]) -> Dict[str, int]:
+    """Map each value to the rules whose allowed list does not contain it.
+
+    ``None`` entries are rules without an allowed list, which no value violates.
+    """
+
+    everything = sum(1 << index for index, values in enumerate(allowed) if values is not None)
+    masks: Dict[str, int] = {}
+    for index, values in enumerate(allowed):
+        for value in values or ():
+            masks[value] = masks.get(value, everything) & ~(1 << index)
+    return masks
+
+
+def _listed_masks(listed: List[List[str]]) -> Dict[str, int]:
+    """Map each value to the rules whose list contains it."""
+
+    masks: Dict[str, int] = {}
+    for index, values in enumerate(listed):
+        for value in values:
+            masks[value] = masks.get(value, 0) | 1 << index
+    return masks
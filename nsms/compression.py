@@ -0,0 +1,98 @@
+"""Transparent decompression for gzip, bzip2 and xz log files.
+
+Compression is detected from the file extension, falling back to the magic
+bytes at the start of the file so archives with unusual names still work.
+Files are decompressed incrementally while they are read, never to disk.
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+from typing import BinaryIO, Dict, TextIO
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+COMPRESSION_SUFFIXES: Dict[str, str] = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".lzma": "xz",
+}
+MAGIC_BYTES: Dict[str, bytes] = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+
+
+def detect_compression(path: Path) -> str | None:
+    """Return ``"gzip"``, ``"bz2"``, ``"xz"`` or ``None`` for plain files."""
+
+    compression = COMPRESSION_SUFFIXES.get(path.suffix.lower())
+    if compression is not None:
+        return compression
+    if not path.is_file():
+        return None
+    with path.open("rb") as handle:
+        head = handle.read(max(len(magic) for magic in MAGIC_BYTES.values()))
+    for name, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def open_binary(path: Path) -> BinaryIO:
+    """Open ``path`` for reading bytes, decompressing on the fly if needed."""
+
+    compression = detect_compression(path)
+    if compression is None:
+        return path.open("rb", buffering=READ_BUFFER_SIZE)
+    raw = path.open("rb", buffering=READ_BUFFER_SIZE)
+    try:
+        if compression == "gzip":
+            stream: BinaryIO = gzip.GzipFile(fileobj=raw, mode="rb")
+        elif compression == "bz2":
+            stream = bz2.BZ2File(raw, mode="rb")
+        else:
+            stream = lzma.LZMAFile(raw, mode="rb")
+    except Exception:
+        raw.close()
+        raise
+    # The codec wrappers do not own a file object they were handed, so the
+    # outer buffer closes both.
+    return _ClosingReader(stream, raw)
+
+
+def open_text(path: Path) -> TextIO:
+    """Open ``path`` as UTF-8 text suitable for ``csv.reader``."""
+
+    if detect_compression(path) is None:
+        return path.open(newline="", encoding="utf-8")
+    return io.TextIOWrapper(open_binary(path), encoding="utf-8", newline="")
+
+
+def strip_compression_suffix(path: Path) -> Path:
+    """Return ``path`` without a trailing compression extension."""
+
+    if path.suffix.lower() in COMPRESSION_SUFFIXES:
+        return path.with_suffix("")
+    return path
+
+
+class _ClosingReader(io.BufferedReader):
+    """Buffered reader over a codec stream that also closes the raw file."""
+
+    def __init__(self, stream: BinaryIO, raw: BinaryIO) -> None:
+        super().__init__(stream, buffer_size=READ_BUFFER_SIZE)  # type: ignore[arg-type]
+        self._raw_file = raw
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._raw_file.close()
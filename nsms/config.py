@@ -2,14 +2,23 @@
 
 from __future__ import annotations
 
+import glob
 import json
 import os
 from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
 
 DEFAULT_CONFIG_PATH = Path("config/default_config.json")
+# Fields nsms.baselines can keep per-entity byte baselines for.
+ENTITY_BASELINE_FIELDS = ("user", "source_ip")
+# Seasonal (hour-of-week) baselines are kept overall or per one entity field.
+SEASONAL_GLOBAL = "global"
+SEASONAL_BASELINE_MODES = (SEASONAL_GLOBAL,) + ENTITY_BASELINE_FIELDS
+# Fields a training sample can be stratified by (see nsms.sampling).
+SAMPLE_STRATA = ("user", "protocol", "status")
 
 
 @dataclass(frozen=True)
@@ -27,10 +36,26 @@ class Config:
     model_path: Path
     output_dir: Path
     anomaly_threshold: float = 3.0
+    threshold_quantile: Optional[float] = None
     allowed_regions: List[str] = field(default_factory=list)
     allowed_protocols: List[str] = field(default_factory=list)
     high_risk_actions: List[str] = field(default_factory=list)
     retention_days: int = 30
+    chunk_size: int = 10000
+    workers: int = 1
+    window_start: Optional[datetime] = None
+    window_end: Optional[datetime] = None
+    feature_cache_dir: Optional[Path] = None
+    feature_cache_max_mb: int = 1024
+    feature_windows: List[int] = field(default_factory=list)
+    entity_baselines: List[str] = field(default_factory=list)
+    entity_min_count: int = 30
+    seasonal_baselines: Optional[str] = None
+    sample_size: Optional[int] = None
+    sample_stratify: Optional[str] = None
+    model_registry: Optional[Path] = None
+    model_reload_seconds: float = 5.0
+    reference_reload_seconds: Optional[float] = None
 
     @classmethod
     def load(cls, path: Optional[Path] = None) -> "Config":
@@ -53,10 +78,32 @@ class Config:
         model_path = Path(str(mapping["model_path"]))
         output_dir = Path(str(mapping["output_dir"]))
         anomaly_threshold = float(mapping.get("anomaly_threshold", 3.0))
+        threshold_quantile = mapping.get("threshold_quantile")
         allowed_regions = list(mapping.get("allowed_regions", []))
         allowed_protocols = list(mapping.get("allowed_protocols", []))
         high_risk_actions = list(mapping.get("high_risk_actions", []))
         retention_days = int(mapping.get("retention_days", 30))
+        chunk_size = int(mapping.get("chunk_size", 10000))
+        workers = int(mapping.get("workers", 1))
+        window_start = _parse_datetime(mapping.get("window_start"))
+        window_end = _parse_datetime(mapping.get("window_end"))
+        feature_cache_dir = mapping.get("feature_cache_dir")
+        feature_cache_max_mb = int(mapping.get("feature_cache_max_mb", 1024))
+        feature_windows = mapping.get("feature_windows") or []
+        if isinstance(feature_windows, str):
+            feature_windows = feature_windows.split(",")
+        entity_baselines = mapping.get("entity_baselines") or []
+        if isinstance(entity_baselines, str):
+            entity_baselines = [
+                name.strip() for name in entity_baselines.split(",") if name.strip()
+            ]
+        entity_min_count = int(mapping.get("entity_min_count", 30))
+        seasonal_baselines = mapping.get("seasonal_baselines") or None
+        sample_size = mapping.get("sample_size")
+        sample_stratify = mapping.get("sample_stratify") or None
+        model_registry = mapping.get("model_registry")
+        model_reload_seconds = float(mapping.get("model_reload_seconds", 5.0))
+        reference_reload_seconds = mapping.get("reference_reload_seconds")
 
         config = cls(
             data_path=data_path,
@@ -65,22 +112,78 @@ class Config:
             model_path=model_path,
             output_dir=output_dir,
             anomaly_threshold=anomaly_threshold,
+            threshold_quantile=(
+                float(threshold_quantile) if threshold_quantile not in (None, "") else None
+            ),
             allowed_regions=allowed_regions,
             allowed_protocols=allowed_protocols,
             high_risk_actions=high_risk_actions,
             retention_days=retention_days,
+            chunk_size=chunk_size,
+            workers=workers,
+            window_start=window_start,
+            window_end=window_end,
+            feature_cache_dir=Path(str(feature_cache_dir)) if feature_cache_dir else None,
+            feature_cache_max_mb=feature_cache_max_mb,
+            feature_windows=[int(window) for window in feature_windows],
+            entity_baselines=list(entity_baselines),
+            entity_min_count=entity_min_count,
+            seasonal_baselines=str(seasonal_baselines) if seasonal_baselines else None,
+            sample_size=int(sample_size) if sample_size not in (None, "") else None,
+            sample_stratify=str(sample_stratify) if sample_stratify else None,
+            model_registry=Path(str(model_registry)) if model_registry else None,
+            model_reload_seconds=model_reload_seconds,
+            reference_reload_seconds=(
+                float(reference_reload_seconds)
+                if reference_reload_seconds not in (None, "")
+                else None
+            ),
         )
         config.validate()
         return config
 
     def validate(self) -> None:
-        _ensure_exists(self.data_path, "data_path")
+        _ensure_data_path_exists(self.data_path)
         _ensure_exists(self.threat_intel_path, "threat_intel_path")
         _ensure_exists(self.compliance_rules_path, "compliance_rules_path")
         if self.anomaly_threshold <= 0:
             raise ValueError("anomaly_threshold must be greater than 0")
+        if self.threshold_quantile is not None and not 0 < self.threshold_quantile < 1:
+            raise ValueError("threshold_quantile must be between 0 and 1")
         if self.retention_days <= 0:
             raise ValueError("retention_days must be greater than 0")
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be greater than 0")
+        if self.workers <= 0:
+            raise ValueError("workers must be greater than 0")
+        if self.window_start and self.window_end and self.window_start >= self.window_end:
+            raise ValueError("window_start must be before window_end")
+        if self.feature_cache_max_mb <= 0:
+            raise ValueError("feature_cache_max_mb must be greater than 0")
+        if any(window <= 0 for window in self.feature_windows):
+            raise ValueError("feature_windows must be positive numbers of seconds")
+        unknown = [name for name in self.entity_baselines if name not in ENTITY_BASELINE_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"entity_baselines must be drawn from {', '.join(ENTITY_BASELINE_FIELDS)}"
+            )
+        if self.entity_min_count <= 0:
+            raise ValueError("entity_min_count must be greater than 0")
+        if (
+            self.seasonal_baselines is not None
+            and self.seasonal_baselines not in SEASONAL_BASELINE_MODES
+        ):
+            raise ValueError(
+                f"seasonal_baselines must be one of {', '.join(SEASONAL_BASELINE_MODES)}"
+            )
+        if self.sample_size is not None and self.sample_size <= 0:
+            raise ValueError("sample_size must be greater than 0")
+        if self.sample_stratify is not None and self.sample_stratify not in SAMPLE_STRATA:
+            raise ValueError(f"sample_stratify must be one of {', '.join(SAMPLE_STRATA)}")
+        if self.model_reload_seconds <= 0:
+            raise ValueError("model_reload_seconds must be greater than 0")
+        if self.reference_reload_seconds is not None and self.reference_reload_seconds <= 0:
+            raise ValueError("reference_reload_seconds must be greater than 0")
 
     def ensure_output_dir(self) -> None:
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -91,6 +194,24 @@ def _ensure_exists(path: Path, label: str) -> None:
         raise FileNotFoundError(f"{label} does not exist: {path}")
 
 
+def _parse_datetime(value: object) -> Optional[datetime]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _ensure_data_path_exists(path: Path) -> None:
+    """``data_path`` may be a glob; it must then match at least one file."""
+
+    if path.exists() or (
+        any(char in str(path) for char in "*?[") and glob.glob(str(path), recursive=True)
+    ):
+        return
+    raise FileNotFoundError(f"data_path does not exist: {path}")
+
+
 def _load_env_overrides() -> Dict[str, object]:
     """Load optional overrides from environment variables.
 
@@ -105,7 +226,23 @@ def _load_env_overrides() -> Dict[str, object]:
         "NSMS_MODEL_PATH": "model_path",
         "NSMS_OUTPUT_DIR": "output_dir",
         "NSMS_ANOMALY_THRESHOLD": "anomaly_threshold",
+        "NSMS_THRESHOLD_QUANTILE": "threshold_quantile",
         "NSMS_RETENTION_DAYS": "retention_days",
+        "NSMS_CHUNK_SIZE": "chunk_size",
+        "NSMS_WORKERS": "workers",
+        "NSMS_WINDOW_START": "window_start",
+        "NSMS_WINDOW_END": "window_end",
+        "NSMS_FEATURE_CACHE_DIR": "feature_cache_dir",
+        "NSMS_FEATURE_CACHE_MAX_MB": "feature_cache_max_mb",
+        "NSMS_FEATURE_WINDOWS": "feature_windows",
+        "NSMS_ENTITY_BASELINES": "entity_baselines",
+        "NSMS_ENTITY_MIN_COUNT": "entity_min_count",
+        "NSMS_SEASONAL_BASELINES": "seasonal_baselines",
+        "NSMS_SAMPLE_SIZE": "sample_size",
+        "NSMS_SAMPLE_STRATIFY": "sample_stratify",
+        "NSMS_MODEL_REGISTRY": "model_registry",
+        "NSMS_MODEL_RELOAD_SECONDS": "model_reload_seconds",
+        "NSMS_REFERENCE_RELOAD_SECONDS": "reference_reload_seconds",
     }
     for env_key, config_key in env_map.items():
         value = os.getenv(env_key)
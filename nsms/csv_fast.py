@@ -0,0 +1,290 @@
+"""Fast-path parsing for CSV logs in the fixed ``write_logs`` schema.
+
+``csv.DictReader`` allocates a dict per row and ``datetime.fromisoformat``
+runs for every timestamp. Log files written by NSMS have a fixed header and
+almost never need quoting, so the file is read in large blocks whose rows
+are split positionally with ``str.split``; only blocks containing a quote
+go through ``csv``.
+Timestamps share their minute prefix with their neighbours, so the epoch
+value of each ``YYYY-MM-DDTHH:MM`` prefix is parsed once and cached.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import mmap
+from itertools import repeat
+from operator import add, itemgetter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AnyStr, BinaryIO, Dict, Iterable, Iterator, List, Sequence
+
+from nsms.compression import READ_BUFFER_SIZE, detect_compression, open_binary, open_text
+
+
+EPOCH = datetime(1970, 1, 1)
+MMAP_BLOCK_SIZE = 4 * 1024 * 1024
+
+_MINUTE_PREFIX = itemgetter(slice(0, 16))
+_COLON_AT_16 = itemgetter(16)
+_SECONDS = itemgetter(slice(17, 19))
+_SECOND_MICROS = {f"{second:02d}": second * 1_000_000 for second in range(60)}
+
+
+class HeaderMismatch(ValueError):
+    """Raised when a file's header differs from the expected fixed schema."""
+
+
+class TimestampCache:
+    """Convert ISO-8601 timestamps to epoch microseconds (naive UTC).
+
+    The first 16 characters (``YYYY-MM-DDTHH:MM``) are looked up in a small
+    cache; seconds and fractional seconds are added arithmetically. Anything
+    else, such as timezone suffixes, falls back to ``datetime.fromisoformat``.
+    """
+
+    def __init__(self, max_entries: int = 65536) -> None:
+        self.max_entries = max_entries
+        self._minutes: Dict[str, int] = {}
+
+    def to_micros(self, value: str) -> int:
+        return self.to_micros_many([value])[0]
+
+    def to_micros_many(self, values: Sequence[str]) -> List[int]:
+        fast = self._uniform_seconds(values)
+        if fast is not None:
+            return fast
+        minutes = self._minutes
+        result: List[int] = []
+        append = result.append
+        for value in values:
+            base = minutes.get(value[:16])
+            if base is None:
+                base = self._cache_minute(value[:16])
+                if base is None:
+                    append(self._slow(value))
+                    continue
+            size = len(value)
+            if size == 19 and value[16] == ":" and value[17:].isdigit() and value[17] < "6":
+                append(base + int(value[17:]) * 1_000_000)
+            elif (
+                size == 26
+                and value[16] == ":"
+                and value[19] == "."
+                and value[17:19].isdigit()
+                and value[17] < "6"
+                and value[20:].isdigit()
+            ):
+                append(base + int(value[17:19]) * 1_000_000 + int(value[20:]))
+            elif size == 16:
+                append(base)
+            else:
+                append(self._slow(value))
+        return result
+
+    def _uniform_seconds(self, values: Sequence[str]) -> List[int] | None:
+        """Convert a block of ``YYYY-MM-DDTHH:MM:SS`` values with C-level maps.
+
+        Returns ``None`` when any value has another shape so the caller can
+        take the per-value path.
+        """
+
+        if not values or set(map(len, values)) != {19} or set(map(_COLON_AT_16, values)) != {":"}:
+            return None
+        try:
+            seconds = list(map(_SECOND_MICROS.__getitem__, map(_SECONDS, values)))
+        except KeyError:
+            return None
+        prefixes = list(map(_MINUTE_PREFIX, values))
+        for prefix in set(prefixes).difference(self._minutes):
+            if self._cache_minute(prefix) is None:
+                return None
+        return list(map(add, map(self._minutes.__getitem__, prefixes), seconds))
+
+    def _cache_minute(self, prefix: str) -> int | None:
+        if len(prefix) != 16:
+            return None
+        try:
+            base = to_epoch_micros(datetime.fromisoformat(prefix))
+        except ValueError:
+            return None
+        if len(self._minutes) >= self.max_entries:
+            self._minutes.clear()
+        self._minutes[prefix] = base
+        return base
+
+    @staticmethod
+    def _slow(value: str) -> int:
+        try:
+            timestamp = datetime.fromisoformat(value)
+        except ValueError as exc:
+            raise ValueError(f"Invalid timestamp: {value}") from exc
+        return to_epoch_micros(timestamp)
+
+
+def to_epoch_micros(timestamp: datetime) -> int:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def read_header(path: Path) -> List[str]:
+    with open_text(path) as handle:
+        return next(csv.reader(handle), [])
+
+
+def iter_column_blocks(
+    path: Path, expected_header: Sequence[str], use_mmap: bool = False
+) -> Iterator[List[Sequence[str]]]:
+    """Yield blocks of ``path`` as one list of values per column.
+
+    The header is checked once against ``expected_header``; a mismatch raises
+    :class:`HeaderMismatch` so callers can fall back to a generic reader.
+    Unquoted blocks are split with a single ``str.split`` over the whole
+    block and sliced into columns, so there is no per-row Python work. With
+    ``use_mmap`` the file is memory-mapped and decoded block by block instead
+    of going through a buffered text stream. Compressed files are always
+    decompressed as a stream; ``use_mmap`` does not apply to them.
+    """
+
+    if detect_compression(path) is not None:
+        blocks = _iter_decompressed_blocks(path)
+    elif use_mmap:
+        blocks = _iter_mmap_blocks(path)
+    else:
+        blocks = _iter_text_blocks(path)
+    width = len(expected_header)
+    header_checked = False
+    for text in blocks:
+        if not header_checked:
+            header, _, text = text.partition("\n")
+            if header.rstrip("\r").split(",") != list(expected_header):
+                raise HeaderMismatch(f"Unexpected log header in {path}: {header}")
+            header_checked = True
+        yield parse_block(text, width, path)
+
+
+def iter_range_column_blocks(
+    path: Path, width: int, start: int, stop: int | None = None
+) -> Iterator[List[List[str]]]:
+    """Yield column blocks for the records in bytes ``[start, stop)`` of ``path``.
+
+    ``start`` must be the first byte of a record (for example an offset from
+    :mod:`nsms.log_index`); ``stop=None`` reads to the end of the file. Only
+    plain, uncompressed files can be read by range.
+    """
+
+    for text in _iter_range_blocks(path, start, stop):
+        yield parse_block(text, width, path)
+
+
+def parse_block(text: str, width: int, source: object = "<block>") -> List[List[str]]:
+    """Split complete CSV records in ``text`` into ``width`` column lists.
+
+    ``source`` only appears in error messages.
+    """
+
+    if '"' in text:
+        rows = [row for row in csv.reader(io.StringIO(text)) if row]
+        _check_widths(source, rows, width)
+        return [list(column) for column in zip(*rows)] or [[] for _ in range(width)]
+    newline = "\n"
+    if "\r" in text:
+        if text.count("\r\n") == text.count("\n"):
+            newline = "\r\n"
+        else:
+            text = text.replace("\r\n", "\n")
+    lines = text.split(newline)
+    if lines[-1] == "":
+        lines.pop()
+    if "" in lines:
+        lines = [line for line in lines if line]
+    if set(map(str.count, lines, repeat(","))) - {width - 1}:
+        _check_widths(source, [line.split(",") for line in lines], width)
+    fields = ",".join(lines).split(",") if lines else []
+    return [fields[offset::width] for offset in range(width)]
+
+
+def record_boundary(text: AnyStr) -> int:
+    """Return the length of the longest prefix of ``text`` made of whole records.
+
+    A newline inside a quoted field is not a record boundary, so the cut is
+    only made after a newline preceded by an even number of quotes. Works on
+    ``str`` and on UTF-8 ``bytes``.
+    """
+
+    newline, quote = ("\n", '"') if isinstance(text, str) else (b"\n", b'"')
+    cut = text.rfind(newline) + 1
+    while cut and text.count(quote, 0, cut) % 2:
+        cut = text.rfind(newline, 0, cut - 1) + 1
+    return cut
+
+
+def _check_widths(source: object, rows: List[List[str]], width: int) -> None:
+    for row in rows:
+        if len(row) != width:
+            raise ValueError(f"Expected {width} fields but found {len(row)} in {source}: {row}")
+
+
+def _iter_text_blocks(path: Path) -> Iterator[str]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        yield from _complete_line_blocks(iter(lambda: handle.read(READ_BUFFER_SIZE), ""))
+
+
+def _iter_decompressed_blocks(path: Path) -> Iterator[str]:
+    with open_binary(path) as handle:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pieces = (
+            decoder.decode(chunk) for chunk in iter(lambda: handle.read(READ_BUFFER_SIZE), b"")
+        )
+        yield from _complete_line_blocks(pieces)
+
+
+def _iter_range_blocks(path: Path, start: int, stop: int | None) -> Iterator[str]:
+    with path.open("rb") as handle:
+        handle.seek(start)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pieces = (decoder.decode(chunk) for chunk in _read_range(handle, start, stop))
+        yield from _complete_line_blocks(pieces)
+
+
+def _read_range(handle: BinaryIO, start: int, stop: int | None) -> Iterator[bytes]:
+    position = start
+    while stop is None or position < stop:
+        size = READ_BUFFER_SIZE if stop is None else min(READ_BUFFER_SIZE, stop - position)
+        chunk = handle.read(size)
+        if not chunk:
+            return
+        position += len(chunk)
+        yield chunk
+
+
+def _iter_mmap_blocks(path: Path) -> Iterator[str]:
+    with path.open("rb") as handle:
+        if path.stat().st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            pieces = (
+                decoder.decode(mapped[start : start + MMAP_BLOCK_SIZE])
+                for start in range(0, len(mapped), MMAP_BLOCK_SIZE)
+            )
+            yield from _complete_line_blocks(pieces)
+
+
+def _complete_line_blocks(pieces: Iterable[str]) -> Iterator[str]:
+    """Re-cut text pieces so every block ends on a record boundary."""
+
+    pending = ""
+    for piece in pieces:
+        text = pending + piece
+        cut = record_boundary(text)
+        if not cut:
+            pending = text
+            continue
+        pending = text[cut:]
+        yield text[:cut]
+    if pending:
+        yield pending
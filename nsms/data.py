@@ -3,17 +3,65 @@
 from __future__ import annotations
 
 import csv
-from dataclasses import dataclass
-from datetime import datetime
+import itertools
+import operator
+import sys
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Iterable, List, Sequence
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, TypeVar
 
+from nsms.compression import open_text
+from nsms.csv_fast import (
+    EPOCH,
+    HeaderMismatch,
+    TimestampCache,
+    iter_column_blocks,
+    iter_range_column_blocks,
+    read_header,
+    to_epoch_micros,
+)
 from nsms.logging_utils import get_logger
-from nsms.validators import validate_records
+from nsms.validators import validate_batch, validate_records
 
 
 logger = get_logger("data")
 
+T = TypeVar("T")
+
+LOG_FIELDNAMES = [
+    "timestamp",
+    "source_ip",
+    "destination_ip",
+    "protocol",
+    "bytes",
+    "action",
+    "region",
+    "user",
+    "resource",
+    "status",
+]
+
+PARSE_BLOCK_SIZE = 8192
+
+INTERNED_COLUMNS = ["protocol", "action", "region", "user", "resource", "status"]
+# Fact tables a FactTables holds before it is cleared, which only per-batch
+# vocabularies (source and destination IPs) reach.
+FACT_TABLE_LIMIT = 1 << 12
+
+STRING_COLUMNS = [
+    "source_ip",
+    "destination_ip",
+    "protocol",
+    "action",
+    "region",
+    "user",
+    "resource",
+    "status",
+]
+
 
 @dataclass(frozen=True)
 class LogRecord:
@@ -47,16 +95,383 @@ class LogRecord:
             status=row["status"],
         )
 
+    @classmethod
+    def from_fields(cls, fields: Sequence[str]) -> "LogRecord":
+        """Build a record from values ordered as ``LOG_FIELDNAMES``."""
+
+        try:
+            timestamp = datetime.fromisoformat(fields[0])
+        except ValueError as exc:
+            raise ValueError(f"Invalid timestamp: {fields[0]}") from exc
+        return cls(
+            timestamp=timestamp,
+            source_ip=fields[1],
+            destination_ip=fields[2],
+            protocol=fields[3],
+            bytes_transferred=int(fields[4]),
+            action=fields[5],
+            region=fields[6],
+            user=fields[7],
+            resource=fields[8],
+            status=fields[9],
+        )
+
+
+class Vocabulary:
+    """Ordered mapping between distinct strings and small integer codes.
+
+    Values are interned with :func:`sys.intern`, so every row and record that
+    refers to a value shares one ``str`` object. Facts derived from a value
+    (for example "is this status a denial") are memoized per code through
+    :meth:`facts`, so they are computed once per distinct value.
+    """
+
+    __slots__ = ("values", "index", "token", "_facts")
+
+    _tokens = itertools.count()
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+        # Unique for the life of the process, unlike id(), so callers can key
+        # caches of code-based results by vocabulary.
+        self.token = next(Vocabulary._tokens)
+        self._facts: Dict[str, list] = {}
+        for value in values:
+            self.encode(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getstate__(self) -> List[str]:
+        return self.values
+
+    def __setstate__(self, values: List[str]) -> None:
+        # Unpickled vocabularies (e.g. from a parse worker) get a fresh token
+        # and recompute their facts in this process.
+        self.__init__(values)
+
+    def encode(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None:
+            value = sys.intern(value)
+            code = len(self.values)
+            self.index[value] = code
+            self.values.append(value)
+        return code
+
+    def facts(self, name: str, derive: Callable[[str], T]) -> List[T]:
+        """Return ``derive(value)`` for every code, computing only new values."""
+
+        cached = self._facts.setdefault(name, [])
+        if len(cached) < len(self.values):
+            cached.extend(map(derive, self.values[len(cached) :]))
+        return cached
+
+
+class FactTables:
+    """Facts memoized by their owner instead of on the shared vocabularies.
+
+    :meth:`Vocabulary.facts` suits facts every caller agrees on. Facts that
+    depend on a rule set live here, keyed by vocabulary token, so they are
+    released with the checker or program that derived them.
+    """
+
+    def __init__(self, limit: int = FACT_TABLE_LIMIT) -> None:
+        self.limit = limit
+        self._tables: Dict[Tuple[int, str], list] = {}
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def facts(self, column: StringColumn, name: str, derive: Callable[[str], T]) -> List[T]:
+        """Return ``derive(value)`` for every code of ``column``, computing only new values."""
+
+        values = column.vocabulary.values
+        key = (column.vocabulary.token, name)
+        cached = self._tables.get(key)
+        if cached is None:
+            if len(self._tables) >= self.limit:
+                self._tables.clear()
+            cached = self._tables[key] = []
+        if len(cached) < len(values):
+            cached.extend(map(derive, values[len(cached) :]))
+        return cached
+
+
+class SymbolTable:
+    """Shared vocabularies for the low-cardinality log fields.
+
+    Batches produced by the loader encode these fields against the same
+    :class:`Vocabulary` objects, so codes (and memoized facts) are stable
+    across batches and files for the life of the process.
+    """
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        self._vocabularies = {name: Vocabulary() for name in fields}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._vocabularies
+
+    def vocabulary(self, name: str) -> Vocabulary:
+        return self._vocabularies[name]
+
+    def intern_many(self, name: str, values: Sequence[str]) -> List[str]:
+        """Return ``values`` with each string replaced by its shared instance."""
+
+        vocabulary = self._vocabularies[name]
+        index = vocabulary.index
+        for value in dict.fromkeys(values):
+            if value not in index:
+                vocabulary.encode(value)
+        return list(map(vocabulary.values.__getitem__, map(index.__getitem__, values)))
 
-def load_logs(path: Path) -> List[LogRecord]:
-    """Load logs from a CSV file."""
 
-    if not path.exists():
-        raise FileNotFoundError(f"Log file not found: {path}")
+SYMBOLS = SymbolTable(INTERNED_COLUMNS)
+
+
+class StringColumn:
+    """Dictionary-coded string column.
+
+    Each row stores a ``uint32`` code into a :class:`Vocabulary`, so a column
+    of a few distinct strings costs four bytes per row plus one ``str`` per
+    value. Columns of different batches may share one vocabulary.
+    """
+
+    __slots__ = ("codes", "vocabulary")
+
+    def __init__(self, vocabulary: Vocabulary | None = None) -> None:
+        self.codes = array("I")
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+
+    @classmethod
+    def shared(cls, name: str) -> "StringColumn":
+        """Return an empty column encoded against ``SYMBOLS`` for ``name``."""
+
+        return cls(SYMBOLS.vocabulary(name))
+
+    @classmethod
+    def from_codes(cls, codes: Sequence[int], values: List[str]) -> "StringColumn":
+        """Wrap existing codes and vocabulary, e.g. a memory-mapped column."""
+
+        column = cls(Vocabulary(values))
+        column.codes = codes
+        return column
+
+    @property
+    def values(self) -> List[str]:
+        return self.vocabulary.values
+
+    def slice(self, start: int, stop: int) -> "StringColumn":
+        """Return rows ``start:stop`` sharing this column's vocabulary."""
+
+        column = StringColumn(self.vocabulary)
+        column.codes = self.codes[start:stop]
+        return column
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, idx: int) -> str:
+        return self.vocabulary.values[self.codes[idx]]
+
+    def encode(self, value: str) -> int:
+        return self.vocabulary.encode(value)
+
+    def append(self, value: str) -> None:
+        self.codes.append(self.vocabulary.encode(value))
+
+    def extend(self, values: Sequence[str]) -> None:
+        # Register new values first (in order of first appearance) so the
+        # per-row work is a C-level lookup.
+        vocabulary = self.vocabulary
+        index = vocabulary.index
+        for value in dict.fromkeys(values):
+            if value not in index:
+                vocabulary.encode(value)
+        self.codes.extend(map(index.__getitem__, values))
+
+    def extend_column(self, other: "StringColumn") -> None:
+        """Append ``other``'s rows, re-encoding them into this vocabulary."""
+
+        if other.vocabulary is self.vocabulary:
+            self.codes.extend(other.codes)
+            return
+        values = other.values
+        remap = {code: self.vocabulary.encode(values[code]) for code in dict.fromkeys(other.codes)}
+        self.codes.extend(map(remap.__getitem__, other.codes))
+
+    def facts(self, name: str, derive: Callable[[str], T]) -> List[T]:
+        return self.vocabulary.facts(name, derive)
+
+
+def _shared_column(name: str) -> Callable[[], StringColumn]:
+    return lambda: StringColumn.shared(name)
+
+
+@dataclass
+class LogBatch:
+    """Struct-of-arrays form of a sequence of :class:`LogRecord` rows.
+
+    Timestamps are stored as integer microseconds since the Unix epoch
+    (naive UTC), byte counts as ``int64`` and every string field as a
+    :class:`StringColumn`. Rows are only materialized as ``LogRecord`` on
+    request through :meth:`record` or :meth:`records`.
+    """
+
+    timestamps: array = field(default_factory=lambda: array("q"))
+    bytes_transferred: array = field(default_factory=lambda: array("q"))
+    source_ip: StringColumn = field(default_factory=StringColumn)
+    destination_ip: StringColumn = field(default_factory=StringColumn)
+    protocol: StringColumn = field(default_factory=_shared_column("protocol"))
+    action: StringColumn = field(default_factory=_shared_column("action"))
+    region: StringColumn = field(default_factory=_shared_column("region"))
+    user: StringColumn = field(default_factory=_shared_column("user"))
+    resource: StringColumn = field(default_factory=_shared_column("resource"))
+    status: StringColumn = field(default_factory=_shared_column("status"))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_records(cls, records: Iterable[LogRecord]) -> "LogBatch":
+        batch = cls()
+        for record in records:
+            batch.append_record(record)
+        return batch
+
+    def append_record(self, record: LogRecord) -> None:
+        self.timestamps.append(to_epoch_micros(record.timestamp))
+        self.bytes_transferred.append(record.bytes_transferred)
+        self.source_ip.append(record.source_ip)
+        self.destination_ip.append(record.destination_ip)
+        self.protocol.append(record.protocol)
+        self.action.append(record.action)
+        self.region.append(record.region)
+        self.user.append(record.user)
+        self.resource.append(record.resource)
+        self.status.append(record.status)
+
+    def append_row(self, row: Sequence[str]) -> None:
+        """Append a CSV row whose values are ordered as ``LOG_FIELDNAMES``."""
+
+        try:
+            timestamp = datetime.fromisoformat(row[0])
+        except ValueError as exc:
+            raise ValueError(f"Invalid timestamp: {row[0]}") from exc
+        self.append_parsed(to_epoch_micros(timestamp), row)
+
+    def append_parsed(self, timestamp: int, row: Sequence[str]) -> None:
+        """Append a row whose timestamp is already in epoch microseconds."""
 
-    with path.open(newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        records = [LogRecord.from_row(row) for row in reader]
+        self.timestamps.append(timestamp)
+        self.source_ip.append(row[1])
+        self.destination_ip.append(row[2])
+        self.protocol.append(row[3])
+        self.bytes_transferred.append(int(row[4]))
+        self.action.append(row[5])
+        self.region.append(row[6])
+        self.user.append(row[7])
+        self.resource.append(row[8])
+        self.status.append(row[9])
+
+    def slice(self, start: int, stop: int) -> "LogBatch":
+        """Return rows ``start:stop``; memory-mapped columns are not copied."""
+
+        return LogBatch(
+            timestamps=self.timestamps[start:stop],
+            bytes_transferred=self.bytes_transferred[start:stop],
+            **{name: getattr(self, name).slice(start, stop) for name in STRING_COLUMNS},
+        )
+
+    def extend_columns(self, columns: Sequence[Sequence[str]], timestamps: TimestampCache) -> None:
+        """Append a block of rows given as ``LOG_FIELDNAMES``-ordered columns."""
+
+        self.timestamps.extend(timestamps.to_micros_many(columns[0]))
+        self.bytes_transferred.extend(map(int, columns[4]))
+        self.source_ip.extend(columns[1])
+        self.destination_ip.extend(columns[2])
+        self.protocol.extend(columns[3])
+        self.action.extend(columns[5])
+        self.region.extend(columns[6])
+        self.user.extend(columns[7])
+        self.resource.extend(columns[8])
+        self.status.extend(columns[9])
+
+    def take(self, indices: Sequence[int]) -> "LogBatch":
+        """Return the rows at ``indices`` (in that order), sharing vocabularies."""
+
+        strings = {}
+        for name in STRING_COLUMNS:
+            source: StringColumn = getattr(self, name)
+            column = StringColumn(source.vocabulary)
+            column.codes = array("I", map(source.codes.__getitem__, indices))
+            strings[name] = column
+        return LogBatch(
+            timestamps=array("q", map(self.timestamps.__getitem__, indices)),
+            bytes_transferred=array("q", map(self.bytes_transferred.__getitem__, indices)),
+            **strings,
+        )
+
+    def in_range(self, start: int | None, end: int | None) -> "LogBatch":
+        """Return rows with ``start <= timestamp < end`` (epoch microseconds).
+
+        Either bound may be ``None``. Batches whose rows are in timestamp
+        order are cut with two bisections and sliced without copying.
+        """
+
+        timestamps = self.timestamps
+        if not len(timestamps):
+            return self
+        lowest, highest = min(timestamps), max(timestamps)
+        low = lowest if start is None else start
+        high = highest + 1 if end is None else end
+        if lowest >= low and highest < high:
+            return self
+        if all(map(operator.le, timestamps[:-1], timestamps[1:])):
+            return self.slice(bisect_left(timestamps, low), bisect_left(timestamps, high))
+        return self.take([idx for idx, value in enumerate(timestamps) if low <= value < high])
+
+    def extend_batch(self, other: "LogBatch") -> None:
+        """Append every row of ``other``, e.g. a batch parsed in another process."""
+
+        self.timestamps.extend(other.timestamps)
+        self.bytes_transferred.extend(other.bytes_transferred)
+        for name in STRING_COLUMNS:
+            getattr(self, name).extend_column(getattr(other, name))
+
+    def timestamp(self, idx: int) -> datetime:
+        return from_epoch_micros(self.timestamps[idx])
+
+    def record(self, idx: int) -> LogRecord:
+        return LogRecord(
+            timestamp=self.timestamp(idx),
+            source_ip=self.source_ip[idx],
+            destination_ip=self.destination_ip[idx],
+            protocol=self.protocol[idx],
+            bytes_transferred=self.bytes_transferred[idx],
+            action=self.action[idx],
+            region=self.region[idx],
+            user=self.user[idx],
+            resource=self.resource[idx],
+            status=self.status[idx],
+        )
+
+    def records(self) -> Iterator[LogRecord]:
+        for idx in range(len(self)):
+            yield self.record(idx)
+
+
+def from_epoch_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def load_logs(
+    path: Path, use_mmap: bool = False, start: datetime | None = None, end: datetime | None = None
+) -> List[LogRecord]:
+    """Load logs from a CSV file, a columnar file, or a directory or glob of them."""
+
+    records = list(iter_logs(path, use_mmap=use_mmap, start=start, end=end))
 
     issues = validate_records(records)
     if issues:
@@ -66,23 +481,242 @@ def load_logs(path: Path) -> List[LogRecord]:
     return records
 
 
+def iter_logs(
+    path: Path, use_mmap: bool = False, start: datetime | None = None, end: datetime | None = None
+) -> Iterator[LogRecord]:
+    """Yield log records from a CSV file one row at a time.
+
+    Unlike :func:`load_logs` this never holds more than the current row in
+    memory and does not validate; callers that stream should validate each
+    chunk they process.
+    """
+
+    paths = _resolve_log_paths(path, start, end)
+    if start is not None or end is not None or len(paths) != 1 or paths[0] != path:
+        batches = iter_batches(path, PARSE_BLOCK_SIZE, use_mmap, start=start, end=end)
+        return (record for batch in batches for record in batch.records())
+    if _is_binary_log(path):
+        return _read_binary_log(path).records()
+    return _iter_csv_rows(path, use_mmap)
+
+
+def iter_chunks(records: Iterable[LogRecord], chunk_size: int) -> Iterator[List[LogRecord]]:
+    """Group an iterable of records into lists of at most ``chunk_size``."""
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be greater than 0")
+    chunk: List[LogRecord] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_batch(
+    path: Path,
+    use_mmap: bool = False,
+    workers: int = 1,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> LogBatch:
+    """Load a CSV or columnar log file into a single :class:`LogBatch`.
+
+    Columnar files written by ``nsms convert`` are memory-mapped instead of
+    parsed; see :mod:`nsms.binary_log`. ``path`` may also be a directory or a
+    glob, in which case files are parsed by up to ``workers`` processes and
+    merged as described in :mod:`nsms.ingest`. With ``start``/``end`` only
+    rows in ``[start, end)`` are kept; a partitioned directory (see
+    :mod:`nsms.partitions`) only has its overlapping partitions opened, and
+    a CSV with a timestamp index (see :mod:`nsms.log_index`) is only parsed
+    from the indexed offset nearest ``start``.
+    """
+
+    window = _window_micros(start, end)
+    paths = _resolve_log_paths(path, start, end)
+    if len(paths) != 1 or paths[0] != path:
+        from nsms.ingest import load_files
+
+        batch = load_files(paths, workers=workers, use_mmap=use_mmap)
+    else:
+        batch = read_log_file(path, use_mmap, byte_range=_indexed_byte_range(path, window))
+    batch = batch.in_range(*window)
+
+    issues = validate_batch(batch)
+    if issues:
+        logger.warning("%s validation issues detected", len(issues))
+
+    logger.info("Loaded %s log records", len(batch))
+    return batch
+
+
+def read_log_file(
+    path: Path, use_mmap: bool = False, byte_range: Tuple[int, int | None] | None = None
+) -> LogBatch:
+    """Read one CSV or columnar file into a :class:`LogBatch` without validating.
+
+    ``byte_range`` limits a CSV to the records in ``[first, stop)`` bytes.
+    """
+
+    if _is_binary_log(path):
+        return _read_binary_log(path)
+    return next(_iter_csv_batches(path, 0, use_mmap, byte_range))
+
+
+def iter_batches(
+    path: Path,
+    batch_size: int,
+    use_mmap: bool = False,
+    workers: int = 1,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[LogBatch]:
+    """Yield batches of at most ``batch_size`` rows from a CSV or columnar file.
+
+    Directories and globs are read file by file; see :mod:`nsms.ingest`.
+    ``start``/``end`` restrict rows and partitions as in :func:`load_batch`.
+    """
+
+    if batch_size <= 0:
+        raise ValueError("batch_size must be greater than 0")
+    window = _window_micros(start, end)
+    paths = _resolve_log_paths(path, start, end)
+    if len(paths) != 1 or paths[0] != path:
+        from nsms.ingest import iter_file_batches
+
+        batches = iter_file_batches(paths, batch_size, workers=workers, use_mmap=use_mmap)
+    elif _is_binary_log(path):
+        from nsms.binary_log import iter_binary_batches
+
+        batches = iter_binary_batches(path, batch_size)
+    else:
+        batches = _iter_csv_batches(path, batch_size, use_mmap, _indexed_byte_range(path, window))
+    if window == (None, None):
+        return batches
+    return (batch for batch in (batch.in_range(*window) for batch in batches) if len(batch))
+
+
+def _window_micros(start: datetime | None, end: datetime | None) -> Tuple[int | None, int | None]:
+    return (
+        None if start is None else to_epoch_micros(start),
+        None if end is None else to_epoch_micros(end),
+    )
+
+
+def _indexed_byte_range(
+    path: Path, window: Tuple[int | None, int | None]
+) -> Tuple[int, int | None] | None:
+    if window == (None, None):
+        return None
+    from nsms.log_index import indexed_byte_range
+
+    return indexed_byte_range(path, *window)
+
+
+def _resolve_log_paths(
+    path: Path, start: datetime | None = None, end: datetime | None = None
+) -> List[Path]:
+    from nsms.ingest import resolve_log_paths
+
+    return resolve_log_paths(path, start, end)
+
+
+def _is_binary_log(path: Path) -> bool:
+    # nsms.binary_log builds on the types in this module, so it is imported
+    # where needed rather than at module import time.
+    from nsms.binary_log import is_binary_log
+
+    return is_binary_log(path)
+
+
+def _read_binary_log(path: Path) -> LogBatch:
+    from nsms.binary_log import read_binary_log
+
+    return read_binary_log(path)
+
+
+def _iter_csv_batches(
+    path: Path, batch_size: int, use_mmap: bool, byte_range: Tuple[int, int | None] | None = None
+) -> Iterator[LogBatch]:
+    """Parse rows into batches; ``batch_size=0`` means a single batch."""
+
+    timestamps = TimestampCache()
+    batch = LogBatch()
+    for columns in _iter_column_blocks(path, use_mmap, byte_range):
+        while batch_size and len(batch) + len(columns[0]) >= batch_size:
+            take = batch_size - len(batch)
+            batch.extend_columns([column[:take] for column in columns], timestamps)
+            columns = [column[take:] for column in columns]
+            yield batch
+            batch = LogBatch()
+        batch.extend_columns(columns, timestamps)
+    if len(batch) or not batch_size:
+        yield batch
+
+
+def _iter_csv_rows(path: Path, use_mmap: bool) -> Iterator[LogRecord]:
+    interned = [LOG_FIELDNAMES.index(name) for name in INTERNED_COLUMNS]
+    for columns in _iter_column_blocks(path, use_mmap):
+        for position in interned:
+            columns[position] = SYMBOLS.intern_many(LOG_FIELDNAMES[position], columns[position])
+        for row in zip(*columns):
+            yield LogRecord.from_fields(row)
+
+
+def _iter_column_blocks(
+    path: Path, use_mmap: bool, byte_range: Tuple[int, int | None] | None = None
+) -> Iterator[List[Sequence[str]]]:
+    """Yield blocks of columns ordered as ``LOG_FIELDNAMES``.
+
+    Files with the exact ``write_logs`` header take the split-based fast path
+    in :mod:`nsms.csv_fast`; any other column order goes through ``csv``.
+    """
+
+    header = read_header(path)
+    if not header:
+        return
+    if byte_range is not None:
+        positions = column_positions(header)
+        for columns in iter_range_column_blocks(path, len(header), *byte_range):
+            yield [columns[position] for position in positions]
+        return
+    if header == LOG_FIELDNAMES:
+        try:
+            yield from iter_column_blocks(path, LOG_FIELDNAMES, use_mmap=use_mmap)
+            return
+        except HeaderMismatch:
+            # Quoted header cells are equal to LOG_FIELDNAMES once parsed by csv.
+            pass
+    positions = column_positions(header)
+    with open_text(path) as handle:
+        reader = csv.reader(handle)
+        next(reader, None)
+        rows: List[Sequence[str]] = []
+        for row in reader:
+            rows.append([row[pos] for pos in positions])
+            if len(rows) >= PARSE_BLOCK_SIZE:
+                yield [list(column) for column in zip(*rows)]
+                rows = []
+        if rows:
+            yield [list(column) for column in zip(*rows)]
+
+
+def column_positions(header: Sequence[str]) -> List[int]:
+    """Return the index in ``header`` of each column of ``LOG_FIELDNAMES``."""
+
+    missing = [name for name in LOG_FIELDNAMES if name not in header]
+    if missing:
+        raise ValueError(f"Log file is missing columns: {', '.join(missing)}")
+    return [list(header).index(name) for name in LOG_FIELDNAMES]
+
+
 def write_logs(path: Path, records: Sequence[LogRecord]) -> None:
     """Write logs back to CSV for reproducibility."""
 
-    fieldnames = [
-        "timestamp",
-        "source_ip",
-        "destination_ip",
-        "protocol",
-        "bytes",
-        "action",
-        "region",
-        "user",
-        "resource",
-        "status",
-    ]
     with path.open("w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=fieldnames)
+        writer = csv.DictWriter(handle, fieldnames=LOG_FIELDNAMES)
         writer.writeheader()
         for record in records:
             writer.writerow(
@@ -105,6 +739,14 @@ def summarize_protocols(records: Iterable[LogRecord]) -> dict[str, int]:
     """Count logs by protocol."""
 
     counts: dict[str, int] = {}
+    if isinstance(records, LogBatch):
+        column = records.protocol
+        code_counts = [0] * len(column.values)
+        for code in column.codes:
+            code_counts[code] += 1
+        # Report protocols in order of first appearance, like the record path;
+        # code order depends on what else the shared vocabulary has seen.
+        return {column.values[code]: code_counts[code] for code in dict.fromkeys(column.codes)}
     for record in records:
         counts[record.protocol] = counts.get(record.protocol, 0) + 1
     return counts
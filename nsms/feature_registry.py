@@ -0,0 +1,259 @@
+"""Declarative feature definitions and lazy, per-model feature extraction.
+
+Every feature column the pipeline can compute is a :class:`FeatureDefinition`
+in a :class:`FeatureRegistry`: a name, the features it depends on, and a
+function computing the column for a whole batch from those dependencies.
+A :class:`FeatureExtractor` is built for the features a model declares
+(:attr:`AnomalyModel.required_features`); it resolves their dependencies
+once and then computes only those columns, in dependency order, for each
+batch. Time spent per feature is accumulated in :class:`FeatureTimings`.
+
+Windowed features (see :class:`WindowedFeatureEngine`) are defined by
+pattern: ``source_ip_bytes_300s`` depends on the stateful
+``source_ip_window_300s`` feature, whose engine lives in the extractor and
+carries over from one batch to the next.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Match, Pattern, Sequence, Tuple
+
+from nsms.data import LogBatch
+from nsms.logging_utils import get_logger
+from nsms.preprocessing import (
+    PER_ROW_FEATURES,
+    WINDOW_ENTITY_FIELDS,
+    WINDOW_STATISTICS,
+    FeatureMatrix,
+    WindowedFeatureEngine,
+    assemble_feature_matrix,
+    feature_column,
+    window_feature_names,
+)
+
+
+logger = get_logger("feature_registry")
+
+
+@dataclass
+class FeatureContext:
+    """One batch being featurized: its computed columns and persistent state."""
+
+    batch: LogBatch
+    columns: Dict[str, Any]
+    states: Dict[str, Any]
+
+    def __getitem__(self, name: str) -> Any:
+        return self.columns[name]
+
+
+@dataclass(frozen=True)
+class FeatureDefinition:
+    """How to compute one named feature column for a batch.
+
+    ``compute`` receives a :class:`FeatureContext` in which every name in
+    ``depends_on`` has already been computed. Definitions with ``state``
+    keep an object in ``context.states[name]`` across batches, created by
+    ``state`` and restored from :meth:`as_dict` output by ``restore``.
+    Internal definitions (``output=False``) only feed other features and are
+    not placed in the resulting matrix.
+    """
+
+    name: str
+    compute: Callable[[FeatureContext], Any]
+    depends_on: Tuple[str, ...] = ()
+    state: Callable[[], Any] | None = None
+    restore: Callable[[Dict[str, Any]], Any] | None = None
+    output: bool = True
+    description: str = ""
+
+
+@dataclass
+class FeatureTimings:
+    """Cumulative rows and seconds spent computing each feature."""
+
+    seconds: Dict[str, float] = field(default_factory=dict)
+    rows: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, name: str, rows: int, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.rows[name] = self.rows.get(name, 0) + rows
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "rows": self.rows[name],
+                "seconds": round(seconds, 6),
+                "rows_per_second": round(self.rows[name] / seconds) if seconds > 0 else 0,
+            }
+            for name, seconds in self._slowest_first()
+        }
+
+    def log(self, label: str) -> None:
+        if self.seconds:
+            logger.info(
+                "%s feature timings: %s",
+                label,
+                ", ".join(f"{name} {seconds:.4f}s" for name, seconds in self._slowest_first()),
+            )
+
+    def _slowest_first(self) -> List[Tuple[str, float]]:
+        return sorted(self.seconds.items(), key=lambda item: -item[1])
+
+
+class FeatureRegistry:
+    """Named feature definitions plus factories for pattern-named families."""
+
+    def __init__(self) -> None:
+        self._definitions: Dict[str, FeatureDefinition] = {}
+        self._patterns: List[Tuple[Pattern[str], Callable[[Match[str]], FeatureDefinition]]] = []
+
+    def register(self, definition: FeatureDefinition) -> FeatureDefinition:
+        if definition.name in self._definitions:
+            raise ValueError(f"Feature already registered: {definition.name}")
+        self._definitions[definition.name] = definition
+        return definition
+
+    def register_pattern(
+        self, pattern: str, factory: Callable[[Match[str]], FeatureDefinition]
+    ) -> None:
+        """Define every feature whose full name matches ``pattern`` through ``factory``."""
+
+        self._patterns.append((re.compile(pattern), factory))
+
+    def definition(self, name: str) -> FeatureDefinition:
+        definition = self._definitions.get(name)
+        if definition is not None:
+            return definition
+        for pattern, factory in self._patterns:
+            match = pattern.fullmatch(name)
+            if match:
+                return factory(match)
+        raise KeyError(f"Unknown feature: {name}")
+
+    def resolve(self, names: Iterable[str]) -> List[FeatureDefinition]:
+        """Return ``names`` and their dependencies, each after what it depends on."""
+
+        ordered: Dict[str, FeatureDefinition] = {}
+        visiting: List[str] = []
+
+        def visit(name: str) -> None:
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Feature dependency cycle: {' -> '.join(visiting + [name])}")
+            definition = self.definition(name)
+            visiting.append(name)
+            for dependency in definition.depends_on:
+                visit(dependency)
+            visiting.pop()
+            ordered[name] = definition
+
+        for name in names:
+            visit(name)
+        return list(ordered.values())
+
+
+class FeatureExtractor:
+    """Compute the features in ``names`` (and nothing else) batch by batch."""
+
+    def __init__(self, names: Sequence[str], registry: FeatureRegistry | None = None) -> None:
+        self.names = list(names)
+        self.registry = registry or REGISTRY
+        self.plan = self.registry.resolve(self.names)
+        self.states: Dict[str, Any] = {
+            definition.name: definition.state()
+            for definition in self.plan
+            if definition.state is not None
+        }
+        self.timings = FeatureTimings()
+
+    def extract(self, batch: LogBatch) -> FeatureMatrix:
+        context = FeatureContext(batch=batch, columns={}, states=self.states)
+        for definition in self.plan:
+            start = time.perf_counter()
+            context.columns[definition.name] = definition.compute(context)
+            self.timings.record(definition.name, len(batch), time.perf_counter() - start)
+        wanted = {definition.name for definition in self.plan if definition.output}
+        return assemble_feature_matrix(
+            len(batch), {name: column for name, column in context.columns.items() if name in wanted}
+        )
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "names": self.names,
+            "states": {name: state.as_dict() for name, state in self.states.items()},
+        }
+
+    @classmethod
+    def from_dict(
+        cls, payload: Dict[str, Any], registry: FeatureRegistry | None = None
+    ) -> "FeatureExtractor":
+        extractor = cls(payload["names"], registry)
+        for definition in extractor.plan:
+            saved = payload["states"].get(definition.name)
+            if saved is not None and definition.restore is not None:
+                extractor.states[definition.name] = definition.restore(saved)
+        return extractor
+
+
+def feature_names(windows: Sequence[int] = ()) -> List[str]:
+    """The per-row features followed by the windowed columns over ``windows``."""
+
+    return list(PER_ROW_FEATURES) + window_feature_names(windows)
+
+
+def _per_row_definition(name: str, description: str) -> FeatureDefinition:
+    return FeatureDefinition(
+        name=name,
+        compute=lambda context: feature_column(context.batch, name),
+        description=description,
+    )
+
+
+def _window_state_definition(match: Match[str]) -> FeatureDefinition:
+    entity, window = match.group(1), int(match.group(2))
+    name = match.group(0)
+    return FeatureDefinition(
+        name=name,
+        compute=lambda context: context.states[name].update(context.batch, context["is_denied"]),
+        depends_on=("is_denied",),
+        state=lambda: WindowedFeatureEngine([window], entities=[entity]),
+        restore=WindowedFeatureEngine.from_dict,
+        output=False,
+        description=f"Rolling {entity} aggregates over {window}s",
+    )
+
+
+def _window_column_definition(match: Match[str]) -> FeatureDefinition:
+    entity, statistic, window = match.group(1), match.group(2), match.group(3)
+    name = match.group(0)
+    source = f"{entity}_window_{window}s"
+    return FeatureDefinition(
+        name=name,
+        compute=lambda context: context[source][name],
+        depends_on=(source,),
+        description=f"{statistic} per {entity} over the last {window}s",
+    )
+
+
+def _build_default_registry() -> FeatureRegistry:
+    registry = FeatureRegistry()
+    registry.register(_per_row_definition("bytes_transferred", "Bytes transferred by the request"))
+    registry.register(_per_row_definition("is_denied", "Status is anything but OK"))
+    registry.register(
+        _per_row_definition("is_sensitive_resource", "Resource path mentions 'sensitive'")
+    )
+    registry.register(_per_row_definition("is_admin_user", "User name starts with 'admin'"))
+    entities = "|".join(WINDOW_ENTITY_FIELDS)
+    registry.register_pattern(rf"({entities})_window_(\d+)s", _window_state_definition)
+    registry.register_pattern(
+        rf"({entities})_({'|'.join(WINDOW_STATISTICS)})_(\d+)s", _window_column_definition
+    )
+    return registry
+
+
+REGISTRY = _build_default_registry()
@@ -0,0 +1,326 @@
+"""On-disk cache of extracted feature matrices.
+
+``nsms train``, ``nsms run`` and the legacy scripts all need the features of
+the same ``data_path``. The first command to extract them writes the
+:class:`FeatureMatrix` to ``feature_cache_dir`` and later commands map it
+back in, skipping CSV parsing entirely when only features are needed.
+
+Layout of a ``.nsmsfeat`` entry::
+
+    b"NSMSFEA1"             magic
+    uint32 (little endian)  length of the JSON header
+    JSON header             rows, byte order, column layout, sources
+    padding                 to an 8-byte boundary
+    bytes column            float32 or float64, padded to 8 bytes
+    flags                   int8, row-major ``(rows, 3)``, padded to 8 bytes
+    windowed columns        float64 each, in header order
+
+Entries are keyed by the feature schema version, the ``[start, end)``
+time range, the names of the extracted features, and the path, size, mtime
+and inode of every input file, so rewriting an input or asking for other
+features is a cache miss.
+Each hit refreshes the entry's mtime; after a write the least recently used
+entries are removed until the cache fits in its size budget.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import List, Sequence
+
+from nsms.config import Config
+from nsms.csv_fast import to_epoch_micros
+from nsms.data import LogBatch, load_batch
+from nsms.feature_registry import FeatureExtractor, feature_names
+from nsms.ingest import resolve_log_paths
+from nsms.logging_utils import get_logger
+from nsms.preprocessing import FEATURE_SCHEMA_VERSION, FLAG_COLUMNS, FeatureMatrix
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; entries are then read as memoryviews.
+    np = None
+
+
+logger = get_logger("feature_store")
+
+MAGIC = b"NSMSFEA1"
+ENTRY_SUFFIX = ".nsmsfeat"
+ALIGNMENT = 8
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+class FeatureStore:
+    """Directory of cached feature matrices with a least-recently-used budget."""
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(
+        self,
+        paths: Sequence[Path],
+        start: datetime | None = None,
+        end: datetime | None = None,
+        names: Sequence[str] = (),
+    ) -> str:
+        """Return the cache key for features ``names`` of ``paths`` within ``[start, end)``."""
+
+        material = _key_material(paths, start, end, names)
+        return hashlib.sha256(json.dumps(material).encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}{ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> FeatureMatrix | None:
+        """Map the entry for ``key``, or return ``None`` when it is missing or unusable."""
+
+        path = self.entry_path(key)
+        try:
+            matrix = read_feature_matrix(path)
+        except FileNotFoundError:
+            return None
+        except ValueError as exc:
+            logger.warning("Ignoring feature cache entry %s: %s", path, exc)
+            return None
+        os.utime(path)
+        logger.info("Loaded %s cached feature rows from %s", len(matrix), path)
+        return matrix
+
+    def put(self, key: str, matrix: FeatureMatrix, sources: Sequence[Path] = ()) -> Path | None:
+        """Store ``matrix`` under ``key`` and evict old entries.
+
+        Returns ``None`` without writing when the entry alone would exceed
+        the size budget.
+        """
+
+        if _entry_size(matrix) > self.max_bytes:
+            logger.info(
+                "Not caching %s feature rows; larger than the %s byte budget",
+                len(matrix),
+                self.max_bytes,
+            )
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.entry_path(key)
+        write_feature_matrix(path, matrix, sources)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Path | None = None) -> int:
+        """Delete least recently used entries until the cache fits; return the count."""
+
+        if not self.directory.exists():
+            return 0
+        entries = []
+        for path in self.directory.glob(f"*{ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("Evicted %s feature cache entries from %s", removed, self.directory)
+        return removed
+
+
+def open_feature_store(config: Config) -> FeatureStore | None:
+    if config.feature_cache_dir is None:
+        return None
+    return FeatureStore(config.feature_cache_dir, config.feature_cache_max_mb * 1024 * 1024)
+
+
+def cached_features(config: Config, names: Sequence[str] | None = None) -> FeatureMatrix | None:
+    """Return the cached features ``names`` of ``config.data_path``, if any.
+
+    ``names`` defaults to the per-row features plus the columns of
+    ``config.feature_windows``.
+    """
+
+    store = open_feature_store(config)
+    if store is None:
+        return None
+    names = feature_names(config.feature_windows) if names is None else names
+    paths = resolve_log_paths(config.data_path, config.window_start, config.window_end)
+    return store.get(store.key(paths, config.window_start, config.window_end, names))
+
+
+def load_features(
+    config: Config, batch: LogBatch | None = None, names: Sequence[str] | None = None
+) -> FeatureMatrix:
+    """Return the features ``names`` of ``config.data_path``, from the cache when fresh.
+
+    ``names`` defaults as in :func:`cached_features`. On a miss only those
+    features are extracted, from ``batch`` (loaded from ``data_path`` when
+    not given), and stored for the next command.
+    """
+
+    names = feature_names(config.feature_windows) if names is None else names
+    store = open_feature_store(config)
+    if store is None:
+        return _extract(names, batch if batch is not None else _load(config))
+    start, end = config.window_start, config.window_end
+    paths = resolve_log_paths(config.data_path, start, end)
+    key = store.key(paths, start, end, names)
+    matrix = store.get(key)
+    if matrix is not None:
+        return matrix
+    matrix = _extract(names, batch if batch is not None else _load(config))
+    if store.key(paths, start, end, names) == key:
+        store.put(key, matrix, paths)
+    else:
+        logger.warning("%s changed while it was read; not caching its features", config.data_path)
+    return matrix
+
+
+def write_feature_matrix(path: Path, matrix: FeatureMatrix, sources: Sequence[Path] = ()) -> None:
+    bytes_column = _buffer(matrix.bytes_transferred)
+    flags = _buffer(matrix.flags)
+    windowed = [_buffer(column) for column in matrix.windowed.values()]
+    header = {
+        "version": FEATURE_SCHEMA_VERSION,
+        "rows": len(matrix),
+        "byteorder": sys.byteorder,
+        "bytes_typecode": "f" if bytes_column.itemsize == 4 else "d",
+        "flag_columns": list(FLAG_COLUMNS),
+        "windowed": list(matrix.windowed),
+        "sources": [str(source) for source in sources],
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix_size = len(MAGIC) + 4 + len(header_bytes)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        with tmp_path.open("wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<I", len(header_bytes)))
+            out.write(header_bytes)
+            out.write(b"\0" * (_aligned(prefix_size) - prefix_size))
+            out.write(bytes_column)
+            out.write(b"\0" * (_aligned(bytes_column.nbytes) - bytes_column.nbytes))
+            out.write(flags)
+            out.write(b"\0" * (_aligned(flags.nbytes) - flags.nbytes))
+            for column in windowed:
+                out.write(column)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def read_feature_matrix(path: Path) -> FeatureMatrix:
+    """Memory-map a cached matrix; raises ``ValueError`` if it cannot be used here."""
+
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size < len(MAGIC) + 4:
+            raise ValueError("truncated entry")
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[: len(MAGIC)] != MAGIC:
+        mapped.close()
+        raise ValueError("not a feature cache entry")
+    (header_size,) = struct.unpack_from("<I", mapped, len(MAGIC))
+    header_start = len(MAGIC) + 4
+    header = json.loads(mapped[header_start : header_start + header_size].decode("utf-8"))
+    if (
+        header["version"] != FEATURE_SCHEMA_VERSION
+        or header["flag_columns"] != list(FLAG_COLUMNS)
+        or header["byteorder"] != sys.byteorder
+    ):
+        mapped.close()
+        raise ValueError("written by an incompatible feature schema or platform")
+    rows = header["rows"]
+    typecode = header["bytes_typecode"]
+    bytes_start = _aligned(header_start + header_size)
+    bytes_size = rows * array(typecode).itemsize
+    flags_start = bytes_start + _aligned(bytes_size)
+    windowed_start = flags_start + _aligned(rows * len(FLAG_COLUMNS))
+    names = header["windowed"]
+    if windowed_start + 8 * rows * len(names) > size:
+        mapped.close()
+        raise ValueError("truncated entry")
+    offsets = {name: windowed_start + 8 * rows * position for position, name in enumerate(names)}
+    if np is not None:
+        bytes_column = np.frombuffer(
+            mapped, dtype=np.dtype(typecode), count=rows, offset=bytes_start
+        )
+        flags = np.frombuffer(
+            mapped, dtype=np.int8, count=rows * len(FLAG_COLUMNS), offset=flags_start
+        )
+        return FeatureMatrix(
+            bytes_transferred=bytes_column,
+            flags=flags.reshape(rows, len(FLAG_COLUMNS)),
+            windowed={
+                name: np.frombuffer(mapped, dtype=np.float64, count=rows, offset=offset)
+                for name, offset in offsets.items()
+            },
+        )
+    view = memoryview(mapped)
+    return FeatureMatrix(
+        bytes_transferred=view[bytes_start : bytes_start + bytes_size].cast(typecode),
+        flags=view[flags_start : flags_start + rows * len(FLAG_COLUMNS)].cast("b"),
+        windowed={
+            name: view[offset : offset + 8 * rows].cast("d") for name, offset in offsets.items()
+        },
+    )
+
+
+def _extract(names: Sequence[str], batch: LogBatch) -> FeatureMatrix:
+    extractor = FeatureExtractor(names)
+    matrix = extractor.extract(batch)
+    extractor.timings.log("Extracted")
+    return matrix
+
+
+def _load(config: Config) -> LogBatch:
+    return load_batch(
+        config.data_path, workers=config.workers, start=config.window_start, end=config.window_end
+    )
+
+
+def _key_material(
+    paths: Sequence[Path], start: datetime | None, end: datetime | None, names: Sequence[str]
+) -> List[object]:
+    files = []
+    for path in paths:
+        stat = path.stat()
+        files.append([str(path.resolve()), stat.st_size, stat.st_mtime_ns, stat.st_ino])
+    window = [None if value is None else to_epoch_micros(value) for value in (start, end)]
+    return [FEATURE_SCHEMA_VERSION, window, list(names), files]
+
+
+def _buffer(column: object) -> memoryview:
+    if np is not None and isinstance(column, np.ndarray):
+        column = np.ascontiguousarray(column)
+    view = memoryview(column)
+    return view if view.c_contiguous else memoryview(view.tobytes()).cast(view.format)
+
+
+def _entry_size(matrix: FeatureMatrix) -> int:
+    flags_size = _aligned(len(matrix) * len(FLAG_COLUMNS))
+    return (
+        _aligned(memoryview(matrix.bytes_transferred).nbytes)
+        + flags_size
+        + 8 * len(matrix) * len(matrix.windowed)
+    )
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,425 @@
+"""Follow a growing CSV log and process new rows in micro-batches.
+
+``nsms follow`` tails ``data_path`` the way ``tail -F`` does: rows are
+processed as they are appended, a rotated file is drained before the new one
+is opened, and a truncated file is re-read from the start. Truncation is
+noticed even when the file has already grown past the old offset again (as
+with ``copytruncate``): the follower keeps a digest of the header and of the
+bytes just before its offset and starts over when they change. A
+malformed record is logged with its byte offset and skipped.
+
+After every micro-batch the alerts and incidents are fsynced and a
+checkpoint is atomically replaced in ``output_dir``. The checkpoint holds
+the byte offset of the last processed record, the sizes of the output
+files at that point, and the running metrics. A restart truncates the
+outputs back to those sizes and resumes at the offset. Rows are therefore
+never counted twice and incidents are never duplicated, even after a crash
+between writing outputs and saving the checkpoint.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Deque, Dict, List, Tuple
+
+from nsms.binary_log import is_binary_log
+from nsms.compression import detect_compression
+from nsms.config import Config
+from nsms.csv_fast import TimestampCache, parse_block, record_boundary
+from nsms.data import LogBatch, column_positions
+from nsms.logging_utils import get_logger
+from nsms.model import AnomalyModel
+from nsms.model_registry import ModelRegistry, ModelWatcher
+from nsms.monitoring import BatchProcessor, PipelineState, load_current_model
+from nsms.reference_data import ReferenceWatcher
+from nsms.retention import enforce_retention
+from nsms.validators import validate_batch
+
+
+logger = get_logger("follow")
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_NAME = "follow_checkpoint.json"
+STATUS_NAME = "follow_status.json"
+MAX_BATCH_BYTES = 1024 * 1024
+LATENCY_WINDOW = 1024
+FINGERPRINT_BYTES = 4096
+
+
+def _fingerprint(handle: BinaryIO, offset: int) -> str:
+    """Digest of the first and the last ``FINGERPRINT_BYTES`` before ``offset``."""
+
+    handle.seek(0)
+    head = handle.read(min(FINGERPRINT_BYTES, offset))
+    tail_start = max(0, offset - FINGERPRINT_BYTES)
+    handle.seek(tail_start)
+    tail = handle.read(offset - tail_start)
+    return hashlib.sha1(head + tail).hexdigest()
+
+
+@dataclass
+class FollowCheckpoint:
+    """Durable position of a follower in ``data_path`` and its outputs."""
+
+    data_path: str
+    device: int
+    inode: int
+    offset: int
+    fingerprint: str
+    header: List[str] | None
+    alerts_size: int
+    incidents_size: int
+    state: Dict[str, object]
+    version: int = CHECKPOINT_VERSION
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(asdict(self), handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FollowCheckpoint | None":
+        if not path.exists():
+            return None
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if payload.get("version") != CHECKPOINT_VERSION:
+            logger.warning(
+                "Ignoring checkpoint %s with unsupported version %s", path, payload.get("version")
+            )
+            return None
+        return cls(**payload)
+
+
+class LatencyTracker:
+    """Ingest-to-alert latency over the most recent micro-batches."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {"batches": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "batches": self.count,
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+class LogFollower:
+    """Tail ``config.data_path`` and feed new rows through the pipeline.
+
+    Latency is measured from the moment new rows are read from the log to
+    the moment their alerts and incidents are durably written.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        model: AnomalyModel | None = None,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+    ) -> None:
+        path = config.data_path
+        if not path.is_file() or detect_compression(path) is not None or is_binary_log(path):
+            raise ValueError(f"follow mode needs a plain CSV data_path: {path}")
+        config.ensure_output_dir()
+        self.config = config
+        self.path = path
+        self.max_batch_bytes = max_batch_bytes
+        self.checkpoint_path = config.output_dir / CHECKPOINT_NAME
+        self.status_path = config.output_dir / STATUS_NAME
+        self.alerts_path = config.output_dir / "alerts.jsonl"
+        self.incidents_path = config.output_dir / "incidents.jsonl"
+        self.latency = LatencyTracker()
+
+        self._handle: BinaryIO | None = None
+        self._identity: Tuple[int, int] | None = None
+        self._offset = 0
+        self._fingerprint = ""
+        self._header: List[str] | None = None
+        self._positions: List[int] = []
+        self._timestamps = TimestampCache()
+
+        checkpoint = self._load_checkpoint()
+        state = PipelineState.from_dict(checkpoint.state) if checkpoint else None
+        # Without an explicit model, a registry's new versions are swapped in
+        # between micro-batches as they are published.
+        self.watcher: ModelWatcher | None = None
+        if model is None and config.model_registry is not None:
+            self.watcher = ModelWatcher(
+                ModelRegistry(config.model_registry), config.model_reload_seconds
+            ).start()
+            model = self.watcher.model
+        # Likewise edits to the compliance rules or threat intel, when enabled.
+        self.references: ReferenceWatcher | None = None
+        if config.reference_reload_seconds is not None:
+            self.references = ReferenceWatcher(config, config.reference_reload_seconds).start()
+        self.processor = BatchProcessor(
+            config, model or load_current_model(config), state, self.watcher, self.references
+        )
+        mode = "a" if checkpoint else "w"
+        self._alerts = self.alerts_path.open(mode, encoding="utf-8")
+        self._incidents = self.incidents_path.open(mode, encoding="utf-8")
+        self._resume = checkpoint
+
+    def run(self, poll_interval: float = 1.0, max_polls: int | None = None) -> Path:
+        """Poll until interrupted (or ``max_polls`` polls) and return ``output_dir``."""
+
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                polls += 1
+                if not self.poll() and (max_polls is None or polls < max_polls):
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            logger.info("Follow interrupted; resume from %s", self.checkpoint_path)
+        finally:
+            self.close()
+        enforce_retention(self.config.output_dir, self.config.retention_days)
+        self.processor.state.extractor.timings.log("Follow")
+        logger.info(
+            "Followed %s to offset %s: %s records, latency %s",
+            self.path,
+            self._offset,
+            self.processor.state.counter.total_records,
+            self.latency.summary(),
+        )
+        return self.config.output_dir
+
+    def poll(self) -> int:
+        """Process every complete record appended since the last poll."""
+
+        processed = self._check_file()
+        if self._handle is None:
+            return processed
+        while True:
+            rows = self._process_next(final=False)
+            if rows is None:
+                return processed
+            processed += rows
+
+    def close(self) -> None:
+        for watcher in (self.watcher, self.references):
+            if watcher is not None:
+                watcher.stop()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self._alerts.close()
+        self._incidents.close()
+
+    def _load_checkpoint(self) -> FollowCheckpoint | None:
+        checkpoint = FollowCheckpoint.load(self.checkpoint_path)
+        if checkpoint is None:
+            return None
+        if checkpoint.data_path != str(self.path):
+            logger.warning(
+                "Checkpoint is for %s, not %s; starting over", checkpoint.data_path, self.path
+            )
+            return None
+        for path, size in (
+            (self.alerts_path, checkpoint.alerts_size),
+            (self.incidents_path, checkpoint.incidents_size),
+        ):
+            if not path.exists() or path.stat().st_size < size:
+                logger.warning("%s is shorter than the checkpoint expects; starting over", path)
+                return None
+        # Drop anything written after the checkpoint; it is reprocessed below.
+        os.truncate(self.alerts_path, checkpoint.alerts_size)
+        os.truncate(self.incidents_path, checkpoint.incidents_size)
+        return checkpoint
+
+    def _check_file(self) -> int:
+        """Follow rotation and truncation; return rows drained from a rotated file."""
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Between a rotation's rename and the new file being created.
+            return 0
+        drained = 0
+        identity = (stat.st_dev, stat.st_ino)
+        if self._handle is None:
+            resume = self._resume
+            self._resume = None
+            if resume is not None and (resume.device, resume.inode) == identity:
+                self._open(identity, resume.offset, resume.header, resume.fingerprint)
+                logger.info("Resuming %s at byte %s", self.path, resume.offset)
+            else:
+                if resume is not None:
+                    logger.warning(
+                        "%s was rotated while stopped; reading from the start", self.path
+                    )
+                self._open(identity, 0, None, "")
+        elif identity != self._identity:
+            logger.info("%s was rotated; draining the previous file", self.path)
+            while True:
+                rows = self._process_next(final=True)
+                if rows is None:
+                    break
+                drained += rows
+            self._handle.close()
+            self._open(identity, 0, None, "")
+        # A copytruncate may already have regrown the file past the offset,
+        # so compare the bytes before it rather than only the size.
+        if self._offset and (
+            stat.st_size < self._offset
+            or _fingerprint(self._handle, self._offset) != self._fingerprint
+        ):
+            logger.warning("%s was truncated or rewritten; reading from the start", self.path)
+            self._offset = 0
+            self._fingerprint = ""
+            self._header = None
+        return drained
+
+    def _open(
+        self, identity: Tuple[int, int], offset: int, header: List[str] | None, fingerprint: str
+    ) -> None:
+        self._handle = self.path.open("rb")
+        self._identity = identity
+        self._offset = offset
+        self._fingerprint = fingerprint
+        self._header = None
+        if header is not None:
+            self._set_header(header)
+
+    def _set_header(self, header: List[str]) -> None:
+        self._positions = column_positions(header)
+        self._header = header
+
+    def _process_next(self, final: bool) -> int | None:
+        """Process the next micro-batch; ``None`` means no complete record yet.
+
+        With ``final`` a trailing record without a newline is taken as
+        complete, which is only safe once the file can no longer grow.
+        """
+
+        handle = self._handle
+        handle.seek(self._offset)
+        chunk = handle.read(self.max_batch_bytes)
+        read_at = time.perf_counter()
+        data = chunk
+        cut = record_boundary(data)
+        while not cut and len(chunk) == self.max_batch_bytes:
+            chunk = handle.read(self.max_batch_bytes)
+            data += chunk
+            cut = record_boundary(data)
+        if not cut:
+            if not (final and data):
+                return None
+            cut = len(data)
+        block = data[:cut]
+        start = 0
+        if self._header is None:
+            start = block.find(b"\n") + 1 or len(block)
+            header_line = block[:start].decode("utf-8").rstrip("\r\n")
+            self._set_header(next(csv.reader([header_line]), []))
+        try:
+            batch = self._parse(block[start:])
+        except ValueError:
+            batch = self._parse_records(block, start)
+        self._offset += cut
+        self._fingerprint = _fingerprint(handle, self._offset)
+
+        if len(batch):
+            issues = validate_batch(batch)
+            if issues:
+                logger.warning("%s validation issues detected", len(issues))
+            self.processor.process(batch, self._alerts, self._incidents)
+        for output in (self._alerts, self._incidents):
+            output.flush()
+            os.fsync(output.fileno())
+        self.latency.add(time.perf_counter() - read_at)
+        self.processor.write_summaries()
+        self._save_checkpoint()
+        return len(batch)
+
+    def _parse(self, block: bytes) -> LogBatch:
+        columns = parse_block(block.decode("utf-8"), len(self._header), self.path)
+        batch = LogBatch()
+        batch.extend_columns([columns[position] for position in self._positions], self._timestamps)
+        return batch
+
+    def _parse_records(self, block: bytes, start: int) -> LogBatch:
+        """Parse ``block[start:]`` record by record, skipping malformed ones.
+
+        Skipped records are logged with their byte offset in the file, so
+        one bad row neither stops the follower nor drops its neighbours.
+        """
+
+        batch = LogBatch()
+        while start < len(block):
+            end = block.find(b"\n", start) + 1 or len(block)
+            # A newline inside a quoted field does not end the record.
+            while block.count(b'"', start, end) % 2 and end < len(block):
+                end = block.find(b"\n", end) + 1 or len(block)
+            try:
+                batch.extend_batch(self._parse(block[start:end]))
+            except ValueError as exc:
+                offset = self._offset + start
+                logger.warning(
+                    "Skipping malformed record at byte %s of %s: %s", offset, self.path, exc
+                )
+            start = end
+        return batch
+
+    def _save_checkpoint(self) -> None:
+        device, inode = self._identity
+        FollowCheckpoint(
+            data_path=str(self.path),
+            device=device,
+            inode=inode,
+            offset=self._offset,
+            fingerprint=self._fingerprint,
+            header=self._header,
+            alerts_size=os.fstat(self._alerts.fileno()).st_size,
+            incidents_size=os.fstat(self._incidents.fileno()).st_size,
+            state=self.processor.state.as_dict(),
+        ).save(self.checkpoint_path)
+        if self.references is not None:
+            reference_data = self.references.summary()
+        else:
+            reference_data = {"version": self.processor.reference.version}
+        reference_data["hits"] = self.processor.state.reference_hits
+        self.status_path.write_text(
+            json.dumps(
+                {
+                    "data_path": str(self.path),
+                    "offset": self._offset,
+                    "total_records": self.processor.state.counter.total_records,
+                    "latency": self.latency.summary(),
+                    "reference_data": reference_data,
+                },
+                indent=2,
+            )
+        )
+
+
+def follow_logs(
+    config: Config,
+    model: AnomalyModel | None = None,
+    poll_interval: float = 1.0,
+    max_polls: int | None = None,
+) -> Path:
+    """Tail ``config.data_path`` until interrupted; see :class:`LogFollower`."""
+
+    return LogFollower(config, model).run(poll_interval=poll_interval, max_polls=max_polls)
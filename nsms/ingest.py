@@ -0,0 +1,228 @@
+"""Multi-file ingestion for directories and globs of log files.
+
+Collectors write many small files (typically one per hour), so ``data_path``
+may name a directory or a glob instead of a single file. Files are ordered by
+their first timestamp, ties broken by path, and rows keep their file order
+within that sequence, so the merged result does not depend on how many
+workers parsed it or which one finished first.
+
+With ``workers > 1`` files are parsed in a ``ProcessPoolExecutor``. Parsed
+batches are pickled back to the parent and re-encoded against the shared
+``SYMBOLS`` table, yielding exactly the batch a sequential parse would.
+"""
+
+from __future__ import annotations
+
+import csv
+import glob
+import statistics
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Iterator, List, Tuple
+
+from nsms.binary_log import BINARY_SUFFIX, is_binary_log, read_binary_log
+from nsms.compression import open_text, strip_compression_suffix
+from nsms.csv_fast import TimestampCache
+from nsms.data import LogBatch, iter_batches, read_log_file
+from nsms.logging_utils import get_logger
+from nsms.partitions import is_partitioned_root, partition_files
+
+
+logger = get_logger("ingest")
+
+LOG_FILE_SUFFIXES = (".csv", BINARY_SUFFIX)
+GLOB_CHARACTERS = "*?["
+
+
+@dataclass(frozen=True)
+class FileParseTiming:
+    path: Path
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def has_glob_pattern(path: Path) -> bool:
+    return any(char in str(path) for char in GLOB_CHARACTERS)
+
+
+def resolve_log_paths(
+    path: Path, start: datetime | None = None, end: datetime | None = None
+) -> List[Path]:
+    """Expand ``path`` into the log files it names, in merge order.
+
+    A partitioned root contributes the part files of the hours overlapping
+    ``[start, end)``, possibly none. Any other directory contributes its
+    ``.csv`` and ``.nsmscol`` files (optionally compressed); a glob
+    contributes every file it matches. Anything else is returned as a
+    single-element list.
+    """
+
+    if is_partitioned_root(path):
+        return order_log_files(partition_files(path, start, end))
+    if path.is_dir():
+        paths = [child for child in path.iterdir() if child.is_file() and _is_log_file(child)]
+        if not paths:
+            raise FileNotFoundError(f"No log files found in directory: {path}")
+        return order_log_files(paths)
+    if not path.exists() and has_glob_pattern(path):
+        paths = [
+            Path(match) for match in glob.glob(str(path), recursive=True) if Path(match).is_file()
+        ]
+        if not paths:
+            raise FileNotFoundError(f"No log files match: {path}")
+        return order_log_files(paths)
+    if not path.exists():
+        raise FileNotFoundError(f"Log file not found: {path}")
+    return [path]
+
+
+def order_log_files(paths: List[Path]) -> List[Path]:
+    """Sort files by first timestamp, then path; files without one go last."""
+
+    def key(path: Path) -> Tuple[bool, int, str]:
+        first = _first_timestamp(path)
+        return (first is None, first or 0, str(path))
+
+    return sorted(paths, key=key)
+
+
+def load_files(paths: List[Path], workers: int = 1, use_mmap: bool = False) -> LogBatch:
+    """Parse ``paths`` (already in merge order) into one :class:`LogBatch`."""
+
+    merged = LogBatch()
+    for batch in _parsed_files(paths, workers, use_mmap):
+        merged.extend_batch(batch)
+    return merged
+
+
+def iter_file_batches(
+    paths: List[Path], batch_size: int, workers: int = 1, use_mmap: bool = False
+) -> Iterator[LogBatch]:
+    """Yield batches of at most ``batch_size`` rows from each file in turn.
+
+    Batches never span files. Sequentially each file is streamed, so memory
+    is bounded by ``batch_size``; with a pool it is bounded by ``workers``
+    whole files, the most that are parsed ahead of the consumer.
+    """
+
+    if workers <= 1:
+        timings: List[FileParseTiming] = []
+        for path in paths:
+            rows = 0
+            seconds = 0.0
+            batches = iter_batches(path, batch_size, use_mmap)
+            while True:
+                start = time.perf_counter()
+                batch = next(batches, None)
+                seconds += time.perf_counter() - start
+                if batch is None:
+                    break
+                rows += len(batch)
+                yield batch
+            timings.append(_record_timing(path, rows, seconds))
+        _log_summary(timings)
+        return
+    for parsed in _parsed_files(paths, workers, use_mmap):
+        batch = LogBatch()
+        batch.extend_batch(parsed)
+        for start in range(0, len(batch), batch_size):
+            yield batch.slice(start, start + batch_size)
+
+
+def _parsed_files(paths: List[Path], workers: int, use_mmap: bool) -> Iterator[LogBatch]:
+    timings: List[FileParseTiming] = []
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            start = time.perf_counter()
+            batch = read_log_file(path, use_mmap)
+            timings.append(_record_timing(path, len(batch), time.perf_counter() - start))
+            yield batch
+        _log_summary(timings)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        # Keep at most ``workers`` files in flight so results are consumed
+        # in order without buffering the whole input.
+        pending: Deque[Tuple[Path, Future]] = deque()
+        remaining = iter(paths)
+        for path in remaining:
+            pending.append((path, executor.submit(_parse_in_worker, path, use_mmap)))
+            if len(pending) >= workers:
+                break
+        while pending:
+            path, future = pending.popleft()
+            batch, seconds = future.result()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(_parse_in_worker, next_path, use_mmap)))
+            timings.append(_record_timing(path, len(batch), seconds))
+            yield batch
+    _log_summary(timings)
+
+
+def _parse_in_worker(path: Path, use_mmap: bool) -> Tuple[LogBatch, float]:
+    start = time.perf_counter()
+    batch = read_log_file(path, use_mmap)
+    if isinstance(batch.timestamps, memoryview):
+        # Memory-mapped columns cannot be pickled; copy them into arrays.
+        copied = LogBatch()
+        copied.extend_batch(batch)
+        batch = copied
+    return batch, time.perf_counter() - start
+
+
+def _record_timing(path: Path, rows: int, seconds: float) -> FileParseTiming:
+    timing = FileParseTiming(path=path, rows=rows, seconds=seconds)
+    logger.info(
+        "Parsed %s: %s rows in %.3fs (%.0f rows/s)", path, rows, seconds, timing.rows_per_second
+    )
+    return timing
+
+
+def _log_summary(timings: List[FileParseTiming]) -> None:
+    if len(timings) < 2:
+        return
+    slowest = max(timings, key=lambda timing: timing.seconds)
+    median = statistics.median(timing.seconds for timing in timings)
+    skew = slowest.seconds / median if median > 0 else 0.0
+    logger.info(
+        "Parsed %s files (%s rows) in %.3fs of parse time; slowest %s at %.3fs (%.1fx median)",
+        len(timings),
+        sum(timing.rows for timing in timings),
+        sum(timing.seconds for timing in timings),
+        slowest.path,
+        slowest.seconds,
+        skew,
+    )
+
+
+def _is_log_file(path: Path) -> bool:
+    return (
+        not path.name.startswith(".")
+        and strip_compression_suffix(path).suffix.lower() in LOG_FILE_SUFFIXES
+    )
+
+
+def _first_timestamp(path: Path) -> int | None:
+    if is_binary_log(path):
+        timestamps = read_binary_log(path).timestamps
+        return timestamps[0] if len(timestamps) else None
+    with open_text(path) as handle:
+        reader = csv.reader(handle)
+        header = next(reader, [])
+        row = next(reader, None)
+    if row is None or "timestamp" not in header or len(row) <= header.index("timestamp"):
+        return None
+    try:
+        return TimestampCache().to_micros(row[header.index("timestamp")])
+    except ValueError:
+        # Sorted last; loading the file reports the bad row.
+        return None
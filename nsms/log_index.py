@@ -0,0 +1,258 @@
+"""Sparse timestamp index for seeking into large, time-ordered CSV logs.
+
+The index is a JSON sidecar next to the log (``logs.csv.tsidx``) holding
+the timestamp and byte offset of every ``stride``-th record. For a window
+``[start, end)`` the loader bisects the index and seeks straight to the
+first block that can contain ``start``. It stops reading at the first
+indexed record at or after ``end``, so only about ``2 * stride`` rows
+outside the window are parsed.
+
+Building the index (``nsms index``) is one pass over the file. When the log
+has only been appended to since the index was written (the bytes around the
+old end are unchanged) only the new tail is scanned. Files that are not
+sorted by timestamp are indexed but flagged, and the loader then reads them
+in full. The loader never writes the sidecar: a missing or stale index
+means a full scan, and rows appended after the index are read to the end.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from itertools import accumulate
+from pathlib import Path
+from typing import BinaryIO, List, Tuple
+
+from nsms.compression import detect_compression
+from nsms.csv_fast import TimestampCache, parse_block, record_boundary
+from nsms.logging_utils import get_logger
+
+
+logger = get_logger("log_index")
+
+INDEX_SUFFIX = ".tsidx"
+INDEX_VERSION = 1
+DEFAULT_STRIDE = 1024
+SCAN_BLOCK_SIZE = 4 * 1024 * 1024
+FINGERPRINT_BYTES = 4096
+
+
+@dataclass
+class TimestampIndex:
+    """Timestamps (epoch microseconds) and byte offsets of every ``stride``-th row."""
+
+    stride: int
+    header: List[str]
+    data_offset: int
+    indexed_offset: int = 0
+    rows: int = 0
+    last_timestamp: int | None = None
+    is_sorted: bool = True
+    head_digest: str = ""
+    tail_digest: str = ""
+    timestamps: List[int] = field(default_factory=list)
+    offsets: List[int] = field(default_factory=list)
+    version: int = INDEX_VERSION
+
+    def byte_range(self, start: int | None, end: int | None) -> Tuple[int, int | None]:
+        """Return ``(first, stop)`` bytes covering every row in ``[start, end)``."""
+
+        first = self.data_offset
+        if start is not None:
+            position = bisect_left(self.timestamps, start)
+            if position:
+                first = self.offsets[position - 1]
+        stop = None
+        if end is not None:
+            position = bisect_left(self.timestamps, end)
+            if position < len(self.offsets):
+                stop = self.offsets[position]
+        return first, stop
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(asdict(self)), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def index_path(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + INDEX_SUFFIX)
+
+
+def load_log_index(log_path: Path) -> TimestampIndex | None:
+    path = index_path(log_path)
+    if not path.exists():
+        return None
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    if payload.get("version") != INDEX_VERSION:
+        return None
+    return TimestampIndex(**payload)
+
+
+def build_log_index(log_path: Path, stride: int = DEFAULT_STRIDE) -> TimestampIndex:
+    """Index ``log_path`` from scratch and write the sidecar."""
+
+    if stride <= 0:
+        raise ValueError("stride must be greater than 0")
+    if detect_compression(log_path) is not None:
+        raise ValueError(f"Compressed logs cannot be indexed for seeking: {log_path}")
+    with log_path.open("rb") as handle:
+        first_line = handle.readline()
+        header = next(csv.reader([first_line.decode("utf-8").rstrip("\r\n")]), [])
+        if "timestamp" not in header:
+            raise ValueError(f"Log file has no timestamp column: {log_path}")
+        index = TimestampIndex(
+            stride=stride,
+            header=header,
+            data_offset=len(first_line),
+            indexed_offset=len(first_line),
+        )
+        _scan(handle, index)
+    index.save(index_path(log_path))
+    logger.info("Indexed %s rows of %s (%s entries)", index.rows, log_path, len(index.offsets))
+    return index
+
+
+def update_log_index(log_path: Path) -> TimestampIndex | None:
+    """Bring an existing index up to date, scanning only appended bytes.
+
+    Returns ``None`` when ``log_path`` has no index. If the file was
+    rewritten or truncated rather than appended to, the index is rebuilt.
+    """
+
+    index = load_log_index(log_path)
+    if index is None:
+        return None
+    size = log_path.stat().st_size
+    with log_path.open("rb") as handle:
+        if not _still_valid(handle, size, index):
+            logger.info("%s changed since it was indexed; rebuilding the index", log_path)
+            return build_log_index(log_path, index.stride)
+        if size == index.indexed_offset:
+            return index
+        rows = index.rows
+        _scan(handle, index)
+    if index.rows != rows:
+        index.save(index_path(log_path))
+        logger.info("Indexed %s appended rows of %s", index.rows - rows, log_path)
+    return index
+
+
+def indexed_byte_range(
+    log_path: Path, start: int | None, end: int | None
+) -> Tuple[int, int | None] | None:
+    """Return the byte range to parse for ``[start, end)``, or ``None`` to read everything.
+
+    The sidecar is only read, never written: ``None`` is returned when the
+    file has no valid index (missing, unreadable, or the file was rewritten
+    since ``nsms index``) or is not sorted by timestamp.
+    """
+
+    if detect_compression(log_path) is not None:
+        return None
+    try:
+        index = load_log_index(log_path)
+    except (ValueError, TypeError) as exc:
+        logger.warning("Ignoring unreadable index of %s: %s", log_path, exc)
+        return None
+    if index is None or not index.is_sorted:
+        return None
+    size = log_path.stat().st_size
+    with log_path.open("rb") as handle:
+        if not _still_valid(handle, size, index):
+            logger.warning("%s changed since it was indexed; reading it in full", log_path)
+            return None
+    first, stop = index.byte_range(start, end)
+    if size > index.indexed_offset:
+        # Rows appended since indexing may be out of order; read through the end.
+        stop = None
+    return first, stop
+
+
+def _scan(handle: BinaryIO, index: TimestampIndex) -> None:
+    """Index complete records from ``index.indexed_offset`` to the end of the file."""
+
+    position = index.header.index("timestamp")
+    width = len(index.header)
+    timestamps = TimestampCache()
+    handle.seek(index.indexed_offset)
+    pending = b""
+    base = index.indexed_offset
+    while True:
+        chunk = handle.read(SCAN_BLOCK_SIZE)
+        data = pending + chunk
+        cut = record_boundary(data)
+        if cut:
+            _index_block(index, data[:cut], base, width, position, timestamps)
+            base += cut
+        pending = data[cut:]
+        if not chunk:
+            break
+    index.indexed_offset = base
+    index.head_digest, index.tail_digest = _digests(handle, base)
+
+
+def _index_block(
+    index: TimestampIndex, block: bytes, base: int, width: int, position: int, cache: TimestampCache
+) -> None:
+    if b'"' in block:
+        starts = _quoted_record_starts(block)
+    else:
+        lines = block.split(b"\n")
+        lines.pop()
+        starts = [
+            offset + row for row, offset in enumerate(accumulate(map(len, lines), initial=0))
+        ][:-1]
+        if b"" in lines or b"\r" in lines:
+            starts = [start for start, line in zip(starts, lines) if line not in (b"", b"\r")]
+    values = cache.to_micros_many(parse_block(block.decode("utf-8"), width, "index")[position])
+    if len(values) != len(starts):
+        raise ValueError("Could not align index offsets with parsed rows")
+    if values:
+        previous = values[0] if index.last_timestamp is None else index.last_timestamp
+        if index.is_sorted and (
+            values[0] < previous or any(map(int.__gt__, values[:-1], values[1:]))
+        ):
+            index.is_sorted = False
+        index.last_timestamp = values[-1]
+    for row in range(-index.rows % index.stride, len(values), index.stride):
+        index.timestamps.append(values[row])
+        index.offsets.append(base + starts[row])
+    index.rows += len(values)
+
+
+def _quoted_record_starts(block: bytes) -> List[int]:
+    starts: List[int] = []
+    offset = 0
+    record_start = 0
+    quotes = 0
+    for line in block.split(b"\n")[:-1]:
+        quotes += line.count(b'"')
+        offset += len(line) + 1
+        if quotes % 2 == 0:
+            if block[record_start:offset].strip():
+                starts.append(record_start)
+            record_start = offset
+            quotes = 0
+    return starts
+
+
+def _still_valid(handle: BinaryIO, size: int, index: TimestampIndex) -> bool:
+    """Whether the file still starts with the bytes that were indexed."""
+
+    if size < index.indexed_offset:
+        return False
+    return _digests(handle, index.indexed_offset) == (index.head_digest, index.tail_digest)
+
+
+def _digests(handle: BinaryIO, indexed_offset: int) -> Tuple[str, str]:
+    handle.seek(0)
+    head = handle.read(min(FINGERPRINT_BYTES, indexed_offset))
+    tail_start = max(0, indexed_offset - FINGERPRINT_BYTES)
+    handle.seek(tail_start)
+    tail = handle.read(indexed_offset - tail_start)
+    return hashlib.sha1(head).hexdigest(), hashlib.sha1(tail).hexdigest()
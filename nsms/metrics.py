@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
+from collections import Counter
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, Iterable, List, Sequence, Union
 
-from nsms.data import LogRecord
+from nsms.data import LogBatch, LogRecord
 
 
 @dataclass(frozen=True)
@@ -25,14 +26,69 @@ class Metrics:
 
 
 def compute_metrics(
-    records: List[LogRecord],
+    records: Union[Sequence[LogRecord], LogBatch],
     anomalies: List[bool],
     threat_hits: List[bool],
-    compliance_hits: List[bool],
+    compliance_masks: Sequence[int],
 ) -> Metrics:
+    """Count flagged records; ``compliance_masks`` are violation bitmasks (or flags)."""
+
     return Metrics(
         total_records=len(records),
         anomalous_records=sum(1 for flag in anomalies if flag),
         threat_intel_hits=sum(1 for flag in threat_hits if flag),
-        compliance_violations=sum(1 for flag in compliance_hits if flag),
+        compliance_violations=count_nonzero(compliance_masks),
     )
+
+
+def count_nonzero(values: Iterable[int]) -> int:
+    """Count the non-zero entries of an ndarray, list, ``array`` or iterable."""
+
+    if hasattr(values, "nonzero"):
+        return len(values.nonzero()[0])
+    if hasattr(values, "count"):
+        return len(values) - values.count(0)
+    return sum(1 for value in values if value)
+
+
+
+def count_bits(values: Iterable[int], width: int) -> List[int]:
+    """Count the entries with each of bits ``0 .. width - 1`` set, as for :func:`count_nonzero`."""
+
+    if hasattr(values, "nonzero"):
+        return [count_nonzero(values & (1 << bit)) for bit in range(width)]
+    # Bitmasks repeat heavily, so test each distinct value once.
+    distinct = Counter(values).items()
+    return [sum(count for value, count in distinct if value >> bit & 1) for bit in range(width)]
+
+
+@dataclass
+class MetricsCounter:
+    """Running counters for pipelines that never hold the full record list."""
+
+    total_records: int = 0
+    anomalous_records: int = 0
+    threat_intel_hits: int = 0
+    compliance_violations: int = 0
+
+    def update(
+        self,
+        anomalies: Iterable[bool],
+        threat_hits: Iterable[bool],
+        compliance_masks: Iterable[int],
+    ) -> None:
+        """Add one batch; ``compliance_masks`` are its violation bitmasks (or flags)."""
+
+        anomalies = list(anomalies)
+        self.total_records += len(anomalies)
+        self.anomalous_records += sum(1 for flag in anomalies if flag)
+        self.threat_intel_hits += sum(1 for flag in threat_hits if flag)
+        self.compliance_violations += count_nonzero(compliance_masks)
+
+    def freeze(self) -> Metrics:
+        return Metrics(
+            total_records=self.total_records,
+            anomalous_records=self.anomalous_records,
+            threat_intel_hits=self.threat_intel_hits,
+            compliance_violations=self.compliance_violations,
+        )
@@ -2,11 +2,28 @@
 
 from __future__ import annotations
 
+import math
+from array import array
 from dataclasses import dataclass
-from statistics import mean, pstdev
-from typing import Iterable, List
+from statistics import fmean
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
 
-from nsms.preprocessing import FeatureVector
+from nsms.baselines import DEFAULT_MIN_COUNT, EntityBaselines, SeasonalBaselines, baseline_rows
+from nsms.config import SEASONAL_GLOBAL
+from nsms.data import LogBatch
+from nsms.sketches import QuantileSketch
+from nsms.preprocessing import (
+    FLAG_COLUMNS,
+    PER_ROW_FEATURES,
+    FeatureMatrix,
+    FeatureVector,
+    window_sizes,
+)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; see FeatureMatrix.
+    np = None
 
 
 @dataclass(frozen=True)
@@ -18,55 +35,416 @@ class ModelStats:
     mean_admin: float
 
 
+@dataclass(frozen=True)
+class ColumnStats:
+    mean: float
+    std: float
+
+
 class AnomalyModel:
     """Simple statistical anomaly detector.
 
     The model flags a record as anomalous if the bytes transferred exceed
     ``mean + threshold * std`` or if the record is a denied request to a
     sensitive resource performed by an admin.
+
+    A model trained on a :class:`FeatureMatrix` with windowed columns also
+    flags a record when any of those columns (for example the bytes its
+    source IP sent in the last hour) is ``threshold`` standard deviations
+    above its mean. Such a model can only score matrices carrying the same
+    columns.
+
+    With :class:`EntityBaselines`, bytes are compared with the mean and
+    standard deviation of the row's user or source IP instead of the global
+    ones wherever that entity was seen often enough in training. Scoring
+    then needs the :class:`LogBatch` the features were extracted from.
+
+    :class:`SeasonalBaselines` likewise compare bytes with the mean of the
+    row's hour of the week, per entity or overall. The most specific
+    trusted baseline wins: entity and hour, then entity, then hour, then
+    the global one.
+
+    With ``threshold_quantile`` (for example 0.999) and a ``bytes_sketch``
+    of the training bytes, the bytes term is instead scaled so that it
+    reaches ``threshold`` exactly at that quantile of the training data,
+    which suits heavy-tailed byte counts better than ``mean + k * std``.
     """
 
-    def __init__(self, stats: ModelStats, threshold: float = 3.0) -> None:
+    def __init__(
+        self,
+        stats: ModelStats,
+        threshold: float = 3.0,
+        window_stats: Dict[str, ColumnStats] | None = None,
+        entity_baselines: EntityBaselines | None = None,
+        bytes_sketch: QuantileSketch | None = None,
+        threshold_quantile: float | None = None,
+        seasonal_baselines: SeasonalBaselines | None = None,
+    ) -> None:
         self.stats = stats
         self.threshold = threshold
+        self.window_stats = dict(window_stats or {})
+        self.entity_baselines = entity_baselines
+        self.bytes_sketch = bytes_sketch
+        self.threshold_quantile = threshold_quantile
+        self.seasonal_baselines = seasonal_baselines
+        self.bytes_cutoff: float | None = None
+        if threshold_quantile is not None:
+            if bytes_sketch is None:
+                raise ValueError("threshold_quantile needs a bytes_sketch")
+            self.bytes_cutoff = bytes_sketch.quantile(threshold_quantile)
+
+    @property
+    def feature_windows(self) -> List[int]:
+        """Windows (in seconds) whose columns the model needs at scoring time."""
+
+        return window_sizes(self.window_stats)
+
+    @property
+    def required_features(self) -> List[str]:
+        """Names of every feature column :meth:`predict` reads, for :class:`FeatureExtractor`."""
+
+        return list(PER_ROW_FEATURES) + list(self.window_stats)
+
+    @property
+    def needs_batch(self) -> bool:
+        """Whether scoring reads the :class:`LogBatch` the features came from."""
+
+        return self.entity_baselines is not None or self.seasonal_baselines is not None
 
     @classmethod
-    def train(cls, features: Iterable[FeatureVector], threshold: float = 3.0) -> "AnomalyModel":
-        feature_list = list(features)
-        if not feature_list:
-            raise ValueError("Cannot train anomaly model with empty dataset")
-        bytes_values = [feature.bytes_transferred for feature in feature_list]
-        denied_values = [feature.is_denied for feature in feature_list]
-        sensitive_values = [feature.is_sensitive_resource for feature in feature_list]
-        admin_values = [feature.is_admin_user for feature in feature_list]
-        stats = ModelStats(
-            mean_bytes=mean(bytes_values),
-            std_bytes=pstdev(bytes_values) or 1.0,
-            mean_denied=mean(denied_values),
-            mean_sensitive=mean(sensitive_values),
-            mean_admin=mean(admin_values),
-        )
-        return cls(stats=stats, threshold=threshold)
+    def train(
+        cls, features: Union[Iterable[FeatureVector], FeatureMatrix], threshold: float = 3.0
+    ) -> "AnomalyModel":
+        return ModelTrainer().update(features).model(threshold)
 
     def score(self, feature: FeatureVector) -> float:
-        deviation = (feature.bytes_transferred - self.stats.mean_bytes) / self.stats.std_bytes
-        penalty = 0.0
-        if feature.is_denied:
-            penalty += 0.5
-        if feature.is_sensitive_resource:
-            penalty += 0.75
-        if feature.is_admin_user:
-            penalty += 0.5
-        return deviation + penalty
+        return self._score_values(
+            feature.bytes_transferred,
+            feature.is_denied,
+            feature.is_sensitive_resource,
+            feature.is_admin_user,
+        )
 
     def is_anomalous(self, feature: FeatureVector) -> bool:
-        if (
-            feature.is_denied
-            and feature.is_sensitive_resource
-            and feature.is_admin_user
-        ):
-            return True
-        return self.score(feature) >= self.threshold
+        return self._is_anomalous_values(
+            feature.bytes_transferred,
+            feature.is_denied,
+            feature.is_sensitive_resource,
+            feature.is_admin_user,
+        )
 
-    def predict(self, features: Iterable[FeatureVector]) -> List[bool]:
+    def predict(
+        self,
+        features: Union[Iterable[FeatureVector], FeatureMatrix],
+        batch: LogBatch | None = None,
+    ) -> List[bool]:
+        """Flag each row; ``batch`` is required when :attr:`needs_batch`."""
+
+        if isinstance(features, FeatureMatrix):
+            mask, _ = self.predict_batch(features, batch)
+            return mask if isinstance(mask, list) else mask.tolist()
+        if self.window_stats or self.needs_batch:
+            raise ValueError(
+                "This model uses windowed, per-entity or seasonal features; "
+                "score it with a FeatureMatrix"
+            )
         return [self.is_anomalous(feature) for feature in features]
+
+    def score_batch(self, features: FeatureMatrix, batch: LogBatch | None = None) -> Any:
+        """Return :meth:`score` for every row of ``features`` at once.
+
+        Scores are a float64 ndarray when the matrix is NumPy-backed and an
+        ``array('d')`` otherwise; either way they equal the per-row scores
+        exactly. With entity or seasonal baselines, each row's bytes are
+        scored against its entity's or hour's baseline, read from ``batch``.
+        """
+
+        denied, sensitive, admin = (features.flag_column(name) for name in FLAG_COLUMNS)
+        if self.needs_batch:
+            means, stds = self._row_baselines(features, batch)
+        elif not features.is_ndarray:
+            return array(
+                "d", map(self._score_values, features.bytes_transferred, denied, sensitive, admin)
+            )
+        else:
+            means, stds = self._bytes_baseline()
+        if not features.is_ndarray:
+            return array(
+                "d",
+                (
+                    (value - mean_bytes) / std_bytes + _penalty(is_denied, is_sensitive, is_admin)
+                    for value, mean_bytes, std_bytes, is_denied, is_sensitive, is_admin in zip(
+                        features.bytes_transferred, means, stds, denied, sensitive, admin
+                    )
+                ),
+            )
+        # Same float64 arithmetic as _score_values; the penalties are sums of
+        # 0.5 and 0.75, which are exact, so the results match row by row.
+        deviation = (features.bytes_transferred.astype(np.float64) - means) / stds
+        return deviation + (denied * 0.5 + sensitive * 0.75 + admin * 0.5)
+
+    def predict_batch(
+        self, features: FeatureMatrix, batch: LogBatch | None = None
+    ) -> Tuple[Any, Any]:
+        """Return the anomaly mask and :meth:`score_batch` scores of ``features``.
+
+        The mask is a boolean ndarray (a list of bools without NumPy) equal
+        to :meth:`predict`: a row is anomalous when its score reaches the
+        threshold, when it is a denied admin request to a sensitive
+        resource, or when a windowed column is ``threshold`` deviations
+        above its mean.
+        """
+
+        windowed = self._windowed_columns(features)
+        scores = self.score_batch(features, batch)
+        denied, sensitive, admin = (features.flag_column(name) for name in FLAG_COLUMNS)
+        threshold = self.threshold
+        if not features.is_ndarray:
+            mask = [
+                score >= threshold or bool(is_denied and is_sensitive and is_admin)
+                for score, is_denied, is_sensitive, is_admin in zip(
+                    scores, denied, sensitive, admin
+                )
+            ]
+            for column, stats in windowed:
+                mask = [
+                    flag or (value - stats.mean) / stats.std >= threshold
+                    for flag, value in zip(mask, column)
+                ]
+            return mask, scores
+        mask = (scores >= threshold) | ((denied & sensitive & admin) != 0)
+        for column, stats in windowed:
+            mask |= (column - stats.mean) / stats.std >= threshold
+        return mask, scores
+
+    def _windowed_columns(
+        self, features: FeatureMatrix
+    ) -> List[Tuple[Sequence[float], ColumnStats]]:
+        missing = [name for name in self.window_stats if name not in features.windowed]
+        if missing:
+            raise ValueError(
+                "Features are missing windowed columns the model was trained on: "
+                f"{', '.join(missing)}"
+            )
+        return [(features.windowed[name], stats) for name, stats in self.window_stats.items()]
+
+    def _row_baselines(self, features: FeatureMatrix, batch: LogBatch | None) -> Tuple[Any, Any]:
+        if batch is None or len(batch) != len(features):
+            raise ValueError(
+                "This model uses per-entity or seasonal baselines; "
+                "pass the LogBatch of the features"
+            )
+        is_ndarray = features.is_ndarray
+        means, stds, resolved = baseline_rows(len(batch), *self._bytes_baseline(), is_ndarray)
+        if self.seasonal_baselines is not None:
+            self.seasonal_baselines.fill_entities(batch, means, stds, resolved, is_ndarray)
+        if self.entity_baselines is not None:
+            self.entity_baselines.fill(batch, means, stds, resolved, is_ndarray)
+        if self.seasonal_baselines is not None:
+            self.seasonal_baselines.fill_hours(batch, means, stds, resolved, is_ndarray)
+        return means, stds
+
+    def _bytes_baseline(self) -> Tuple[float, float]:
+        """Global ``(mean, std)`` the bytes term is normalized with."""
+
+        if self.bytes_cutoff is None:
+            return self.stats.mean_bytes, self.stats.std_bytes
+        # bytes / (cutoff / threshold) reaches the threshold at the cutoff.
+        return 0.0, max(self.bytes_cutoff, 1.0) / self.threshold
+
+    def _score_values(
+        self, bytes_transferred: float, is_denied: int, is_sensitive: int, is_admin: int
+    ) -> float:
+        mean_bytes, std_bytes = self._bytes_baseline()
+        deviation = (bytes_transferred - mean_bytes) / std_bytes
+        return deviation + _penalty(is_denied, is_sensitive, is_admin)
+
+    def _is_anomalous_values(
+        self, bytes_transferred: float, is_denied: int, is_sensitive: int, is_admin: int
+    ) -> bool:
+        if is_denied and is_sensitive and is_admin:
+            return True
+        return (
+            self._score_values(bytes_transferred, is_denied, is_sensitive, is_admin)
+            >= self.threshold
+        )
+
+
+def _penalty(is_denied: int, is_sensitive: int, is_admin: int) -> float:
+    penalty = 0.0
+    if is_denied:
+        penalty += 0.5
+    if is_sensitive:
+        penalty += 0.75
+    if is_admin:
+        penalty += 0.5
+    return penalty
+
+
+@dataclass
+class RunningStats:
+    """Count, mean and sum of squared deviations (Welford), mergeable across shards."""
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation, 1.0 when it is zero."""
+
+        return (math.sqrt(self.m2 / self.count) if self.count else 0.0) or 1.0
+
+    def update(self, column: Any, is_ndarray: bool) -> None:
+        """Add a whole column: two passes over it, then one :meth:`merge`."""
+
+        count = len(column)
+        if not count:
+            return
+        if is_ndarray:
+            values = column.astype(np.float64)
+            column_mean = float(values.mean())
+            m2 = float(((values - column_mean) ** 2).sum())
+        else:
+            column_mean = fmean(column)
+            m2 = math.fsum((value - column_mean) ** 2 for value in column)
+        self.merge(RunningStats(count, column_mean, m2))
+
+    def merge(self, other: "RunningStats") -> None:
+        """Combine with ``other`` (Chan et al.), as if its values had been added here."""
+
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+
+
+class ModelTrainer:
+    """Single-pass, constant-memory training of an :class:`AnomalyModel`.
+
+    Feed feature matrices (or vectors) chunk by chunk with :meth:`update`,
+    combine trainers built on other shards or processes with :meth:`merge`,
+    and call :meth:`model` at the end. Flag means come from integer counts
+    and are exact; the byte and windowed means and deviations are kept as
+    :class:`RunningStats` and may differ from a one-shot computation in the
+    last bit.
+
+    ``entity_fields`` (for example ``["user", "source_ip"]``) also trains
+    :class:`EntityBaselines`; :meth:`update` then needs each chunk's
+    :class:`LogBatch`. ``threshold_quantile`` also sketches the bytes
+    column with a :class:`QuantileSketch` and gives the model a quantile
+    threshold. ``seasonal_baselines`` (``"global"`` or an entity field)
+    trains hour-of-week :class:`SeasonalBaselines`, which also need the
+    chunk's :class:`LogBatch`.
+    """
+
+    def __init__(
+        self,
+        entity_fields: Sequence[str] = (),
+        entity_min_count: int = DEFAULT_MIN_COUNT,
+        threshold_quantile: float | None = None,
+        seasonal_baselines: str | None = None,
+    ) -> None:
+        self.bytes_stats = RunningStats()
+        self.flag_counts = [0] * len(FLAG_COLUMNS)
+        self.window_stats: Dict[str, RunningStats] = {}
+        self.entity_baselines = (
+            EntityBaselines(entity_fields, entity_min_count) if entity_fields else None
+        )
+        self.threshold_quantile = threshold_quantile
+        self.bytes_sketch = QuantileSketch() if threshold_quantile is not None else None
+        self.seasonal_baselines = None
+        if seasonal_baselines is not None:
+            entity = None if seasonal_baselines == SEASONAL_GLOBAL else seasonal_baselines
+            self.seasonal_baselines = SeasonalBaselines(entity, entity_min_count)
+
+    @property
+    def count(self) -> int:
+        return self.bytes_stats.count
+
+    def update(
+        self, features: Union[Iterable[FeatureVector], FeatureMatrix], batch: LogBatch | None = None
+    ) -> "ModelTrainer":
+        """Add a chunk of features; ``batch`` is the chunk they came from."""
+
+        if not isinstance(features, FeatureMatrix):
+            # Vectors take the matrix path too, so results do not depend on the container.
+            features = FeatureMatrix.from_vectors(list(features))
+        if self.entity_baselines is not None or self.seasonal_baselines is not None:
+            if batch is None or len(batch) != len(features):
+                raise ValueError("Entity and seasonal baselines need the LogBatch of the features")
+            if self.entity_baselines is not None:
+                self.entity_baselines.update(batch)
+            if self.seasonal_baselines is not None:
+                self.seasonal_baselines.update(batch)
+        if not len(features):
+            return self
+        self._check_windowed(list(features.windowed))
+        self.bytes_stats.update(features.bytes_transferred, features.is_ndarray)
+        if self.bytes_sketch is not None:
+            self.bytes_sketch.update(features.bytes_transferred, features.is_ndarray)
+        if features.is_ndarray:
+            counts = features.flags.sum(axis=0, dtype=np.int64).tolist()
+        else:
+            counts = [sum(features.flag_column(name)) for name in FLAG_COLUMNS]
+        self.flag_counts = [total + count for total, count in zip(self.flag_counts, counts)]
+        for name, column in features.windowed.items():
+            self.window_stats.setdefault(name, RunningStats()).update(column, features.is_ndarray)
+        return self
+
+    def merge(self, other: "ModelTrainer") -> "ModelTrainer":
+        if other.count:
+            self._check_windowed(list(other.window_stats))
+        self.bytes_stats.merge(other.bytes_stats)
+        self.flag_counts = [
+            total + count for total, count in zip(self.flag_counts, other.flag_counts)
+        ]
+        for name, stats in other.window_stats.items():
+            self.window_stats.setdefault(name, RunningStats()).merge(stats)
+        if self.entity_baselines is not None and other.entity_baselines is not None:
+            self.entity_baselines.merge(other.entity_baselines)
+        elif self.entity_baselines is not None or other.entity_baselines is not None:
+            raise ValueError("Cannot merge trainers with and without entity baselines")
+        if self.bytes_sketch is not None and other.bytes_sketch is not None:
+            self.bytes_sketch.merge(other.bytes_sketch)
+        elif self.bytes_sketch is not None or other.bytes_sketch is not None:
+            raise ValueError("Cannot merge trainers with and without a quantile threshold")
+        if self.seasonal_baselines is not None and other.seasonal_baselines is not None:
+            self.seasonal_baselines.merge(other.seasonal_baselines)
+        elif self.seasonal_baselines is not None or other.seasonal_baselines is not None:
+            raise ValueError("Cannot merge trainers with and without seasonal baselines")
+        return self
+
+    def model(self, threshold: float = 3.0) -> AnomalyModel:
+        count = self.count
+        if not count:
+            raise ValueError("Cannot train anomaly model with empty dataset")
+        stats = ModelStats(
+            mean_bytes=self.bytes_stats.mean,
+            std_bytes=self.bytes_stats.std,
+            mean_denied=self.flag_counts[0] / count,
+            mean_sensitive=self.flag_counts[1] / count,
+            mean_admin=self.flag_counts[2] / count,
+        )
+        window_stats = {
+            name: ColumnStats(stats.mean, stats.std) for name, stats in self.window_stats.items()
+        }
+        return AnomalyModel(
+            stats=stats,
+            threshold=threshold,
+            window_stats=window_stats,
+            entity_baselines=self.entity_baselines,
+            bytes_sketch=self.bytes_sketch,
+            threshold_quantile=self.threshold_quantile,
+            seasonal_baselines=self.seasonal_baselines,
+        )
+
+    def _check_windowed(self, names: List[str]) -> None:
+        if self.count and names != list(self.window_stats):
+            raise ValueError("Every chunk must carry the same windowed feature columns")
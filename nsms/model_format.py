@@ -0,0 +1,170 @@
+"""Versioned binary container for anomaly models with memory-mapped sections.
+
+Layout of an ``.nsmsmodel`` file::
+
+    b"NSMSMDL1"             magic
+    uint32 (little endian)  length of the JSON header
+    uint32 (little endian)  CRC-32 of the JSON header
+    JSON header             version, byte order, model payload, section table
+    padding                 to a 64-byte boundary
+    section data            raw ``array`` bytes, each section 64-byte aligned
+
+The model payload is the same JSON document :func:`nsms.model_io.save_model`
+writes, except that large arrays (the slots of per-entity hash tables) are
+replaced by ``{"section": n}`` references into the section table, which
+records each section's type code, offset, size and CRC-32. Loading maps the
+file and exposes each section as a ``memoryview`` cast to its type, so the
+cost of opening a model does not depend on the size of its tables: pages
+are read when a lookup first touches them.
+
+The header checksum is verified on every load. Verifying the section
+checksums reads every page, so it is done only on request
+(:meth:`ModelFile.verify`), for example before a model is published.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List
+
+MAGIC = b"NSMSMDL1"
+FORMAT_VERSION = 1
+MODEL_SUFFIX = ".nsmsmodel"
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<II")
+
+
+def is_model_file(path: Path) -> bool:
+    """Return True when ``path`` starts with the binary model magic."""
+
+    if not path.is_file():
+        return False
+    with path.open("rb") as handle:
+        return handle.read(len(MAGIC)) == MAGIC
+
+
+class SectionWriter:
+    """Collects the arrays stored as sections while a payload is built."""
+
+    def __init__(self) -> None:
+        self.sections: List[Any] = []
+
+    def add(self, values: Any) -> Dict[str, int]:
+        """Register an ``array`` (or typed ``memoryview``) and return its reference."""
+
+        self.sections.append(values)
+        return {"section": len(self.sections) - 1}
+
+    def write(self, path: Path, payload: Dict[str, Any]) -> None:
+        """Write ``payload`` and the sections to ``path``, atomically."""
+
+        table = []
+        offset = 0
+        for values in self.sections:
+            data = memoryview(values).cast("B")
+            table.append(
+                {
+                    "typecode": values.typecode if isinstance(values, array) else values.format,
+                    "itemsize": values.itemsize,
+                    "offset": offset,
+                    "size": len(data),
+                    "crc32": zlib.crc32(data),
+                }
+            )
+            offset += _aligned(len(data))
+        header = {
+            "version": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "payload": payload,
+            "sections": table,
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        prefix_size = len(MAGIC) + _PREFIX.size + len(header_bytes)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with tmp_path.open("wb") as out:
+                out.write(MAGIC)
+                out.write(_PREFIX.pack(len(header_bytes), zlib.crc32(header_bytes)))
+                out.write(header_bytes)
+                out.write(b"\0" * (_aligned(prefix_size) - prefix_size))
+                for values, spec in zip(self.sections, table):
+                    out.write(memoryview(values).cast("B"))
+                    out.write(b"\0" * (_aligned(spec["size"]) - spec["size"]))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+class ModelFile:
+    """A memory-mapped ``.nsmsmodel`` file: its payload and lazily read sections.
+
+    Section arrays are read-only ``memoryview`` objects over the mapping,
+    which stays open for as long as any of them is referenced.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[: len(MAGIC)] != MAGIC:
+            mapped.close()
+            raise ValueError(f"Not an NSMS model file: {path}")
+        header_size, header_crc = _PREFIX.unpack_from(mapped, len(MAGIC))
+        header_start = len(MAGIC) + _PREFIX.size
+        header_bytes = mapped[header_start : header_start + header_size]
+        if len(header_bytes) != header_size or zlib.crc32(header_bytes) != header_crc:
+            mapped.close()
+            raise ValueError(f"Corrupt model header in {path}")
+        header = json.loads(header_bytes.decode("utf-8"))
+        if header["version"] != FORMAT_VERSION:
+            mapped.close()
+            raise ValueError(f"Unsupported model format version {header['version']} in {path}")
+        self.payload: Dict[str, Any] = header["payload"]
+        self._sections: List[Dict[str, Any]] = header["sections"]
+        self._byteorder = header["byteorder"]
+        self._data_start = _aligned(header_start + header_size)
+        self._base = memoryview(mapped)
+        if self._data_start + sum(_aligned(spec["size"]) for spec in self._sections) > len(mapped):
+            raise ValueError(f"Truncated model file: {path}")
+
+    def section(self, ref: Dict[str, int]) -> Any:
+        """Return the section ``ref`` points to as a typed ``memoryview``."""
+
+        spec = self._sections[ref["section"]]
+        typecode = spec["typecode"]
+        if array(typecode).itemsize != spec["itemsize"]:
+            raise ValueError(
+                f"Section {ref['section']} of {self.path} has an incompatible item size"
+            )
+        view = self._raw(spec)
+        if self._byteorder != sys.byteorder:
+            swapped = array(typecode, view.tobytes())
+            swapped.byteswap()
+            return swapped
+        return view.cast(typecode)
+
+    def verify(self) -> None:
+        """Check every section's CRC-32; raises ``ValueError`` on a mismatch."""
+
+        for index, spec in enumerate(self._sections):
+            if zlib.crc32(self._raw(spec)) != spec["crc32"]:
+                raise ValueError(f"Checksum mismatch in section {index} of {self.path}")
+
+    def _raw(self, spec: Dict[str, Any]) -> memoryview:
+        start = self._data_start + spec["offset"]
+        return self._base[start : start + spec["size"]]
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -1,16 +1,50 @@
-"""Persist anomaly models to disk."""
+"""Persist anomaly models to disk.
+
+Models are saved as JSON, or in the binary container of
+:mod:`nsms.model_format` when the path ends in ``.nsmsmodel``; loading
+detects the format from the file itself. Both hold the same payload, but the
+binary form stores per-entity tables as memory-mapped sections, so loading a
+model with millions of entities takes milliseconds.
+"""
 
 from __future__ import annotations
 
 import json
 from pathlib import Path
+from typing import Any, Dict
 
-from nsms.model import AnomalyModel, ModelStats
+from nsms.baselines import EntityBaselines, SeasonalBaselines
+from nsms.model import AnomalyModel, ColumnStats, ModelStats
+from nsms.model_format import MODEL_SUFFIX, ModelFile, SectionWriter, is_model_file
+from nsms.sketches import QuantileSketch
 
 
 def save_model(model: AnomalyModel, path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    payload = {
+    if path.suffix == MODEL_SUFFIX:
+        sections = SectionWriter()
+        sections.write(path, model_payload(model, sections))
+        return
+    path.write_text(json.dumps(model_payload(model), indent=2))
+
+
+def load_model(path: Path, verify: bool = False) -> AnomalyModel:
+    """Load a JSON or binary model; ``verify`` also checks section checksums."""
+
+    if not path.exists():
+        raise FileNotFoundError(f"Model file not found: {path}")
+    if is_model_file(path):
+        model_file = ModelFile(path)
+        if verify:
+            model_file.verify()
+        return model_from_payload(model_file.payload, model_file)
+    return model_from_payload(json.loads(path.read_text()))
+
+
+def model_payload(model: AnomalyModel, sections: SectionWriter | None = None) -> Dict[str, Any]:
+    """The JSON document describing ``model``; large arrays go to ``sections`` if given."""
+
+    payload: Dict[str, Any] = {
         "threshold": model.threshold,
         "stats": {
             "mean_bytes": model.stats.mean_bytes,
@@ -20,13 +54,22 @@ def save_model(model: AnomalyModel, path: Path) -> None:
             "mean_admin": model.stats.mean_admin,
         },
     }
-    path.write_text(json.dumps(payload, indent=2))
+    if model.window_stats:
+        payload["window_stats"] = {
+            name: {"mean": stats.mean, "std": stats.std}
+            for name, stats in model.window_stats.items()
+        }
+    if model.entity_baselines is not None:
+        payload["entity_baselines"] = model.entity_baselines.as_dict(sections)
+    if model.bytes_sketch is not None:
+        payload["bytes_sketch"] = model.bytes_sketch.as_dict()
+        payload["threshold_quantile"] = model.threshold_quantile
+    if model.seasonal_baselines is not None:
+        payload["seasonal_baselines"] = model.seasonal_baselines.as_dict(sections)
+    return payload
 
 
-def load_model(path: Path) -> AnomalyModel:
-    if not path.exists():
-        raise FileNotFoundError(f"Model file not found: {path}")
-    payload = json.loads(path.read_text())
+def model_from_payload(payload: Dict[str, Any], sections: ModelFile | None = None) -> AnomalyModel:
     stats = payload["stats"]
     model_stats = ModelStats(
         mean_bytes=stats["mean_bytes"],
@@ -35,4 +78,25 @@ def load_model(path: Path) -> AnomalyModel:
         mean_sensitive=stats["mean_sensitive"],
         mean_admin=stats["mean_admin"],
     )
-    return AnomalyModel(stats=model_stats, threshold=payload["threshold"])
+    window_stats = {
+        name: ColumnStats(mean=item["mean"], std=item["std"])
+        for name, item in payload.get("window_stats", {}).items()
+    }
+    entity_baselines = payload.get("entity_baselines")
+    bytes_sketch = payload.get("bytes_sketch")
+    seasonal_baselines = payload.get("seasonal_baselines")
+    return AnomalyModel(
+        stats=model_stats,
+        threshold=payload["threshold"],
+        window_stats=window_stats,
+        entity_baselines=(
+            EntityBaselines.from_dict(entity_baselines, sections) if entity_baselines else None
+        ),
+        bytes_sketch=QuantileSketch.from_dict(bytes_sketch) if bytes_sketch else None,
+        threshold_quantile=payload.get("threshold_quantile"),
+        seasonal_baselines=(
+            SeasonalBaselines.from_dict(seasonal_baselines, sections)
+            if seasonal_baselines
+            else None
+        ),
+    )
@@ -0,0 +1,150 @@
+"""A directory of published model versions that running pipelines can follow.
+
+Layout of a registry::
+
+    <root>/versions/000001.nsmsmodel    one immutable binary model per version
+    <root>/CURRENT                      number of the active version
+
+:meth:`ModelRegistry.publish` writes a new model under a temporary name,
+verifies its checksums, links it into place under the next free version
+number (a publisher that loses the race for a number takes the next one)
+and only then atomically replaces ``CURRENT``. Readers therefore only ever
+see complete, verified versions, and a version never changes once published.
+
+:class:`ModelWatcher` polls ``CURRENT`` from a background thread and loads
+new versions there. A scoring loop picks up the latest model between batches
+by reading :attr:`ModelWatcher.model`, so scoring never waits for a load.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+from nsms.logging_utils import get_logger
+from nsms.model import AnomalyModel
+from nsms.model_format import MODEL_SUFFIX
+from nsms.model_io import load_model, save_model
+from nsms.polling import PollingWatcher
+
+
+logger = get_logger("model_registry")
+
+CURRENT_NAME = "CURRENT"
+VERSIONS_DIR = "versions"
+VERSION_DIGITS = 6
+
+
+class ModelRegistry:
+    """Numbered, immutable model versions plus an atomically replaced pointer."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.versions_dir = root / VERSIONS_DIR
+
+    def versions(self) -> List[int]:
+        if not self.versions_dir.is_dir():
+            return []
+        return sorted(
+            int(path.stem)
+            for path in self.versions_dir.glob(f"*{MODEL_SUFFIX}")
+            if path.stem.isdigit() and len(path.stem) == VERSION_DIGITS
+        )
+
+    def path(self, version: int) -> Path:
+        return self.versions_dir / f"{version:0{VERSION_DIGITS}d}{MODEL_SUFFIX}"
+
+    def current(self) -> int | None:
+        """The active version, or ``None`` before the first publish."""
+
+        try:
+            return int((self.root / CURRENT_NAME).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def publish(self, model: AnomalyModel) -> int:
+        """Store ``model`` as the next version, make it current and return its number."""
+
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = (
+            self.versions_dir / f".publish-{os.getpid()}-{threading.get_ident()}{MODEL_SUFFIX}"
+        )
+        try:
+            save_model(model, tmp_path)
+            load_model(tmp_path, verify=True)
+            version = max(self.versions(), default=0) + 1
+            while True:
+                try:
+                    os.link(tmp_path, self.path(version))
+                    break
+                except FileExistsError:
+                    version += 1
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.activate(version)
+        logger.info("Published model version %s to %s", version, self.root)
+        return version
+
+    def activate(self, version: int) -> None:
+        """Point ``CURRENT`` at an existing ``version`` (e.g. to roll back)."""
+
+        if not self.path(version).exists():
+            raise FileNotFoundError(f"Model version {version} not found in {self.root}")
+        pointer = self.root / CURRENT_NAME
+        tmp_path = pointer.with_name(f".{CURRENT_NAME}-{os.getpid()}-{threading.get_ident()}")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.write(str(version))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, pointer)
+
+    def load(self, version: int | None = None) -> AnomalyModel:
+        """Load ``version``, by default the current one."""
+
+        version = version if version is not None else self.current()
+        if version is None:
+            raise FileNotFoundError(f"No model has been published to {self.root}")
+        return load_model(self.path(version))
+
+
+class ModelWatcher(PollingWatcher):
+    """The current model of a registry, swapped for newer versions as they appear.
+
+    Call :meth:`start` to poll every ``interval`` seconds from a daemon
+    thread, or :meth:`poll` directly.
+    """
+
+    thread_name = "model-watcher"
+
+    def __init__(self, registry: ModelRegistry, interval: float = 5.0) -> None:
+        super().__init__(interval)
+        self.registry = registry
+        version = registry.current()
+        self._current: Tuple[int | None, AnomalyModel] = (version, registry.load(version))
+
+    @property
+    def model(self) -> AnomalyModel:
+        return self._current[1]
+
+    @property
+    def version(self) -> int | None:
+        return self._current[0]
+
+    def poll(self) -> bool:
+        """Load the current version if it changed; return True when the model was swapped."""
+
+        version = self.registry.current()
+        if version is None or version == self.version:
+            return False
+        try:
+            model = self.registry.load(version)
+        except (OSError, ValueError) as exc:
+            logger.warning(
+                "Keeping model version %s; cannot load version %s: %s", self.version, version, exc
+            )
+            return False
+        self._current = (version, model)
+        logger.info("Loaded model version %s from %s", version, self.registry.root)
+        return True
@@ -3,107 +3,458 @@
 from __future__ import annotations
 
 import json
-from dataclasses import asdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Sequence, TextIO
 
-from nsms.compliance import ComplianceChecker
 from nsms.config import Config
-from nsms.data import LogRecord, load_logs
+from nsms.data import LogBatch, LogRecord, iter_batches, load_batch
+from nsms.feature_registry import FeatureExtractor, feature_names
+from nsms.feature_store import cached_features, load_features
 from nsms.incident import create_incident
+from nsms.ingest import resolve_log_paths
 from nsms.logging_utils import get_logger
-from nsms.metrics import compute_metrics
-from nsms.model import AnomalyModel
+from nsms.metrics import MetricsCounter, count_nonzero
+from nsms.model import AnomalyModel, ModelTrainer
 from nsms.model_io import load_model, save_model
-from nsms.preprocessing import extract_features
+from nsms.model_registry import ModelRegistry, ModelWatcher
+from nsms.preprocessing import FeatureMatrix
+from nsms.reference_data import ReferenceData, ReferenceWatcher
 from nsms.reporting import build_report, write_report
 from nsms.retention import enforce_retention
-from nsms.threat_intel import ThreatIntelStore, ThreatIndicator
+from nsms.sampling import ReservoirSampler, SamplingReport, compare_models
+from nsms.threat_intel import ThreatIndicator
+from nsms.validators import validate_batch
 
 
 logger = get_logger("monitoring")
 
+REPORT_SAMPLE_SIZE = 5
+
 
 def train_model(config: Config) -> AnomalyModel:
-    records = load_logs(config.data_path)
-    features = extract_features(records)
-    model = AnomalyModel.train(features, threshold=config.anomaly_threshold)
-    save_model(model, config.model_path)
+    if config.sample_size:
+        return train_model_sampled(config)
+    # Per-entity and seasonal baselines group rows by entity and timestamp, so
+    # they need the parsed logs even when the features come from the cache.
+    batch = _load_window(config) if config.entity_baselines or config.seasonal_baselines else None
+    features = load_features(config, batch)
+    model = _trainer(config).update(features, batch).model(config.anomaly_threshold)
+    _save_model(config, model)
     logger.info("Saved model to %s", config.model_path)
     return model
 
 
+def train_model_streaming(config: Config, chunk_size: int | None = None) -> AnomalyModel:
+    """Train in one pass over bounded chunks, in constant memory.
+
+    With ``workers > 1`` and several input files, each file is trained in
+    its own process and the partial :class:`ModelTrainer` states are merged
+    in file order. Windowed features carry state from one file to the next,
+    so inputs using ``feature_windows`` are always trained sequentially.
+    """
+
+    trainer = _stream_trainer(config, chunk_size or config.chunk_size)
+    model = trainer.model(config.anomaly_threshold)
+    _save_model(config, model)
+    logger.info(
+        "Saved model trained on %s streamed records to %s", trainer.count, config.model_path
+    )
+    return model
+
+
+def train_model_sampled(
+    config: Config, chunk_size: int | None = None, seed: int = 0
+) -> AnomalyModel:
+    """Train on a reservoir sample of ``config.sample_size`` rows.
+
+    The sample is drawn in one streaming pass (stratified by
+    ``config.sample_stratify`` when set), so only the sampled rows are ever
+    held in memory or turned into features. Windowed features need every
+    row of a window and cannot be trained from a sample.
+    """
+
+    return train_on_sample(config, sample_logs(config, chunk_size, seed))
+
+
+def train_on_sample(config: Config, sampler: ReservoirSampler) -> AnomalyModel:
+    """Train and save a model on the rows drawn by ``sampler``."""
+
+    if config.feature_windows:
+        raise ValueError("Windowed features cannot be trained from a sample; unset feature_windows")
+    sample = sampler.sample()
+    extractor = FeatureExtractor(feature_names([]))
+    model = (
+        _trainer(config).update(extractor.extract(sample), sample).model(config.anomaly_threshold)
+    )
+    _save_model(config, model)
+    logger.info(
+        "Saved model trained on a sample of %s of %s records to %s",
+        len(sample),
+        sampler.seen,
+        config.model_path,
+    )
+    return model
+
+
+def sample_logs(config: Config, chunk_size: int | None = None, seed: int = 0) -> ReservoirSampler:
+    """Draw ``config.sample_size`` rows of the input in one pass.
+
+    With ``workers > 1`` and several input files, each file is sampled in
+    its own process (with seeds ``seed``, ``seed + 1``, ...) and the
+    samplers are merged.
+    """
+
+    if not config.sample_size:
+        raise ValueError("sample_size must be set to sample the input")
+    chunk_size = chunk_size or config.chunk_size
+    paths = resolve_log_paths(config.data_path, config.window_start, config.window_end)
+    if config.workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(config.workers, len(paths))) as executor:
+            futures = [
+                executor.submit(_sample_shard, config, path, chunk_size, seed + idx)
+                for idx, path in enumerate(paths)
+            ]
+            sampler = futures[0].result()
+            for future in futures[1:]:
+                sampler.merge(future.result())
+        return sampler
+    return _sample_shard(config, config.data_path, chunk_size, seed)
+
+
+def compare_sampled_model(
+    config: Config, sampled: AnomalyModel, sampler: ReservoirSampler, chunk_size: int | None = None
+) -> SamplingReport:
+    """Train the full model in memory and compare ``sampled`` with it.
+
+    The full model is trained with :func:`train_model_streaming`'s single
+    pass but not saved; both models then score every row. The report is
+    written to ``sampling_report.json`` in the output directory.
+    """
+
+    chunk_size = chunk_size or config.chunk_size
+    full = _stream_trainer(config, chunk_size).model(config.anomaly_threshold)
+    report = compare_models(sampled, full, sampler)
+    extractor = FeatureExtractor(full.required_features)
+    batches = iter_batches(
+        config.data_path,
+        chunk_size,
+        workers=config.workers,
+        start=config.window_start,
+        end=config.window_end,
+    )
+    for batch in batches:
+        features = extractor.extract(batch)
+        report.add_predictions(full.predict(features, batch), sampled.predict(features, batch))
+    config.ensure_output_dir()
+    report_path = config.output_dir / "sampling_report.json"
+    report_path.write_text(json.dumps(report.as_dict(), indent=2))
+    logger.info("Wrote sampling report to %s", report_path)
+    return report
+
+
+def _stream_trainer(config: Config, chunk_size: int) -> ModelTrainer:
+    paths = resolve_log_paths(config.data_path, config.window_start, config.window_end)
+    if config.workers > 1 and len(paths) > 1 and not config.feature_windows:
+        trainer = _trainer(config)
+        with ProcessPoolExecutor(max_workers=min(config.workers, len(paths))) as executor:
+            futures = [executor.submit(_train_shard, config, path, chunk_size) for path in paths]
+            for future in futures:
+                trainer.merge(future.result())
+        return trainer
+    return _train_shard(config, config.data_path, chunk_size)
+
+
+def _train_shard(config: Config, path: Path, chunk_size: int) -> ModelTrainer:
+    extractor = FeatureExtractor(feature_names(config.feature_windows))
+    trainer = _trainer(config)
+    batches = iter_batches(
+        path, chunk_size, workers=config.workers, start=config.window_start, end=config.window_end
+    )
+    for batch in batches:
+        trainer.update(extractor.extract(batch), batch)
+    extractor.timings.log(f"Training {path}")
+    return trainer
+
+
+def load_current_model(config: Config) -> AnomalyModel:
+    """The registry's current model when ``model_registry`` is set, else ``model_path``'s."""
+
+    if config.model_registry is not None:
+        return ModelRegistry(config.model_registry).load()
+    return load_model(config.model_path)
+
+
+def _save_model(config: Config, model: AnomalyModel) -> None:
+    save_model(model, config.model_path)
+    if config.model_registry is not None:
+        ModelRegistry(config.model_registry).publish(model)
+
+
+def _sample_shard(config: Config, path: Path, chunk_size: int, seed: int) -> ReservoirSampler:
+    sampler = ReservoirSampler(config.sample_size, config.sample_stratify, seed)
+    batches = iter_batches(
+        path, chunk_size, workers=config.workers, start=config.window_start, end=config.window_end
+    )
+    for batch in batches:
+        sampler.update(batch)
+    return sampler
+
+
+def _trainer(config: Config) -> ModelTrainer:
+    return ModelTrainer(
+        config.entity_baselines,
+        config.entity_min_count,
+        config.threshold_quantile,
+        config.seasonal_baselines,
+    )
+
+
+def _load_window(config: Config) -> LogBatch:
+    return load_batch(
+        config.data_path, workers=config.workers, start=config.window_start, end=config.window_end
+    )
+
+
 def run_pipeline(config: Config, model: AnomalyModel | None = None) -> Path:
     """Run the full monitoring pipeline and write outputs to disk."""
 
     config.ensure_output_dir()
-    model = model or load_model(config.model_path)
-    records = load_logs(config.data_path)
-    features = extract_features(records)
-    anomalies = model.predict(features)
+    model = model or load_current_model(config)
+    batch = _load_window(config)
+    features = load_features(config, batch, names=model.required_features)
+    return _process_batches(config, model, [batch], features)
 
-    threat_store = ThreatIntelStore.load(config.threat_intel_path)
-    threat_hits: List[bool] = []
-    threat_indicators: List[ThreatIndicator] = []
-    compliance_checker = ComplianceChecker.load(config.compliance_rules_path)
-    compliance_hits: List[bool] = []
 
-    alerts_path = config.output_dir / "alerts.jsonl"
-    incidents_path = config.output_dir / "incidents.jsonl"
+def run_pipeline_streaming(
+    config: Config, model: AnomalyModel | None = None, chunk_size: int | None = None
+) -> Path:
+    """Run the monitoring pipeline over the input in bounded chunks.
 
-    with alerts_path.open("w", encoding="utf-8") as alerts_handle, incidents_path.open(
-        "w", encoding="utf-8"
-    ) as incidents_handle:
-        for idx, record in enumerate(records):
-            indicator = threat_store.check_ip(record.source_ip)
+    Outputs match :func:`run_pipeline`, but only one chunk of records,
+    features and detections is alive at a time, so peak memory depends on
+    ``chunk_size`` rather than on the size of ``config.data_path``. Features
+    are sliced from the feature cache when it holds this input, but a miss
+    does not populate it, since that would need every chunk's features.
+    """
+
+    config.ensure_output_dir()
+    model = model or load_current_model(config)
+    batches = iter_batches(
+        config.data_path,
+        chunk_size or config.chunk_size,
+        workers=config.workers,
+        start=config.window_start,
+        end=config.window_end,
+    )
+    features = cached_features(config, names=model.required_features)
+    return _process_batches(config, model, _validated_batches(batches), features)
+
+
+def _validated_batches(batches: Iterable[LogBatch]) -> Iterator[LogBatch]:
+    issue_count = 0
+    record_count = 0
+    for batch in batches:
+        issue_count += len(validate_batch(batch))
+        record_count += len(batch)
+        yield batch
+    if issue_count:
+        logger.warning("%s validation issues detected", issue_count)
+    logger.info("Streamed %s log records", record_count)
+
+
+@dataclass
+class PipelineState:
+    """Running results of a pipeline: everything needed to resume it."""
+
+    counter: MetricsCounter = field(default_factory=MetricsCounter)
+    sample_records: List[LogRecord] = field(default_factory=list)
+    threat_indicators: List[ThreatIndicator] = field(default_factory=list)
+    extractor: FeatureExtractor | None = None
+    # Records and hits per version of the compliance rules and threat intel.
+    reference_hits: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "counter": asdict(self.counter),
+            "sample_records": [
+                {**asdict(record), "timestamp": record.timestamp.isoformat()}
+                for record in self.sample_records
+            ],
+            "threat_indicators": [asdict(indicator) for indicator in self.threat_indicators],
+            "features": self.extractor.as_dict() if self.extractor else None,
+            "reference_hits": self.reference_hits,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, object]) -> "PipelineState":
+        return cls(
+            counter=MetricsCounter(**payload["counter"]),
+            sample_records=[
+                LogRecord(**{**item, "timestamp": datetime.fromisoformat(item["timestamp"])})
+                for item in payload["sample_records"]
+            ],
+            threat_indicators=[ThreatIndicator(**item) for item in payload["threat_indicators"]],
+            extractor=(
+                FeatureExtractor.from_dict(payload["features"]) if payload.get("features") else None
+            ),
+            reference_hits={
+                version: dict(hits) for version, hits in payload.get("reference_hits", {}).items()
+            },
+        )
+
+
+class BatchProcessor:
+    """Score batches, write their alerts and incidents, and keep the totals.
+
+    Record indices (and so incident ids) continue from ``state``, which lets
+    a resumed pipeline append to existing outputs without reusing ids.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        model: AnomalyModel,
+        state: PipelineState | None = None,
+        watcher: ModelWatcher | None = None,
+        references: ReferenceWatcher | None = None,
+    ) -> None:
+        self.config = config
+        self.state = state or PipelineState()
+        self.watcher = watcher
+        self.references = references
+        self._use_model(model)
+        self.reference = references.data if references is not None else ReferenceData.load(config)
+
+    def process(
+        self,
+        batch: LogBatch,
+        alerts_handle: TextIO,
+        incidents_handle: TextIO,
+        features: FeatureMatrix | None = None,
+    ) -> None:
+        """Handle one batch; ``features`` are its precomputed features, if any."""
+
+        if self.watcher is not None and self.watcher.model is not self.model:
+            logger.info("Switched to model version %s", self.watcher.version)
+            self._use_model(self.watcher.model)
+            features = None
+        if self.references is not None and self.references.data is not self.reference:
+            self.reference = self.references.data
+            logger.info("Switched to reference data %s", self.reference.version)
+        reference = self.reference
+        state = self.state
+        base_index = state.counter.total_records
+        if features is None or len(features) != len(batch):
+            features = state.extractor.extract(batch)
+        anomalies = self.model.predict(features, batch)
+        source_values = batch.source_ip.values
+        indicators_by_code = {
+            code: reference.threat_store.check_ip(source_values[code])
+            for code in dict.fromkeys(batch.source_ip.codes)
+        }
+        checker = reference.compliance_checker
+        violation_masks = checker.violation_masks(batch)
+        threat_hits: List[bool] = []
+        for offset in range(len(batch)):
+            idx = base_index + offset
+            indicator = indicators_by_code[batch.source_ip.codes[offset]]
             threat_hit = indicator is not None
             threat_hits.append(threat_hit)
-            if indicator:
-                threat_indicators.append(indicator)
-            violations = compliance_checker.evaluate(record)
+            if indicator and len(state.threat_indicators) < REPORT_SAMPLE_SIZE:
+                state.threat_indicators.append(indicator)
+            violations = checker.rule_ids(violation_masks[offset])
             compliance_hit = bool(violations)
-            compliance_hits.append(compliance_hit)
 
             alert = {
                 "record_index": idx,
-                "timestamp": record.timestamp.isoformat(),
-                "source_ip": record.source_ip,
-                "destination_ip": record.destination_ip,
-                "anomaly": anomalies[idx],
+                "timestamp": batch.timestamp(offset).isoformat(),
+                "source_ip": batch.source_ip[offset],
+                "destination_ip": batch.destination_ip[offset],
+                "anomaly": anomalies[offset],
                 "threat_intel_hit": threat_hit,
                 "compliance_violations": violations,
             }
             alerts_handle.write(json.dumps(alert) + "\n")
 
-            if anomalies[idx] or threat_hit or compliance_hit:
-                severity = _severity_for_record(anomalies[idx], threat_hit, compliance_hit)
+            if anomalies[offset] or threat_hit or compliance_hit:
+                severity = _severity_for_record(anomalies[offset], threat_hit, compliance_hit)
                 incident = create_incident(
                     incident_id=f"INC-{idx:04d}",
                     severity=severity,
-                    description=_incident_description(record, indicator, violations),
+                    description=_incident_description(batch.record(offset), indicator, violations),
                 )
                 incidents_handle.write(json.dumps(_incident_payload(incident)) + "\n")
 
-    metrics = compute_metrics(records, anomalies, threat_hits, compliance_hits)
-    metrics_path = config.output_dir / "metrics.json"
-    metrics_path.write_text(json.dumps(metrics.as_dict(), indent=2))
-
-    summary_path = config.output_dir / "run_summary.json"
-    summary_path.write_text(
-        json.dumps(
-            {
-                "total_records": len(records),
-                "alerts": sum(1 for flag in anomalies if flag),
-                "threat_intel_hits": sum(1 for flag in threat_hits if flag),
-                "compliance_violations": sum(1 for flag in compliance_hits if flag),
-            },
-            indent=2,
+        state.counter.update(anomalies, threat_hits, violation_masks)
+        hits = state.reference_hits.setdefault(
+            reference.version, {"records": 0, "threat_intel_hits": 0, "compliance_violations": 0}
         )
-    )
+        hits["records"] += len(batch)
+        hits["threat_intel_hits"] += sum(threat_hits)
+        hits["compliance_violations"] += count_nonzero(violation_masks)
+        for offset in range(min(len(batch), REPORT_SAMPLE_SIZE - len(state.sample_records))):
+            state.sample_records.append(batch.record(offset))
+
+    def _use_model(self, model: AnomalyModel) -> None:
+        self.model = model
+        names = model.required_features
+        if self.state.extractor is None or self.state.extractor.names != names:
+            self.state.extractor = FeatureExtractor(names)
+
+    def write_summaries(self) -> None:
+        """Write ``metrics.json``, ``run_summary.json`` and ``summary.md``."""
 
-    report = build_report(records, metrics, threat_indicators[:5], sum(1 for flag in compliance_hits if flag))
-    write_report(config.output_dir / "summary.md", report)
+        output_dir = self.config.output_dir
+        metrics = self.state.counter.freeze()
+        metrics_path = output_dir / "metrics.json"
+        metrics_path.write_text(json.dumps(metrics.as_dict(), indent=2))
+
+        summary_path = output_dir / "run_summary.json"
+        summary_path.write_text(
+            json.dumps(
+                {
+                    "total_records": metrics.total_records,
+                    "alerts": metrics.anomalous_records,
+                    "threat_intel_hits": metrics.threat_intel_hits,
+                    "compliance_violations": metrics.compliance_violations,
+                },
+                indent=2,
+            )
+        )
+
+        report = build_report(
+            self.state.sample_records,
+            metrics,
+            self.state.threat_indicators,
+            metrics.compliance_violations,
+        )
+        write_report(output_dir / "summary.md", report)
+
+
+def _process_batches(
+    config: Config,
+    model: AnomalyModel,
+    batches: Iterable[LogBatch],
+    features: FeatureMatrix | None = None,
+) -> Path:
+    processor = BatchProcessor(config, model)
+    alerts_path = config.output_dir / "alerts.jsonl"
+    incidents_path = config.output_dir / "incidents.jsonl"
+
+    with alerts_path.open("w", encoding="utf-8") as alerts_handle, incidents_path.open(
+        "w", encoding="utf-8"
+    ) as incidents_handle:
+        offset = 0
+        for batch in batches:
+            rows = features.slice(offset, offset + len(batch)) if features is not None else None
+            processor.process(batch, alerts_handle, incidents_handle, rows)
+            offset += len(batch)
 
+    processor.state.extractor.timings.log("Pipeline")
+    processor.write_summaries()
     enforce_retention(config.output_dir, config.retention_days)
 
     logger.info("Pipeline complete. Outputs written to %s", config.output_dir)
@@ -121,7 +472,7 @@ def _severity_for_record(anomaly: bool, threat_hit: bool, compliance_hit: bool)
 
 
 def _incident_description(
-    record: LogRecord, indicator: ThreatIndicator | None, violations: List[str]
+    record: LogRecord, indicator: ThreatIndicator | None, violations: Sequence[str]
 ) -> str:
     parts = [
         f"Source {record.source_ip} to {record.destination_ip}",
@@ -0,0 +1,130 @@
+"""Date/hour partitioned log storage with time-range pruning.
+
+Layout under a partition root::
+
+    dt=2024-01-01/hour=00/part-00000.csv
+    dt=2024-01-01/hour=01/part-00000.csv
+    ...
+
+Partitions are keyed by the UTC hour of each row's timestamp. Readers given
+``start``/``end`` bounds list only the hour directories overlapping
+``[start, end)``, so a query over the last few hours never opens the rest of
+the history. Rows at the edges of the range are filtered by the loader.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Union
+
+from nsms.csv_fast import to_epoch_micros
+from nsms.data import LogBatch, LogRecord, from_epoch_micros, iter_batches, write_logs
+from nsms.logging_utils import get_logger
+
+
+logger = get_logger("partitions")
+
+DAY_PREFIX = "dt="
+HOUR_PREFIX = "hour="
+PART_PREFIX = "part-"
+PARTITION_BATCH_SIZE = 1_000_000
+_HOUR_MICROS = 3600 * 1_000_000
+
+
+def partition_dir(root: Path, timestamp: datetime) -> Path:
+    """Return the partition directory holding rows at ``timestamp``."""
+
+    hour = from_epoch_micros(to_epoch_micros(timestamp))
+    return root / f"{DAY_PREFIX}{hour:%Y-%m-%d}" / f"{HOUR_PREFIX}{hour:%H}"
+
+
+def is_partitioned_root(path: Path) -> bool:
+    return path.is_dir() and any(
+        child.is_dir() and child.name.startswith(DAY_PREFIX) for child in path.iterdir()
+    )
+
+
+def write_partitioned_logs(root: Path, logs: Union[LogBatch, Sequence[LogRecord]]) -> List[Path]:
+    """Write ``logs`` under ``root`` as one new part file per hour.
+
+    Existing partitions are never rewritten; each call adds a new
+    ``part-NNNNN.csv`` to every hour it touches. Rows keep their input order
+    within a part. Returns the written paths.
+    """
+
+    batch = logs if isinstance(logs, LogBatch) else LogBatch.from_records(logs)
+    rows_by_hour: Dict[int, List[int]] = defaultdict(list)
+    for idx, value in enumerate(batch.timestamps):
+        rows_by_hour[value // _HOUR_MICROS].append(idx)
+
+    written: List[Path] = []
+    for hour in sorted(rows_by_hour):
+        directory = partition_dir(root, from_epoch_micros(hour * _HOUR_MICROS))
+        directory.mkdir(parents=True, exist_ok=True)
+        existing = [path for path in directory.iterdir() if path.name.startswith(PART_PREFIX)]
+        path = directory / f"{PART_PREFIX}{len(existing):05d}.csv"
+        tmp_path = directory / f".{path.name}.tmp"
+        write_logs(tmp_path, list(batch.take(rows_by_hour[hour]).records()))
+        os.replace(tmp_path, path)
+        written.append(path)
+    logger.info("Wrote %s rows to %s partitions under %s", len(batch), len(written), root)
+    return written
+
+
+def partition_log_file(source: Path, root: Path, batch_size: int = PARTITION_BATCH_SIZE) -> int:
+    """Copy the logs at ``source`` into the partition layout under ``root``."""
+
+    rows = 0
+    for batch in iter_batches(source, batch_size):
+        write_partitioned_logs(root, batch)
+        rows += len(batch)
+    return rows
+
+
+def partition_files(
+    root: Path, start: datetime | None = None, end: datetime | None = None
+) -> List[Path]:
+    """List part files of the hours overlapping ``[start, end)``, oldest first."""
+
+    start = _naive_utc(start)
+    end = _naive_utc(end)
+    files: List[Path] = []
+    for day_dir in _children(root, DAY_PREFIX):
+        try:
+            day = date.fromisoformat(day_dir.name[len(DAY_PREFIX) :])
+        except ValueError:
+            continue
+        day_start = datetime(day.year, day.month, day.day)
+        if not _overlaps(day_start, day_start + timedelta(days=1), start, end):
+            continue
+        for hour_dir in _children(day_dir, HOUR_PREFIX):
+            try:
+                hour_start = day_start + timedelta(hours=int(hour_dir.name[len(HOUR_PREFIX) :]))
+            except ValueError:
+                continue
+            if _overlaps(hour_start, hour_start + timedelta(hours=1), start, end):
+                files.extend(
+                    sorted(
+                        path
+                        for path in hour_dir.iterdir()
+                        if path.is_file() and path.name.startswith(PART_PREFIX)
+                    )
+                )
+    return files
+
+
+def _children(directory: Path, prefix: str) -> Iterable[Path]:
+    return sorted(
+        child for child in directory.iterdir() if child.is_dir() and child.name.startswith(prefix)
+    )
+
+
+def _overlaps(low: datetime, high: datetime, start: datetime | None, end: datetime | None) -> bool:
+    return (start is None or high > start) and (end is None or low < end)
+
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    return None if value is None else from_epoch_micros(to_epoch_micros(value))
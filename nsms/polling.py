@@ -0,0 +1,50 @@
+"""Background polling shared by the watchers of long-running pipelines."""
+
+from __future__ import annotations
+
+import threading
+
+from nsms.logging_utils import get_logger
+
+
+logger = get_logger("polling")
+
+
+class PollingWatcher:
+    """Calls :meth:`poll` every ``interval`` seconds from a daemon thread.
+
+    Subclasses implement :meth:`poll`, which loads new state off the scoring
+    path and publishes it with a single reference assignment, so readers
+    between batches see either the old state or the new one.
+    """
+
+    thread_name = "watcher"
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def poll(self) -> bool:
+        """Pick up changes; return True when new state was published."""
+
+        raise NotImplementedError
+
+    def start(self) -> "PollingWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:  # Keep watching; the next poll may succeed.
+                logger.exception("%s poll failed", type(self).__name__)
@@ -2,10 +2,31 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable, List
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Sequence
 
-from nsms.data import LogRecord
+from nsms.data import LogBatch, LogRecord
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; FeatureMatrix falls back to arrays.
+    np = None
+
+
+# Bump when the meaning of any feature changes; cached matrices written by
+# nsms.feature_store under another version are ignored.
+FEATURE_SCHEMA_VERSION = 2
+FLAG_COLUMNS = ("is_denied", "is_sensitive_resource", "is_admin_user")
+PER_ROW_FEATURES = ("bytes_transferred",) + FLAG_COLUMNS
+# float32 holds every integer up to 2**24 exactly; larger byte counts keep
+# the column in float64 so no value is rounded.
+FLOAT32_EXACT_LIMIT = 2**24
+
+WINDOW_ENTITY_FIELDS = ("source_ip", "user")
+WINDOW_STATISTICS = ("count", "bytes", "deny_rate")
+DEFAULT_WINDOW_BUCKETS = 12
 
 
 @dataclass(frozen=True)
@@ -16,17 +37,411 @@ class FeatureVector:
     is_admin_user: int
 
 
+@dataclass
+class FeatureMatrix:
+    """Contiguous feature matrix for a whole :class:`LogBatch`.
+
+    ``bytes_transferred`` is a float32 vector (float64 if a value is too
+    large for float32 to represent exactly) and ``flags`` an ``(n, 3)`` int8
+    matrix whose columns follow ``FLAG_COLUMNS``. With NumPy both are
+    ndarrays; without it they are ``array('f')``/``array('d')`` (or
+    memoryviews of a cached matrix) and a row-major ``array('b')`` of
+    ``3 * n`` values.
+
+    ``windowed`` holds the float64 columns of a
+    :class:`WindowedFeatureEngine`, keyed by :func:`window_feature_names`.
+    """
+
+    bytes_transferred: Any
+    flags: Any
+    windowed: Dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.bytes_transferred)
+
+    @classmethod
+    def from_vectors(cls, vectors: Sequence[FeatureVector]) -> "FeatureMatrix":
+        """Pack feature vectors into a matrix, keeping bytes in float64."""
+
+        bytes_column = array("d", (vector.bytes_transferred for vector in vectors))
+        columns = {
+            "bytes_transferred": (
+                bytes_column if np is None else np.array(bytes_column, dtype=np.float64)
+            )
+        }
+        for name in FLAG_COLUMNS:
+            columns[name] = array("b", (getattr(vector, name) for vector in vectors))
+        return assemble_feature_matrix(len(vectors), columns)
+
+    @property
+    def is_ndarray(self) -> bool:
+        return np is not None and isinstance(self.flags, np.ndarray)
+
+    def flag_column(self, name: str) -> Sequence[int]:
+        position = FLAG_COLUMNS.index(name)
+        if self.is_ndarray:
+            return self.flags[:, position]
+        return self.flags[position :: len(FLAG_COLUMNS)]
+
+    def slice(self, start: int, stop: int) -> "FeatureMatrix":
+        """Return rows ``[start, stop)`` without copying the NumPy columns."""
+
+        if self.is_ndarray:
+            flags = self.flags[start:stop]
+        else:
+            flags = self.flags[start * len(FLAG_COLUMNS) : stop * len(FLAG_COLUMNS)]
+        return FeatureMatrix(
+            bytes_transferred=self.bytes_transferred[start:stop],
+            flags=flags,
+            windowed={name: column[start:stop] for name, column in self.windowed.items()},
+        )
+
+    def __getitem__(self, idx: int) -> FeatureVector:
+        if self.is_ndarray:
+            flags = self.flags[idx]
+        else:
+            flags = self.flags[idx * len(FLAG_COLUMNS) : (idx + 1) * len(FLAG_COLUMNS)]
+        is_denied, is_sensitive_resource, is_admin_user = (int(flag) for flag in flags)
+        return FeatureVector(
+            bytes_transferred=float(self.bytes_transferred[idx]),
+            is_denied=is_denied,
+            is_sensitive_resource=is_sensitive_resource,
+            is_admin_user=is_admin_user,
+        )
+
+    def __iter__(self) -> Iterator[FeatureVector]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
 def extract_features(records: Iterable[LogRecord]) -> List[FeatureVector]:
-    """Extract numeric feature vectors from log records."""
+    """Extract numeric feature vectors from log records.
+
+    A :class:`LogBatch` goes through :func:`extract_feature_matrix` instead.
+    """
 
     features: List[FeatureVector] = []
     for record in records:
         features.append(
             FeatureVector(
                 bytes_transferred=float(record.bytes_transferred),
-                is_denied=1 if record.status.lower() != "ok" else 0,
-                is_sensitive_resource=1 if "sensitive" in record.resource else 0,
-                is_admin_user=1 if record.user.lower().startswith("admin") else 0,
+                is_denied=_is_denied(record.status),
+                is_sensitive_resource=_is_sensitive_resource(record.resource),
+                is_admin_user=_is_admin_user(record.user),
             )
         )
     return features
+
+
+def extract_feature_matrix(
+    batch: LogBatch, windows: "WindowedFeatureEngine | None" = None
+) -> FeatureMatrix:
+    """Build a :class:`FeatureMatrix` with whole-column operations.
+
+    Each flag column is a lookup of the string codes in a table of facts
+    memoized per distinct value, so no per-row Python code runs when NumPy
+    is available. With ``windows`` the batch is also fed to the engine and
+    its columns are added to the matrix.
+    """
+
+    columns = {name: feature_column(batch, name) for name in PER_ROW_FEATURES}
+    if windows is not None:
+        columns.update(windows.update(batch, columns["is_denied"]))
+    return assemble_feature_matrix(len(batch), columns)
+
+
+def feature_column(batch: LogBatch, name: str) -> Any:
+    """Compute one per-row feature column of ``batch``.
+
+    ``bytes_transferred`` is float32 (float64 if a value reaches 2**24) and
+    the flags are int8, as ndarrays when NumPy is available and ``array``
+    objects otherwise.
+    """
+
+    if name == "bytes_transferred":
+        values = batch.bytes_transferred
+        if np is None:
+            exact = not len(values) or max(max(values), -min(values)) < FLOAT32_EXACT_LIMIT
+            return array("f" if exact else "d", values)
+        raw_bytes = np.frombuffer(values, dtype=np.int64)
+        exact = not len(raw_bytes) or int(np.abs(raw_bytes).max()) < FLOAT32_EXACT_LIMIT
+        return raw_bytes.astype(np.float32 if exact else np.float64)
+    field_name, predicate = _FLAG_PREDICATES[name]
+    column = getattr(batch, field_name)
+    facts = column.facts(name, predicate)
+    if np is None:
+        return array("b", map(facts.__getitem__, column.codes))
+    lookup = np.asarray(facts, dtype=np.int8)
+    return lookup[np.frombuffer(column.codes, dtype=f"u{column.codes.itemsize}")]
+
+
+def assemble_feature_matrix(rows: int, columns: Dict[str, Any]) -> FeatureMatrix:
+    """Pack named feature columns into a :class:`FeatureMatrix`.
+
+    Per-row columns missing from ``columns`` are left as zeros; every other
+    column goes into :attr:`FeatureMatrix.windowed`.
+    """
+
+    bytes_column = columns.get("bytes_transferred")
+    windowed = {name: column for name, column in columns.items() if name not in PER_ROW_FEATURES}
+    if np is None:
+        flags = array("b", bytes(rows * len(FLAG_COLUMNS)))
+        for position, name in enumerate(FLAG_COLUMNS):
+            if name in columns:
+                flags[position :: len(FLAG_COLUMNS)] = columns[name]
+        return FeatureMatrix(
+            bytes_transferred=(
+                bytes_column if bytes_column is not None else array("f", bytes(4 * rows))
+            ),
+            flags=flags,
+            windowed=windowed,
+        )
+    flags = np.zeros((rows, len(FLAG_COLUMNS)), dtype=np.int8)
+    for position, name in enumerate(FLAG_COLUMNS):
+        if name in columns:
+            flags[:, position] = columns[name]
+    return FeatureMatrix(
+        bytes_transferred=(
+            bytes_column if bytes_column is not None else np.zeros(rows, dtype=np.float32)
+        ),
+        flags=flags,
+        windowed={
+            name: np.frombuffer(column, dtype=np.float64) if isinstance(column, array) else column
+            for name, column in windowed.items()
+        },
+    )
+
+
+def window_feature_names(
+    windows: Sequence[int], entities: Sequence[str] = WINDOW_ENTITY_FIELDS
+) -> List[str]:
+    """Column names produced by a :class:`WindowedFeatureEngine` over ``windows``."""
+
+    return [
+        f"{entity}_{statistic}_{window}s"
+        for entity in entities
+        for window in windows
+        for statistic in WINDOW_STATISTICS
+    ]
+
+
+def window_sizes(names: Iterable[str]) -> List[int]:
+    """Windows (in seconds) named by windowed feature columns, in first-seen order."""
+
+    return list(dict.fromkeys(int(name.rsplit("_", 1)[1].rstrip("s")) for name in names))
+
+
+class _WindowCounter:
+    """Counts, byte sums and denials of one entity over one window.
+
+    The window is split into fixed-width buckets and only non-empty buckets
+    are queued, oldest first, as ``[bucket, count, bytes, denied]``. Running
+    totals are adjusted as buckets are added and expire, so each update
+    costs O(1) amortized however long the entity was idle.
+    """
+
+    __slots__ = ("buckets", "count", "byte_sum", "denied")
+
+    def __init__(self) -> None:
+        self.buckets: Deque[List[int]] = deque()
+        self.count = 0
+        self.byte_sum = 0
+        self.denied = 0
+
+    @property
+    def latest(self) -> int | None:
+        return self.buckets[-1][0] if self.buckets else None
+
+    def add(self, bucket: int, size: int, byte_count: int, denied: int) -> None:
+        buckets = self.buckets
+        if buckets and buckets[-1][0] == bucket:
+            entry = buckets[-1]
+            entry[1] += 1
+            entry[2] += byte_count
+            entry[3] += denied
+        elif not buckets or bucket > buckets[-1][0]:
+            buckets.append([bucket, 1, byte_count, denied])
+            horizon = bucket - size
+            while buckets[0][0] <= horizon:
+                _, count, byte_sum, expired_denied = buckets.popleft()
+                self.count -= count
+                self.byte_sum -= byte_sum
+                self.denied -= expired_denied
+        elif bucket > buckets[-1][0] - size:
+            # Late row still inside the window: add it to its own bucket.
+            position = len(buckets) - 1
+            while position >= 0 and buckets[position][0] > bucket:
+                position -= 1
+            if position >= 0 and buckets[position][0] == bucket:
+                entry = buckets[position]
+                entry[1] += 1
+                entry[2] += byte_count
+                entry[3] += denied
+            else:
+                buckets.insert(position + 1, [bucket, 1, byte_count, denied])
+        else:
+            # Late row from before the window; it no longer counts.
+            return
+        self.count += 1
+        self.byte_sum += byte_count
+        self.denied += denied
+
+    def as_list(self) -> List[List[int]]:
+        return [list(entry) for entry in self.buckets]
+
+    @classmethod
+    def from_list(cls, payload: Sequence[Sequence[int]]) -> "_WindowCounter":
+        counter = cls()
+        for entry in payload:
+            counter.buckets.append(list(entry))
+            counter.count += entry[1]
+            counter.byte_sum += entry[2]
+            counter.denied += entry[3]
+        return counter
+
+
+class WindowedFeatureEngine:
+    """Rolling per-``source_ip`` and per-``user`` aggregates over time windows.
+
+    For every row and window (in seconds) the engine reports how many rows,
+    how many bytes and what fraction of denied requests the row's source IP
+    and user had within the window, the row included. Windows advance in
+    steps of ``window / buckets``, so the covered span is between
+    ``(buckets - 1) / buckets`` of the window and the full window.
+
+    State persists across :meth:`update` calls, so batches must arrive in
+    time order; rows older than a window are left out of it. Entities idle
+    for longer than the largest window are evicted after each batch, which
+    bounds memory by the number of recently active entities.
+    """
+
+    def __init__(
+        self,
+        windows: Sequence[int],
+        buckets: int = DEFAULT_WINDOW_BUCKETS,
+        entities: Sequence[str] = WINDOW_ENTITY_FIELDS,
+    ) -> None:
+        if not windows or any(window <= 0 for window in windows):
+            raise ValueError("windows must be positive numbers of seconds")
+        if buckets <= 0:
+            raise ValueError("buckets must be greater than 0")
+        unknown = [entity for entity in entities if entity not in WINDOW_ENTITY_FIELDS]
+        if not entities or unknown:
+            raise ValueError(f"entities must be drawn from {', '.join(WINDOW_ENTITY_FIELDS)}")
+        self.windows = tuple(int(window) for window in windows)
+        self.buckets = buckets
+        self.entities = tuple(entities)
+        self.columns = window_feature_names(self.windows, self.entities)
+        self.evicted = 0
+        self._widths = [max(1, window * 1_000_000 // buckets) for window in self.windows]
+        self._largest = self.windows.index(max(self.windows))
+        self._clock: int | None = None
+        self._entities: Dict[str, Dict[str, List[_WindowCounter]]] = {
+            entity: {} for entity in self.entities
+        }
+
+    @property
+    def tracked_entities(self) -> int:
+        return sum(len(entities) for entities in self._entities.values())
+
+    def update(self, batch: LogBatch, denied: Sequence[int] | None = None) -> Dict[str, array]:
+        """Add ``batch`` to the windows and return its columns, row-aligned.
+
+        ``denied`` is the batch's ``is_denied`` column when already computed.
+        """
+
+        rows = len(batch)
+        columns = {name: array("d", bytes(8 * rows)) for name in self.columns}
+        if denied is None:
+            denied = feature_column(batch, "is_denied")
+        denied = denied.tolist()
+        widths = self._widths
+        size = self.buckets
+        for entity in self.entities:
+            outputs = [
+                [columns[f"{entity}_{statistic}_{window}s"] for statistic in WINDOW_STATISTICS]
+                for window in self.windows
+            ]
+            column = getattr(batch, entity)
+            values = column.values
+            entities = self._entities[entity]
+            for row, (code, timestamp, byte_count, is_denied) in enumerate(
+                zip(column.codes, batch.timestamps, batch.bytes_transferred, denied)
+            ):
+                counters = entities.get(values[code])
+                if counters is None:
+                    counters = entities[values[code]] = [_WindowCounter() for _ in widths]
+                for counter, width, (counts, byte_sums, denials) in zip(counters, widths, outputs):
+                    counter.add(timestamp // width, size, byte_count, is_denied)
+                    counts[row] = counter.count
+                    byte_sums[row] = counter.byte_sum
+                    denials[row] = counter.denied
+            for counts, _, denials in outputs:
+                # Turn the denial counts into rates in place.
+                for row, count in enumerate(counts):
+                    if count:
+                        denials[row] /= count
+        if rows:
+            latest = max(batch.timestamps)
+            self._clock = latest if self._clock is None else max(self._clock, latest)
+            self._evict_idle()
+        return columns
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "windows": list(self.windows),
+            "buckets": self.buckets,
+            "entities_tracked": list(self.entities),
+            "clock": self._clock,
+            "entities": {
+                entity: {
+                    value: [counter.as_list() for counter in counters]
+                    for value, counters in entities.items()
+                }
+                for entity, entities in self._entities.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "WindowedFeatureEngine":
+        engine = cls(payload["windows"], payload["buckets"], payload["entities_tracked"])
+        engine._clock = payload["clock"]
+        for entity, entities in payload["entities"].items():
+            engine._entities[entity] = {
+                value: [_WindowCounter.from_list(counter) for counter in counters]
+                for value, counters in entities.items()
+            }
+        return engine
+
+    def _evict_idle(self) -> None:
+        horizon = self._clock // self._widths[self._largest] - self.buckets
+        for entities in self._entities.values():
+            idle = [
+                value
+                for value, counters in entities.items()
+                if counters[self._largest].latest is None
+                or counters[self._largest].latest <= horizon
+            ]
+            for value in idle:
+                del entities[value]
+            self.evicted += len(idle)
+
+
+def _is_denied(status: str) -> int:
+    return 1 if status.lower() != "ok" else 0
+
+
+def _is_sensitive_resource(resource: str) -> int:
+    return 1 if "sensitive" in resource else 0
+
+
+def _is_admin_user(user: str) -> int:
+    return 1 if user.lower().startswith("admin") else 0
+
+
+# Flag feature -> (LogBatch string column, predicate memoized per value).
+_FLAG_PREDICATES = {
+    "is_denied": ("status", _is_denied),
+    "is_sensitive_resource": ("resource", _is_sensitive_resource),
+    "is_admin_user": ("user", _is_admin_user),
+}
@@ -0,0 +1,151 @@
+"""Compliance rules and threat intel, reloaded while a pipeline runs.
+
+:class:`ReferenceData` bundles the compiled :class:`ComplianceChecker` and
+the :class:`ThreatIntelStore` built from one snapshot of the two files. Its
+``version`` is a digest of their contents, so it names the same rules and
+indicators across restarts.
+
+:class:`ReferenceWatcher` checks the files' modification time, size and
+inode every ``interval`` seconds from a background thread and rebuilds the
+checker and store there when one changes. A
+:class:`~nsms.monitoring.BatchProcessor` picks up the new version at the
+start of its next batch, so a batch is always scored against one version.
+A file that fails to parse is logged and the previous version stays in use
+until the file changes again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, Tuple
+
+from nsms.compliance import ComplianceChecker
+from nsms.config import Config
+from nsms.logging_utils import get_logger
+from nsms.polling import PollingWatcher
+from nsms.threat_intel import ThreatIntelStore
+
+
+logger = get_logger("reference_data")
+
+VERSION_DIGITS = 12
+RELOAD_HISTORY = 16
+
+# (mtime in ns, size, inode) of each watched file.
+FileStamps = Tuple[Tuple[int, int, int], ...]
+
+
+def file_stamps(*paths: Path) -> FileStamps:
+    stamps = []
+    for path in paths:
+        stat = os.stat(path)
+        stamps.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+    return tuple(stamps)
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """One version of the compliance rules and threat intel."""
+
+    version: str
+    compliance_checker: ComplianceChecker
+    threat_store: ThreatIntelStore
+    stamps: FileStamps
+
+    @classmethod
+    def load(cls, config: Config) -> "ReferenceData":
+        paths = (config.compliance_rules_path, config.threat_intel_path)
+        for path, label in zip(paths, ("Compliance rules", "Threat intel")):
+            if not path.exists():
+                raise FileNotFoundError(f"{label} file not found: {path}")
+        # Stamp before reading: a write racing the read changes the stamps
+        # again, so the next poll reloads.
+        stamps = file_stamps(*paths)
+        rules_bytes, intel_bytes = (path.read_bytes() for path in paths)
+        digest = hashlib.blake2b(digest_size=VERSION_DIGITS // 2)
+        for content in (rules_bytes, intel_bytes):
+            digest.update(len(content).to_bytes(8, "little"))
+            digest.update(content)
+        return cls(
+            version=digest.hexdigest(),
+            compliance_checker=ComplianceChecker.from_payload(json.loads(rules_bytes)),
+            threat_store=ThreatIntelStore.from_payload(json.loads(intel_bytes)),
+            stamps=stamps,
+        )
+
+
+class ReferenceWatcher(PollingWatcher):
+    """The current :class:`ReferenceData` of ``config``, rebuilt when its files change.
+
+    ``reloads`` counts the versions published after the first, and
+    ``reload_history`` keeps the most recent reloads with how long the
+    rebuild took (``build_ms``) and how long after the newest file change
+    the new version was in place (``lag_ms``, bounded by ``interval`` plus
+    ``build_ms``).
+    """
+
+    thread_name = "reference-watcher"
+
+    def __init__(self, config: Config, interval: float = 5.0) -> None:
+        super().__init__(interval)
+        self.config = config
+        self.reloads = 0
+        self.reload_history: Deque[Dict[str, object]] = deque(maxlen=RELOAD_HISTORY)
+        self._data = ReferenceData.load(config)
+        self._stamps = self._data.stamps
+        self._failed: FileStamps | None = None
+
+    @property
+    def data(self) -> ReferenceData:
+        return self._data
+
+    def poll(self) -> bool:
+        """Rebuild if a file changed; return True when a new version was published."""
+
+        config = self.config
+        try:
+            stamps = file_stamps(config.compliance_rules_path, config.threat_intel_path)
+        except OSError:
+            # Between an editor's delete and rename, say; retry next poll.
+            return False
+        if stamps == self._stamps or stamps == self._failed:
+            return False
+        start = time.perf_counter()
+        try:
+            data = ReferenceData.load(config)
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            self._failed = stamps
+            logger.warning("Keeping reference data %s; cannot reload: %s", self._data.version, exc)
+            return False
+        build_seconds = time.perf_counter() - start
+        self._failed = None
+        if data.version == self._data.version:
+            # Touched but unchanged: keep the current version.
+            self._stamps = data.stamps
+            return False
+        lag_seconds = time.time() - max(mtime for mtime, _, _ in data.stamps) / 1e9
+        self._data = data
+        self._stamps = data.stamps
+        self.reloads += 1
+        self.reload_history.append(
+            {
+                "version": data.version,
+                "build_ms": round(build_seconds * 1000, 3),
+                "lag_ms": round(max(lag_seconds, 0.0) * 1000, 3),
+            }
+        )
+        logger.info("Loaded reference data %s in %.1f ms", data.version, build_seconds * 1000)
+        return True
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "version": self._data.version,
+            "reloads": self.reloads,
+            "recent_reloads": list(self.reload_history),
+        }
@@ -0,0 +1,422 @@
+"""A small expression language for compliance rule conditions.
+
+A condition describes when a record violates a rule, for example::
+
+    bytes > 1e9 and region != "us-east-1" and user startswith "svc-"
+
+Grammar (keywords are lower case)::
+
+    expression := term ("or" term)*
+    term       := factor ("and" factor)*
+    factor     := "not" factor | "(" expression ")" | comparison
+    comparison := field operator literal
+    operator   := "==" | "!=" | "<" | "<=" | ">" | ">=" | "in" | "not" "in"
+                | "startswith" | "endswith" | "contains"
+    literal    := number | "string" | 'string' | "[" literal ("," literal)* "]"
+
+``bytes`` is the only numeric field and takes the comparison operators;
+the string fields take equality, ``in`` and the three substring operators.
+
+:class:`RuleProgram` parses a set of conditions once into a graph of
+distinct subexpressions: identical subexpressions, across rules too, are one
+node (``and``/``or`` operands are put in a canonical order first), so each
+is evaluated once per record. Records are evaluated by functions generated
+with :func:`compile` that compute every node into a local and return the
+bitmask of true conditions; the mask of the conditions that read only
+string fields is memoized per combination of those fields' values.
+Batches are evaluated column-wise: a node that reads a single string field
+is a fact memoized per distinct value on the column's vocabulary, ``bytes``
+comparisons are whole-column operations, and ``and``/``or``/``not`` combine
+the resulting boolean columns.
+"""
+
+from __future__ import annotations
+
+import operator as operators
+import re
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Sequence, Tuple
+
+from nsms.data import FactTables, LogBatch, LogRecord
+
+try:  # Optional: whole-column evaluation.
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is absent
+    np = None
+
+
+STRING_FIELDS = (
+    "source_ip",
+    "destination_ip",
+    "protocol",
+    "action",
+    "region",
+    "user",
+    "resource",
+    "status",
+)
+# Expression field name -> LogRecord / LogBatch attribute.
+NUMERIC_FIELDS = {"bytes": "bytes_transferred"}
+_STRING_FIELD_SET = frozenset(STRING_FIELDS)
+STRING_OPERATORS = ("==", "!=", "in", "not in", "startswith", "endswith", "contains")
+NUMERIC_OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+        |(?P<string>"[^"]*"|'[^']*')
+        |(?P<symbol>==|!=|<=|>=|<|>|\(|\)|\[|\]|,)
+        |(?P<name>[A-Za-z_]\w*)
+    )""",
+    re.VERBOSE,
+)
+_PYTHON_OPERATORS = {
+    "==": "{} == {}",
+    "!=": "{} != {}",
+    "<": "{} < {}",
+    "<=": "{} <= {}",
+    ">": "{} > {}",
+    ">=": "{} >= {}",
+    "in": "{} in {}",
+    "not in": "{} not in {}",
+    "startswith": "{}.startswith({})",
+    "endswith": "{}.endswith({})",
+    "contains": "{1} in {0}",
+}
+
+_NUMERIC_TESTS = {
+    "==": operators.eq,
+    "!=": operators.ne,
+    "<": operators.lt,
+    "<=": operators.le,
+    ">": operators.gt,
+    ">=": operators.ge,
+}
+
+# Value combinations memoized per program before the table is cleared.
+MEMO_LIMIT = 1 << 16
+
+# Nodes: ("compare", field, operator, constant index), ("not", child) and
+# ("and" | "or", left, right), children given as node indexes.
+Node = Tuple[Any, ...]
+
+
+def _tokens(text: str) -> Iterator[Tuple[str, str]]:
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(
+                f"Unexpected character {text[position:].strip()[:1]!r} in condition {text!r}"
+            )
+        position = match.end()
+        yield next((kind, value) for kind, value in match.groupdict().items() if value is not None)
+
+
+class _Parser:
+    def __init__(self, program: "RuleProgram", text: str) -> None:
+        self.program = program
+        self.text = text
+        self.tokens = list(_tokens(text))
+        self.position = 0
+
+    def parse(self) -> int:
+        node = self.expression()
+        if self.position != len(self.tokens):
+            self.fail(f"unexpected {self.tokens[self.position][1]!r}")
+        return node
+
+    def expression(self) -> int:
+        node = self.term()
+        while self.accept("name", "or"):
+            node = self.program._combine("or", node, self.term())
+        return node
+
+    def term(self) -> int:
+        node = self.factor()
+        while self.accept("name", "and"):
+            node = self.program._combine("and", node, self.factor())
+        return node
+
+    def factor(self) -> int:
+        if self.accept("name", "not"):
+            return self.program._intern(("not", self.factor()))
+        if self.accept("symbol", "("):
+            node = self.expression()
+            self.expect("symbol", ")")
+            return node
+        return self.comparison()
+
+    def comparison(self) -> int:
+        kind, field = self.next()
+        if kind != "name" or (field not in STRING_FIELDS and field not in NUMERIC_FIELDS):
+            self.fail(f"unknown field {field!r}")
+        kind, operator = self.next()
+        if operator == "not" and self.accept("name", "in"):
+            operator = "not in"
+        numeric = field in NUMERIC_FIELDS
+        if operator not in (NUMERIC_OPERATORS if numeric else STRING_OPERATORS):
+            self.fail(f"{operator!r} cannot be applied to {field}")
+        value = self.literal()
+        if operator in ("in", "not in"):
+            if not isinstance(value, list):
+                self.fail(f"{operator!r} needs a list")
+            if any(isinstance(item, str) == numeric for item in value):
+                self.fail(f"{field} must be compared with {'numbers' if numeric else 'strings'}")
+            value = frozenset(value)
+        elif isinstance(value, list) or isinstance(value, str) == numeric:
+            self.fail(f"{field} must be compared with {'a number' if numeric else 'a string'}")
+        return self.program._intern(("compare", field, operator, self.program._constant(value)))
+
+    def literal(self) -> Any:
+        if self.accept("symbol", "["):
+            items = [self.literal()]
+            while self.accept("symbol", ","):
+                items.append(self.literal())
+            self.expect("symbol", "]")
+            if any(isinstance(item, list) for item in items):
+                self.fail("lists cannot be nested")
+            return items
+        kind, value = self.next()
+        if kind == "number":
+            number = float(value)
+            return int(number) if number.is_integer() and abs(number) < 2**63 else number
+        if kind == "string":
+            return value[1:-1]
+        self.fail(f"expected a value, found {value!r}")
+
+    def next(self) -> Tuple[str, str]:
+        if self.position == len(self.tokens):
+            self.fail("unexpected end")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, kind: str, value: str) -> bool:
+        if self.position < len(self.tokens) and self.tokens[self.position] == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: str) -> None:
+        if not self.accept(kind, value):
+            self.fail(f"expected {value!r}")
+
+    def fail(self, message: str) -> Any:
+        raise ValueError(f"Invalid condition {self.text!r}: {message}")
+
+
+class RuleProgram:
+    """Conditions compiled together; bit ``bits[i]`` of a mask is ``conditions[i]``."""
+
+    def __init__(self, conditions: Sequence[str], bits: Sequence[int] | None = None) -> None:
+        self.nodes: List[Node] = []
+        self.node_fields: List[FrozenSet[str]] = []
+        self.constants: List[Any] = []
+        self._node_index: Dict[Node, int] = {}
+        self._constant_index: Dict[Any, int] = {}
+        self.bits = list(range(len(conditions))) if bits is None else list(bits)
+        if len(self.bits) != len(conditions):
+            raise ValueError("RuleProgram needs one bit per condition")
+        self.roots = [_Parser(self, text).parse() for text in conditions]
+        self._facts = FactTables()
+        self._value_predicates: Dict[int, Callable[[str], bool]] = {}
+        # Conditions on string fields only are memoized per combination of
+        # the values they read, like the list rules of ComplianceChecker.
+        string_only = [self.node_fields[root] <= _STRING_FIELD_SET for root in self.roots]
+        memoized = [pair for pair, flag in zip(zip(self.roots, self.bits), string_only) if flag]
+        self._memo_mask = self._memo_key = None
+        if memoized:
+            self._memo_mask = self._compile_record_mask(memoized)
+            read = frozenset().union(*(self.node_fields[root] for root, _ in memoized))
+            self._memo_key = operators.attrgetter(*sorted(read))
+        self._memo: Dict[Any, int] = {}
+        remaining = [
+            pair for pair, flag in zip(zip(self.roots, self.bits), string_only) if not flag
+        ]
+        self._direct_mask = self._compile_record_mask(remaining) if remaining else None
+
+    def __len__(self) -> int:
+        """Number of distinct subexpressions."""
+
+        return len(self.nodes)
+
+    def record_mask(self, record: LogRecord) -> int:
+        """Return the mask of the conditions ``record`` satisfies."""
+
+        mask = 0
+        if self._memo_mask is not None:
+            key = self._memo_key(record)
+            mask = self._memo.get(key)
+            if mask is None:
+                mask = self._memo_mask(record)
+                if len(self._memo) >= MEMO_LIMIT:
+                    self._memo.clear()
+                self._memo[key] = mask
+        if self._direct_mask is not None:
+            mask |= self._direct_mask(record)
+        return mask
+
+    def batch_masks(self, batch: LogBatch, int64: bool) -> Any:
+        """Return the mask of every row: an int64 ndarray if ``int64`` and NumPy, else a list."""
+
+        columns: Dict[int, Any] = {}
+        vectorized = np is not None
+        if vectorized and int64:
+            masks = np.zeros(len(batch), dtype=np.int64)
+            for root, bit in zip(self.roots, self.bits):
+                masks |= self._column(root, batch, columns, vectorized).astype(np.int64) << bit
+            return masks
+        if vectorized and len(batch):
+            return self._wide_masks(batch, columns)
+        masks = [0] * len(batch)
+        for root, bit in zip(self.roots, self.bits):
+            flag = 1 << bit
+            column = self._column(root, batch, columns, vectorized)
+            masks = [mask | flag if hit else mask for mask, hit in zip(masks, column)]
+        return masks
+
+    def _wide_masks(self, batch: LogBatch, columns: Dict[int, Any]) -> List[int]:
+        # Masks wider than 64 bits are Python ints, so build one per distinct
+        # combination of outcomes: pack the conditions 63 at a time into int64
+        # columns and number the distinct rows group by group.
+        groups = []
+        pattern = np.zeros(len(batch), dtype=np.int64)
+        for start in range(0, len(self.roots), 63):
+            group = np.zeros(len(batch), dtype=np.int64)
+            for offset, root in enumerate(self.roots[start : start + 63]):
+                group |= self._column(root, batch, columns, True).astype(np.int64) << offset
+            values, inverse = np.unique(group, return_inverse=True)
+            _, pattern = np.unique(pattern * len(values) + inverse.ravel(), return_inverse=True)
+            groups.append(group)
+        _, first_rows = np.unique(pattern, return_index=True)
+        pattern_masks = []
+        for row in first_rows.tolist():
+            mask = 0
+            for start, group in zip(range(0, len(self.roots), 63), groups):
+                value = int(group[row])
+                for offset, bit in enumerate(self.bits[start : start + 63]):
+                    if value >> offset & 1:
+                        mask |= 1 << bit
+            pattern_masks.append(mask)
+        return list(map(pattern_masks.__getitem__, pattern.ravel().tolist()))
+
+    def _constant(self, value: Any) -> int:
+        key = (type(value), value)
+        if key not in self._constant_index:
+            self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self._constant_index[key]
+
+    def _combine(self, operator: str, left: int, right: int) -> int:
+        return self._intern((operator, min(left, right), max(left, right)))
+
+    def _intern(self, node: Node) -> int:
+        index = self._node_index.get(node)
+        if index is None:
+            if node[0] == "compare":
+                fields = frozenset([node[1]])
+            else:
+                fields = frozenset().union(*(self.node_fields[child] for child in node[1:]))
+            index = self._node_index[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.node_fields.append(fields)
+        return index
+
+    def _source(
+        self, index: int, operand: Callable[[int], str], reference: Callable[[str], str]
+    ) -> str:
+        node = self.nodes[index]
+        if node[0] == "compare":
+            _, field, operator, constant = node
+            return _PYTHON_OPERATORS[operator].format(reference(field), f"_c{constant}")
+        if node[0] == "not":
+            return f"not {operand(node[1])}"
+        return f"({operand(node[1])} {node[0]} {operand(node[2])})"
+
+    def _namespace(self) -> Dict[str, Any]:
+        return {f"_c{index}": value for index, value in enumerate(self.constants)}
+
+    def _compile_record_mask(self, conditions: List[Tuple[int, int]]) -> Callable[[LogRecord], int]:
+        """Generate a function returning the mask of the conditions a record satisfies."""
+
+        # Nodes are created children first, so computing the nodes the roots
+        # need in index order evaluates each shared subexpression once. Only
+        # validated field names and fixed operators reach the source;
+        # literals are passed in as ``_c<n>`` constants.
+        def reference(field: str) -> str:
+            return f"record.{NUMERIC_FIELDS.get(field, field)}"
+
+        needed = set()
+        pending = [root for root, _ in conditions]
+        while pending:
+            index = pending.pop()
+            if index not in needed:
+                needed.add(index)
+                if self.nodes[index][0] != "compare":
+                    pending.extend(self.nodes[index][1:])
+        lines = ["def record_mask(record):"]
+        for index in sorted(needed):
+            lines.append(f"    _n{index} = {self._source(index, '_n{}'.format, reference)}")
+        terms = [f"({1 << bit} if _n{root} else 0)" for root, bit in conditions]
+        lines.append(f"    return {' | '.join(terms)}")
+        namespace = self._namespace()
+        exec(compile("\n".join(lines), "<compliance conditions>", "exec"), namespace)
+        return namespace["record_mask"]
+
+    def _value_predicate(self, index: int) -> Callable[[str], bool]:
+        predicate = self._value_predicates.get(index)
+        if predicate is None:
+            source = self._inline(index, lambda field: "value")
+            predicate = eval(f"lambda value: bool({source})", self._namespace())
+            self._value_predicates[index] = predicate
+        return predicate
+
+    def _inline(self, index: int, reference: Callable[[str], str]) -> str:
+        return self._source(index, lambda child: self._inline(child, reference), reference)
+
+    def _column(
+        self, index: int, batch: LogBatch, columns: Dict[int, Any], vectorized: bool
+    ) -> Any:
+        column = columns.get(index)
+        if column is not None:
+            return column
+        node = self.nodes[index]
+        fields = self.node_fields[index]
+        if len(fields) == 1 and next(iter(fields)) in STRING_FIELDS:
+            strings = getattr(batch, next(iter(fields)))
+            facts = self._facts.facts(strings, str(index), self._value_predicate(index))
+            if vectorized:
+                codes = np.frombuffer(strings.codes, dtype=f"u{strings.codes.itemsize}")
+                column = np.asarray(facts, dtype=bool)[codes]
+            else:
+                column = list(map(facts.__getitem__, strings.codes))
+        elif node[0] == "compare":
+            _, field, operator, constant = node
+            values = getattr(batch, NUMERIC_FIELDS[field])
+            literal = self.constants[constant]
+            if vectorized:
+                values = np.frombuffer(values, dtype=np.int64)
+                if operator in ("in", "not in"):
+                    column = np.isin(values, list(literal), invert=operator == "not in")
+                else:
+                    column = _NUMERIC_TESTS[operator](values, literal)
+            elif operator in ("in", "not in"):
+                column = [(value in literal) == (operator == "in") for value in values]
+            else:
+                test = _NUMERIC_TESTS[operator]
+                column = [test(value, literal) for value in values]
+        elif node[0] == "not":
+            child = self._column(node[1], batch, columns, vectorized)
+            column = ~child if vectorized else [not hit for hit in child]
+        else:
+            left = self._column(node[1], batch, columns, vectorized)
+            right = self._column(node[2], batch, columns, vectorized)
+            if vectorized:
+                column = left & right if node[0] == "and" else left | right
+            elif node[0] == "and":
+                column = [a and b for a, b in zip(left, right)]
+            else:
+                column = [a or b for a, b in zip(left, right)]
+        columns[index] = column
+        return column
@@ -0,0 +1,222 @@
+"""One-pass reservoir sampling of log rows for training on large inputs.
+
+:class:`ReservoirSampler` keeps a fixed-size uniform sample of the rows fed
+to it or, with ``stratify``, an equal share of the sample per value of
+``user``, ``protocol`` or ``status``, so rare users and protocols are still
+represented. It is a bottom-k sampler: every row draws a uniform random
+priority and the sample is the ``size`` rows with the smallest priorities
+(per stratum, the ``max(1, size // strata)`` smallest). Once the sample is
+full a row is kept only if its priority beats the largest one in the
+sample, so almost every row is rejected with one vectorized comparison and
+about ``size * ln(rows / size)`` rows are ever copied. Samplers fed
+different shards merge exactly: the smallest priorities of a union are the
+smallest of each part's.
+
+:class:`SamplingReport` compares a model trained on the sample with one
+trained on every row.
+"""
+
+from __future__ import annotations
+
+import random
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from nsms.config import SAMPLE_STRATA
+from nsms.data import LogBatch, StringColumn
+from nsms.model import AnomalyModel
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; priorities then come from random.Random.
+    np = None
+
+
+class ReservoirSampler:
+    """Fixed-size uniform or stratified sample of a stream of :class:`LogBatch`."""
+
+    def __init__(self, size: int, stratify: str | None = None, seed: int | None = None) -> None:
+        if size <= 0:
+            raise ValueError("size must be greater than 0")
+        if stratify is not None and stratify not in SAMPLE_STRATA:
+            raise ValueError(f"stratify must be one of {', '.join(SAMPLE_STRATA)}")
+        self.size = size
+        self.stratify = stratify
+        self.seen = 0
+        self.strata: Counter[str] = Counter()
+        self._rows = LogBatch()
+        self._priorities = array("d")
+        self._random = np.random.default_rng(seed) if np is not None else random.Random(seed)
+        # Largest priority still in a full sample (or stratum share); rows at
+        # or above it can never make the final sample.
+        self._cutoff = 1.0
+        self._cutoffs: Dict[str, float] = {}
+
+    def update(self, batch: LogBatch) -> "ReservoirSampler":
+        rows = len(batch)
+        if not rows:
+            return self
+        self.seen += rows
+        if np is not None:
+            priorities = self._random.random(rows)
+            if self.stratify is None:
+                keep = np.flatnonzero(priorities < self._cutoff).tolist()
+            else:
+                column: StringColumn = getattr(batch, self.stratify)
+                codes = np.asarray(column.codes).astype(np.intp)
+                counts = np.bincount(codes)
+                present = np.flatnonzero(counts)
+                values = column.values
+                cutoffs = np.ones(len(counts), dtype=np.float64)
+                for code, count in zip(present.tolist(), counts[present].tolist()):
+                    self.strata[values[code]] += count
+                    cutoffs[code] = self._cutoffs.get(values[code], 1.0)
+                keep = np.flatnonzero(priorities < cutoffs[codes]).tolist()
+            priorities = priorities.tolist()
+        else:
+            draw = self._random.random
+            priorities = [draw() for _ in range(rows)]
+            if self.stratify is None:
+                cutoff = self._cutoff
+                keep = [row for row, priority in enumerate(priorities) if priority < cutoff]
+            else:
+                column = getattr(batch, self.stratify)
+                values = column.values
+                cutoffs = {}
+                for code, count in Counter(column.codes).items():
+                    self.strata[values[code]] += count
+                    cutoffs[code] = self._cutoffs.get(values[code], 1.0)
+                keep = [
+                    row for row, code in enumerate(column.codes) if priorities[row] < cutoffs[code]
+                ]
+        if keep:
+            self._rows.extend_batch(batch if len(keep) == rows else batch.take(keep))
+            self._priorities.extend(map(priorities.__getitem__, keep))
+            if len(self._priorities) >= 2 * max(self.size, len(self.strata)):
+                self._compact()
+        return self
+
+    def merge(self, other: "ReservoirSampler") -> "ReservoirSampler":
+        if (other.size, other.stratify) != (self.size, self.stratify):
+            raise ValueError("Cannot merge samplers of different sizes or strata")
+        self.seen += other.seen
+        self.strata.update(other.strata)
+        self._rows.extend_batch(other._rows)
+        self._priorities.extend(other._priorities)
+        self._compact()
+        return self
+
+    def sample(self) -> LogBatch:
+        """The sampled rows, in the order they were read."""
+
+        self._compact()
+        return self._rows
+
+    def _compact(self) -> None:
+        priorities = self._priorities
+        if self.stratify is None:
+            if len(priorities) <= self.size:
+                return
+            if np is not None:
+                values = np.frombuffer(priorities, dtype=np.float64)
+                kept = np.argpartition(values, self.size - 1)[: self.size].tolist()
+            else:
+                kept = sorted(range(len(priorities)), key=priorities.__getitem__)[: self.size]
+            self._cutoff = max(map(priorities.__getitem__, kept))
+        else:
+            share = max(1, self.size // len(self.strata))
+            column: StringColumn = getattr(self._rows, self.stratify)
+            groups: Dict[int, List[int]] = {}
+            for row, code in enumerate(column.codes):
+                groups.setdefault(code, []).append(row)
+            kept = []
+            self._cutoffs = {}
+            for code, rows in groups.items():
+                rows.sort(key=priorities.__getitem__)
+                del rows[share:]
+                kept.extend(rows)
+                if len(rows) == share:
+                    self._cutoffs[column.values[code]] = priorities[rows[-1]]
+        if len(kept) == len(priorities):
+            return
+        kept.sort()
+        self._rows = self._rows.take(kept)
+        self._priorities = array("d", map(priorities.__getitem__, kept))
+
+
+@dataclass
+class SamplingReport:
+    """How far a model trained on a sample is from one trained on every row."""
+
+    sample_rows: int
+    total_rows: int
+    stratify: str | None
+    stats: Dict[str, Dict[str, float]]
+    rows: int = 0
+    flagged_full: int = 0
+    flagged_sampled: int = 0
+    flagged_both: int = 0
+    strata: Dict[str, int] = field(default_factory=dict)
+
+    def add_predictions(self, full: Iterable[bool], sampled: Iterable[bool]) -> None:
+        """Count one batch of predictions from the full and sampled models."""
+
+        for full_flag, sampled_flag in zip(full, sampled):
+            self.rows += 1
+            self.flagged_full += bool(full_flag)
+            self.flagged_sampled += bool(sampled_flag)
+            self.flagged_both += bool(full_flag and sampled_flag)
+
+    def as_dict(self) -> Dict[str, Any]:
+        disagreements = self.flagged_full + self.flagged_sampled - 2 * self.flagged_both
+        return {
+            "sample_rows": self.sample_rows,
+            "total_rows": self.total_rows,
+            "stratify": self.stratify,
+            "strata": self.strata,
+            "stats": self.stats,
+            "predictions": {
+                "rows": self.rows,
+                "flagged_full": self.flagged_full,
+                "flagged_sampled": self.flagged_sampled,
+                "agreement": 1 - disagreements / self.rows if self.rows else 1.0,
+                "precision": (
+                    self.flagged_both / self.flagged_sampled if self.flagged_sampled else 1.0
+                ),
+                "recall": self.flagged_both / self.flagged_full if self.flagged_full else 1.0,
+            },
+        }
+
+
+def compare_models(
+    sampled: AnomalyModel, full: AnomalyModel, sampler: ReservoirSampler
+) -> SamplingReport:
+    """Start a report with the two models' statistics side by side.
+
+    Feed it predictions with :meth:`SamplingReport.add_predictions`.
+    """
+
+    pairs = {
+        name: (getattr(sampled.stats, name), getattr(full.stats, name))
+        for name in ("mean_bytes", "std_bytes", "mean_denied", "mean_sensitive", "mean_admin")
+    }
+    if sampled.bytes_cutoff is not None and full.bytes_cutoff is not None:
+        pairs["bytes_cutoff"] = (sampled.bytes_cutoff, full.bytes_cutoff)
+    stats = {
+        name: {
+            "sampled": sampled_value,
+            "full": full_value,
+            "relative_error": (
+                abs(sampled_value - full_value) / abs(full_value)
+                if full_value
+                else abs(sampled_value)
+            ),
+        }
+        for name, (sampled_value, full_value) in pairs.items()
+    }
+    strata = dict(sampler.strata.most_common()) if sampler.stratify else {}
+    return SamplingReport(
+        len(sampler.sample()), sampler.seen, sampler.stratify, stats, strata=strata
+    )
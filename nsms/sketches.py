@@ -0,0 +1,113 @@
+"""Mergeable streaming quantile sketches.
+
+:class:`QuantileSketch` is a log-bucketed histogram with a relative-error
+guarantee (the DDSketch construction): a positive value ``x`` is counted in
+bucket ``ceil(log(x) / log(gamma))`` with ``gamma = (1 + a) / (1 - a)``, and
+any quantile is answered with a value within a fraction ``a`` of the true
+one. Byte counts spanning a byte to a terabyte need under 1,400 buckets at
+the default 1% accuracy, whatever the number of rows.
+
+Sketches are built in one pass, chunk by chunk, and merging two sketches
+adds their bucket counts, so a sketch merged from shards is identical to one
+built over the whole input.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import Counter
+from typing import Any, Dict
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; buckets are then counted with Counter.
+    np = None
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """Relative-accuracy quantile sketch of non-negative values."""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, value: float) -> None:
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def update(self, column: Any, is_ndarray: bool) -> None:
+        """Add every value of ``column`` (an ndarray when ``is_ndarray``)."""
+
+        if is_ndarray:
+            values = column.astype(np.float64)
+            positive = values[values > 0]
+            self.zero_count += len(values) - len(positive)
+            indices, counts = np.unique(
+                np.ceil(np.log(positive) / self._log_gamma), return_counts=True
+            )
+            pairs = zip(indices.astype(np.int64).tolist(), counts.tolist())
+        else:
+            log_gamma = self._log_gamma
+            pairs = Counter(
+                math.ceil(math.log(value) / log_gamma) for value in column if value > 0
+            ).items()
+            self.zero_count += sum(1 for value in column if value <= 0)
+        buckets = self.buckets
+        for index, count in pairs:
+            buckets[index] = buckets.get(index, 0) + count
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile ``q`` (0 to 1), within the relative accuracy."""
+
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        total = self.count
+        if not total:
+            raise ValueError("Cannot query an empty sketch")
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def as_dict(self) -> Dict[str, object]:
+        indices = sorted(self.buckets)
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "indices": indices,
+            "counts": [self.buckets[index] for index in indices],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(payload["relative_accuracy"])
+        sketch.zero_count = payload["zero_count"]
+        sketch.buckets = dict(zip(payload["indices"], payload["counts"]))
+        return sketch
@@ -31,7 +31,12 @@ class ThreatIntelStore:
     def load(cls, path: Path) -> "ThreatIntelStore":
         if not path.exists():
             raise FileNotFoundError(f"Threat intel file not found: {path}")
-        payload = json.loads(path.read_text())
+        return cls.from_payload(json.loads(path.read_text()))
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, object]) -> "ThreatIntelStore":
+        """Build a store from the parsed contents of a threat intel file."""
+
         indicators = [
             ThreatIndicator(
                 ip_address=item["ip_address"],
@@ -3,17 +3,19 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Iterable, List, TYPE_CHECKING
 
 from nsms.logging_utils import get_logger
 
 if TYPE_CHECKING:
-    from nsms.data import LogRecord
+    from nsms.data import LogBatch, LogRecord
 
 
 logger = get_logger("validators")
 
+VALID_STATUSES = frozenset({"OK", "DENIED", "ERROR"})
+
 
 @dataclass(frozen=True)
 class ValidationIssue:
@@ -34,8 +36,67 @@ def validate_records(records: Iterable["LogRecord"]) -> List[ValidationIssue]:
             issues.append(ValidationIssue(idx, "Missing destination IP"))
         if record.timestamp > datetime.utcnow():
             issues.append(ValidationIssue(idx, "Timestamp is in the future"))
-        if record.status.upper() not in {"OK", "DENIED", "ERROR"}:
+        if record.status.upper() not in VALID_STATUSES:
             issues.append(ValidationIssue(idx, "Unknown status"))
     if issues:
         logger.warning("Validation found %s issues", len(issues))
     return issues
+
+
+def validate_batch(batch: "LogBatch") -> List[ValidationIssue]:
+    """Columnar equivalent of :func:`validate_records`.
+
+    Each check first runs as a whole-column test (``min``/``max`` or a
+    per-value lookup table), and rows are only visited for checks that fail.
+    """
+
+    now_micros = (datetime.utcnow() - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+    found: List[tuple] = []
+
+    if len(batch) and min(batch.bytes_transferred) < 0:
+        found.extend(
+            (idx, 0, "Bytes transferred cannot be negative")
+            for idx, value in enumerate(batch.bytes_transferred)
+            if value < 0
+        )
+    for order, column, message in (
+        (1, batch.source_ip, "Missing source IP"),
+        (2, batch.destination_ip, "Missing destination IP"),
+    ):
+        missing = {
+            code for code, flag in enumerate(column.facts("is_missing", _is_missing)) if flag
+        }
+        if missing:
+            found.extend(
+                (idx, order, message) for idx, code in enumerate(column.codes) if code in missing
+            )
+    if len(batch) and max(batch.timestamps) > now_micros:
+        found.extend(
+            (idx, 3, "Timestamp is in the future")
+            for idx, value in enumerate(batch.timestamps)
+            if value > now_micros
+        )
+    unknown = {
+        code
+        for code, flag in enumerate(batch.status.facts("is_unknown_status", _is_unknown_status))
+        if flag
+    }
+    if unknown:
+        found.extend(
+            (idx, 4, "Unknown status")
+            for idx, code in enumerate(batch.status.codes)
+            if code in unknown
+        )
+
+    issues = [ValidationIssue(idx, message) for idx, _, message in sorted(found)]
+    if issues:
+        logger.warning("Validation found %s issues", len(issues))
+    return issues
+
+
+def _is_missing(value: str) -> bool:
+    return not value
+
+
+def _is_unknown_status(status: str) -> bool:
+    return status.upper() not in VALID_STATUSES
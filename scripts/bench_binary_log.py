@@ -0,0 +1,42 @@
+"""Compare repeated analyses over CSV and the columnar ``.nsmscol`` format.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_binary_log.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from bench_common import add_work_dir_argument, timed, work_dir, write_synthetic_logs
+from nsms.binary_log import convert_csv_to_binary, default_binary_path
+from nsms.data import load_batch, summarize_protocols
+from nsms.preprocessing import extract_feature_matrix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    csv_path = write_synthetic_logs(work_dir(args.work_dir) / "logs.csv", args.rows)
+    binary_path = default_binary_path(csv_path)
+    with timed("convert (one-off)", args.rows):
+        convert_csv_to_binary(csv_path, binary_path)
+    print(f"sizes: csv {csv_path.stat().st_size / 2**20:.1f} MiB, "
+          f"columnar {binary_path.stat().st_size / 2**20:.1f} MiB")
+
+    for label, path in (("csv", csv_path), ("columnar", binary_path)):
+        with timed(f"{label}: open", args.rows):
+            batch = load_batch(path)
+        with timed(f"{label}: protocol summary", args.rows):
+            summarize_protocols(batch)
+        with timed(f"{label}: feature extraction", args.rows):
+            extract_feature_matrix(batch)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
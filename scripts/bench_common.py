@@ -0,0 +1,85 @@
+"""Shared helpers for the NSMS benchmark scripts.
+
+Benchmarks are run from the repository root, for example::
+
+    PYTHONPATH=. python scripts/bench_streaming.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import csv
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from nsms.data import LOG_FIELDNAMES
+
+
+PROTOCOLS = ["HTTPS", "SSH", "DNS", "FTP", "TELNET"]
+ACTIONS = ["READ", "WRITE", "LIST", "DELETE", "ROOT_LOGIN"]
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1", "ap-south-1"]
+STATUSES = ["OK", "OK", "OK", "DENIED", "ERROR"]
+START_TIME = datetime(2024, 1, 1)
+
+
+def write_synthetic_logs(path: Path, rows: int, seed: int = 7) -> Path:
+    """Write a deterministic CSV in the ``write_logs`` schema."""
+
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(LOG_FIELDNAMES)
+        for idx in range(rows):
+            writer.writerow(
+                [
+                    (START_TIME + timedelta(seconds=idx)).isoformat(),
+                    f"203.0.113.{rng.randrange(1, 255)}",
+                    f"10.0.{rng.randrange(0, 4)}.{rng.randrange(1, 255)}",
+                    rng.choice(PROTOCOLS),
+                    int(rng.lognormvariate(6.5, 1.2)),
+                    rng.choice(ACTIONS),
+                    rng.choice(REGIONS),
+                    f"admin{idx % 7}" if idx % 50 == 0 else f"user{rng.randrange(1, 200)}",
+                    "/data/sensitive/export" if idx % 40 == 0 else f"/app/service/{idx % 32}",
+                    rng.choice(STATUSES),
+                ]
+            )
+    return path
+
+
+def add_work_dir_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        help="Directory for generated files (default: a temporary directory)",
+    )
+
+
+def work_dir(path: Path | None) -> Path:
+    """Return ``path``, or a temporary directory removed when the script exits."""
+
+    if path is not None:
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+    path = Path(tempfile.mkdtemp(prefix="nsms-bench-"))
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+@contextmanager
+def timed(label: str, rows: int | None = None) -> Iterator[None]:
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    if rows:
+        print(f"{label}: {elapsed:.3f}s ({rows / elapsed:,.0f} rows/s)")
+    else:
+        print(f"{label}: {elapsed:.3f}s")
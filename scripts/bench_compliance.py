@@ -0,0 +1,127 @@
+"""Compare rule-by-rule compliance checks with the compiled ``ComplianceChecker``.
+
+Generates ``--rules`` random rules over the synthetic log vocabulary and
+evaluates every record both by looping over the rules with list membership
+tests (how ``ComplianceChecker.evaluate`` used to work) and through the
+compiled checker, per record, per batch as rule IDs and per batch as
+violation bitmasks. The same rules are then written as expression
+conditions (``region not in [...] or ...``) to compare the compiled rule
+language with the list rules. All paths must agree, which the script checks
+before printing timings.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_compliance.py --rules 500 --rows 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from typing import List
+
+from bench_common import (
+    ACTIONS,
+    PROTOCOLS,
+    REGIONS,
+    add_work_dir_argument,
+    timed,
+    work_dir,
+    write_synthetic_logs,
+)
+from nsms.compliance import ComplianceChecker, ComplianceRule
+from nsms.data import load_batch, load_logs
+
+
+def random_rules(count: int, seed: int = 5) -> List[ComplianceRule]:
+    rng = random.Random(seed)
+    return [
+        ComplianceRule(
+            rule_id=f"BENCH-{index:04d}",
+            description="generated",
+            allowed_regions=rng.sample(REGIONS, rng.randint(2, len(REGIONS))),
+            allowed_protocols=rng.sample(PROTOCOLS, rng.randint(2, len(PROTOCOLS))),
+            high_risk_actions=rng.sample(ACTIONS, rng.randint(0, 2)),
+        )
+        for index in range(count)
+    ]
+
+
+def rule_by_rule(rules: List[ComplianceRule], region: str, protocol: str, action: str) -> List[str]:
+    violations: List[str] = []
+    for rule in rules:
+        if region not in rule.allowed_regions:
+            violations.append(rule.rule_id)
+            continue
+        if protocol not in rule.allowed_protocols:
+            violations.append(rule.rule_id)
+            continue
+        if action in rule.high_risk_actions:
+            violations.append(rule.rule_id)
+    return violations
+
+
+def as_condition(rule: ComplianceRule) -> ComplianceRule:
+    def listing(values: List[str]) -> str:
+        return "[" + ", ".join(f"'{value}'" for value in values) + "]" if values else "['']"
+
+    terms = [
+        f"region not in {listing(rule.allowed_regions)}",
+        f"protocol not in {listing(rule.allowed_protocols)}",
+    ]
+    if rule.high_risk_actions:
+        terms.append(f"action in {listing(rule.high_risk_actions)}")
+    return ComplianceRule(rule.rule_id, rule.description, [], [], [], condition=" or ".join(terms))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=200_000)
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    path = write_synthetic_logs(work_dir(args.work_dir) / "logs.csv", args.rows)
+    records = load_logs(path)
+    batch = load_batch(path)
+    rules = random_rules(args.rules)
+    print(f"{len(records):,} records, {len(rules)} rules")
+
+    with timed("rule-by-rule list checks", args.rows):
+        expected = [rule_by_rule(rules, r.region, r.protocol, r.action) for r in records]
+    with timed("compile rules"):
+        checker = ComplianceChecker(rules)
+    with timed("compiled evaluate per record", args.rows):
+        per_record = [checker.evaluate(record) for record in records]
+    with timed("compiled evaluate_batch", args.rows):
+        per_batch = checker.evaluate_batch(batch)
+    with timed("violation_masks", args.rows):
+        masks = checker.violation_masks(batch)
+
+    with timed("compile conditions"):
+        conditions = ComplianceChecker([as_condition(rule) for rule in rules])
+    print(f"  {len(conditions.program)} distinct subexpressions")
+    with timed("conditions evaluate per record", args.rows):
+        condition_records = [conditions.evaluate(record) for record in records]
+    with timed("conditions violation_masks", args.rows):
+        condition_masks = conditions.violation_masks(batch)
+
+    from_masks = [list(checker.rule_ids(mask)) for mask in masks]
+    from_condition_masks = [list(conditions.rule_ids(mask)) for mask in condition_masks]
+    if (
+        per_record != expected
+        or [list(item) for item in per_batch] != expected
+        or from_masks != expected
+        or condition_records != expected
+        or from_condition_masks != expected
+    ):
+        print("MISMATCH between rule-by-rule and compiled evaluation")
+        return 1
+    print(
+        f"{sum(1 for item in expected if item):,} records with violations, identical on all paths"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
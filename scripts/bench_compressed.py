@@ -0,0 +1,92 @@
+"""Compare streaming decompression against decompressing to disk first.
+
+For each codec the synthetic CSV is compressed once, then loaded either
+directly (``load_batch`` on the archive) or by first writing the decompressed
+CSV to disk, as the old workflow required. Disk I/O is the bytes moved
+through ``read``/``write`` calls as reported by ``/proc/self/io``.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_compressed.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import bz2
+import gzip
+import lzma
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from bench_common import add_work_dir_argument, work_dir, write_synthetic_logs
+from nsms.compression import open_binary
+from nsms.data import load_batch
+
+
+CODECS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def io_counters() -> Dict[str, int]:
+    try:
+        with open("/proc/self/io", encoding="utf-8") as handle:
+            return {key: int(value) for key, value in (line.split(": ") for line in handle)}
+    except OSError:
+        return {}
+
+
+def measure(label: str, rows: int, action: Callable[[], object]) -> None:
+    before = io_counters()
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    after = io_counters()
+    if after:
+        read = (after["rchar"] - before["rchar"]) / 2**20
+        written = (after["wchar"] - before["wchar"]) / 2**20
+        io_note = f", read {read:.1f} MiB, wrote {written:.1f} MiB"
+    else:
+        io_note = ""
+    print(f"{label}: {elapsed:.3f}s ({rows / elapsed:,.0f} rows/s{io_note})")
+
+
+def decompress_first(archive: Path, scratch: Path) -> None:
+    with open_binary(archive) as source, scratch.open("wb") as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    try:
+        load_batch(scratch)
+    finally:
+        scratch.unlink()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS), choices=list(CODECS))
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    bench_dir = work_dir(args.work_dir)
+    csv_path = write_synthetic_logs(bench_dir / "logs.csv", args.rows)
+    print(f"plain csv: {csv_path.stat().st_size / 2**20:.1f} MiB")
+    measure("plain csv: load", args.rows, lambda: load_batch(csv_path))
+
+    for suffix in args.codecs:
+        archive = bench_dir / f"logs.csv{suffix}"
+        with csv_path.open("rb") as source, CODECS[suffix](archive, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        print(f"{suffix}: {archive.stat().st_size / 2**20:.1f} MiB")
+        scratch = bench_dir / "decompressed.csv"
+        measure(
+            f"{suffix}: decompress to disk, then load",
+            args.rows,
+            lambda: decompress_first(archive, scratch),
+        )
+        measure(f"{suffix}: streaming load", args.rows, lambda: load_batch(archive))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""Benchmark the fast-path CSV parser against ``csv.DictReader``.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_csv_parser.py --rows 10000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+from bench_common import add_work_dir_argument, work_dir, write_synthetic_logs
+from nsms.data import LogRecord, iter_batches, iter_logs
+
+
+def _dictreader(path: Path) -> int:
+    count = 0
+    with path.open(newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            LogRecord.from_row(row)
+            count += 1
+    return count
+
+
+def _fast_records(path: Path, use_mmap: bool) -> int:
+    return sum(1 for _ in iter_logs(path, use_mmap=use_mmap))
+
+
+def _fast_batches(path: Path, use_mmap: bool) -> int:
+    return sum(len(batch) for batch in iter_batches(path, 100000, use_mmap=use_mmap))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of N runs")
+    parser.add_argument(
+        "--path", type=Path, help="Reuse this CSV if it has --rows rows (default: generate one)"
+    )
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+    if args.path is None:
+        args.path = work_dir(args.work_dir) / "logs.csv"
+
+    if not args.path.exists() or sum(1 for _ in args.path.open()) - 1 != args.rows:
+        write_synthetic_logs(args.path, args.rows)
+
+    cases = [
+        ("DictReader + LogRecord.from_row", lambda: _dictreader(args.path)),
+        ("fast LogRecord (text)", lambda: _fast_records(args.path, False)),
+        ("fast LogBatch (text)", lambda: _fast_batches(args.path, False)),
+        ("fast LogBatch (mmap)", lambda: _fast_batches(args.path, True)),
+    ]
+    baseline = None
+    for label, run in cases:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rows = run()
+            best = min(best, time.perf_counter() - start)
+        rate = rows / best
+        baseline = baseline or rate
+        print(f"{label:<34} {rate:>12,.0f} rows/s  {rate / baseline:>5.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+"""Compare feature extraction, training and scoring on vectors and matrices.
+
+The input is a parsed synthetic log repeated until it holds ``--rows`` rows,
+so the timings cover only the feature and model stages.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_features.py --rows 10000000
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from bench_common import add_work_dir_argument, timed, work_dir, write_synthetic_logs
+from nsms import preprocessing
+from nsms.data import LogBatch, load_batch
+from nsms.model import AnomalyModel
+from nsms.preprocessing import extract_feature_matrix, extract_features
+
+SEED_ROWS = 100_000
+
+
+def _repeated_batch(rows: int, root: Path) -> LogBatch:
+    path = write_synthetic_logs(root / "logs.csv", min(rows, SEED_ROWS))
+    seed = load_batch(path)
+    batch = LogBatch()
+    while len(batch) < rows:
+        batch.extend_batch(seed.slice(0, rows - len(batch)))
+    return batch
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--skip-vectors", action="store_true", help="only time the matrix path")
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    batch = _repeated_batch(args.rows, work_dir(args.work_dir))
+    backend = "numpy" if preprocessing.np is not None else "pure python"
+    print(f"{len(batch):,} rows, FeatureMatrix backend: {backend}")
+
+    if not args.skip_vectors:
+        with timed("FeatureVector extract", args.rows):
+            features = extract_features(batch.records())
+        with timed("FeatureVector train", args.rows):
+            model = AnomalyModel.train(features)
+        with timed("FeatureVector predict", args.rows):
+            model.predict(features)
+        del features
+
+    with timed("FeatureMatrix extract", args.rows):
+        matrix = extract_feature_matrix(batch)
+    with timed("FeatureMatrix train", args.rows):
+        model = AnomalyModel.train(matrix)
+    with timed("FeatureMatrix predict", args.rows):
+        model.predict(matrix)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+"""Compare per-record memory and time of ``LogRecord`` lists and ``LogBatch``.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_logbatch.py --rows 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+from pathlib import Path
+
+from bench_common import add_work_dir_argument, timed, work_dir, write_synthetic_logs
+from nsms.data import load_batch, load_logs
+from nsms.model import AnomalyModel, ModelStats
+from nsms.preprocessing import extract_feature_matrix, extract_features
+
+
+def _measure(label: str, loader, extract, path: Path, rows: int) -> None:
+    model = AnomalyModel(ModelStats(900.0, 1200.0, 0.4, 0.02, 0.02), threshold=3.0)
+    gc.collect()
+    tracemalloc.start()
+    with timed(f"{label} load+features+predict", rows):
+        data = loader(path)
+        features = extract(data)
+        model.predict(features)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label}: {current / rows:.0f} bytes/record retained (records + features)")
+    del data, features
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    path = write_synthetic_logs(work_dir(args.work_dir) / "logs.csv", args.rows)
+    _measure("LogRecord list", load_logs, extract_features, path, args.rows)
+    _measure("LogBatch", load_batch, extract_feature_matrix, path, args.rows)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
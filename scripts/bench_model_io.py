@@ -0,0 +1,68 @@
+"""Time loading a model with a large per-entity baseline table.
+
+Builds a model whose ``source_ip`` table holds ``--entities`` entries, saves
+it as JSON and as a binary ``.nsmsmodel`` file, then times loading each
+format, the first lookup, and 10,000 random lookups. ``--skip-json`` leaves
+out the JSON format, which needs several times the table size in memory.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_model_io.py --entities 10000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from bench_common import add_work_dir_argument, timed, work_dir
+from nsms.baselines import EntityBaselines, EntityTable, MAX_LOAD_FACTOR
+from nsms.model import AnomalyModel, ModelStats
+from nsms.model_io import load_model, save_model
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=10_000_000)
+    parser.add_argument("--skip-json", action="store_true")
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    keys = [rng.getrandbits(64) or 1 for _ in range(args.entities)]
+    table = EntityTable(int(args.entities / MAX_LOAD_FACTOR) + 1)
+    with timed(f"build table of {args.entities:,} entities", args.entities):
+        for key in keys:
+            table.add(key, 40, 1000.0, 4.0e7)
+    model = AnomalyModel(
+        ModelStats(1000.0, 500.0, 0.0, 0.0, 0.0),
+        entity_baselines=EntityBaselines(["source_ip"], tables={"source_ip": table}),
+    )
+    probes = rng.sample(keys, 10_000)
+
+    root = work_dir(args.work_dir)
+    formats = [".nsmsmodel"] if args.skip_json else [".nsmsmodel", ".json"]
+    for suffix in formats:
+        path = root / f"model{suffix}"
+        with timed(f"save {suffix}"):
+            save_model(model, path)
+        print(f"  {path.stat().st_size / 2**20:,.0f} MiB")
+        with timed(f"load {suffix}"):
+            loaded = load_model(path)
+        loaded_table = loaded.entity_baselines.tables["source_ip"]
+        with timed(f"first lookup {suffix}"):
+            loaded_table.lookup(probes[0])
+        with timed(f"10,000 random lookups {suffix}"):
+            found = sum(loaded_table.lookup(key) is not None for key in probes)
+        if found != len(probes):
+            print("MISSING entities after loading")
+            return 1
+        if suffix == ".nsmsmodel":
+            with timed("load .nsmsmodel with checksum verification"):
+                load_model(path, verify=True)
+        path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
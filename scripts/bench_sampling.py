@@ -0,0 +1,72 @@
+"""Compare full streaming training with reservoir-sampled training.
+
+Both trainers read the same synthetic CSV in chunks; the sampled one only
+extracts features from, and trains on, its reservoir. The script prints
+each timing, the peak memory of each run (via ``tracemalloc``) and the
+report comparing the two models.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_sampling.py --rows 1000000 --sample-size 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tracemalloc
+
+from bench_common import add_work_dir_argument, timed, work_dir, write_synthetic_logs
+from nsms.config import SAMPLE_STRATA, Config
+from nsms.monitoring import (
+    compare_sampled_model,
+    sample_logs,
+    train_model_streaming,
+    train_on_sample,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sample-size", type=int, default=50_000)
+    parser.add_argument("--stratify", choices=SAMPLE_STRATA)
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    root = work_dir(args.work_dir)
+    path = write_synthetic_logs(root / "logs.csv", args.rows)
+    base = Config.load()
+    config = base.from_mapping(
+        {
+            **base.__dict__,
+            "data_path": str(path),
+            "output_dir": str(root),
+            "model_path": str(root / "model.json"),
+            "sample_size": args.sample_size,
+            "sample_stratify": args.stratify,
+        }
+    )
+
+    tracemalloc.start()
+    with timed("full streaming training", args.rows):
+        train_model_streaming(config)
+    print(f"  peak traced memory: {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MiB")
+    tracemalloc.reset_peak()
+    with timed(f"sampled training ({args.sample_size:,} rows)", args.rows):
+        sampler = sample_logs(config)
+        model = train_on_sample(config, sampler)
+    print(f"  peak traced memory: {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MiB")
+    tracemalloc.stop()
+
+    report = compare_sampled_model(config, model, sampler)
+    print(
+        json.dumps(
+            {key: value for key, value in report.as_dict().items() if key != "strata"}, indent=2
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
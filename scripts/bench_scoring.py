@@ -0,0 +1,51 @@
+"""Compare per-row scoring with ``AnomalyModel.predict_batch``.
+
+The per-row path calls ``score`` and ``is_anomalous`` on every
+``FeatureVector`` of the matrix; the batch path scores the whole matrix at
+once. Both must agree, which the script checks before printing timings.
+
+Usage::
+
+    PYTHONPATH=. python scripts/bench_scoring.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from bench_common import add_work_dir_argument, timed, work_dir, write_synthetic_logs
+from nsms import preprocessing
+from nsms.data import load_batch
+from nsms.model import AnomalyModel
+from nsms.preprocessing import extract_feature_matrix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--threshold", type=float, default=2.0)
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    path = write_synthetic_logs(work_dir(args.work_dir) / "logs.csv", args.rows)
+    matrix = extract_feature_matrix(load_batch(path))
+    model = AnomalyModel.train(matrix, threshold=args.threshold)
+    backend = "numpy" if preprocessing.np is not None else "pure python"
+    print(f"{len(matrix):,} rows, FeatureMatrix backend: {backend}")
+
+    vectors = list(matrix)
+    with timed("per-row score + is_anomalous", args.rows):
+        scores = [model.score(vector) for vector in vectors]
+        flags = [model.is_anomalous(vector) for vector in vectors]
+    with timed("predict_batch", args.rows):
+        mask, batch_scores = model.predict_batch(matrix)
+
+    if list(mask) != flags or list(batch_scores) != scores:
+        print("MISMATCH between per-row and batch scoring")
+        return 1
+    print(f"{sum(flags):,} anomalies, identical on both paths")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
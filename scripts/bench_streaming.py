@@ -0,0 +1,73 @@
+"""Show that streaming peak RSS does not grow with input size.
+
+Each measurement runs in a fresh interpreter so ``ru_maxrss`` reflects only
+that run. Usage::
+
+    PYTHONPATH=. python scripts/bench_streaming.py --rows 20000 80000 320000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+from pathlib import Path
+
+from bench_common import add_work_dir_argument, work_dir, write_synthetic_logs
+
+
+def _child(mode: str, data_path: Path, chunk_size: int, root: Path) -> None:
+    from nsms.config import Config
+    from nsms.model import AnomalyModel, ModelStats
+    from nsms.monitoring import run_pipeline, run_pipeline_streaming
+
+    base = Config.load()
+    output_dir = root / f"out-{mode}"
+    config = base.from_mapping(
+        {**base.__dict__, "data_path": str(data_path), "output_dir": str(output_dir)}
+    )
+    model = AnomalyModel(ModelStats(900.0, 1200.0, 0.4, 0.02, 0.02), threshold=3.0)
+    if mode == "stream":
+        run_pipeline_streaming(config, model=model, chunk_size=chunk_size)
+    else:
+        run_pipeline(config, model=model)
+    print(json.dumps({"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 80000, 320000])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    add_work_dir_argument(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child[0], Path(args.child[1]), args.chunk_size, args.work_dir)
+        return 0
+
+    root = work_dir(args.work_dir)
+    print(f"{'rows':>10} {'batch MiB':>10} {'stream MiB':>11}")
+    for rows in args.rows:
+        data_path = write_synthetic_logs(root / f"logs-{rows}.csv", rows)
+        peaks = {}
+        for mode in ("batch", "stream"):
+            result = subprocess.run(
+                [
+                    sys.executable, __file__, "--chunk-size", str(args.chunk_size),
+                    "--work-dir", str(root), "--child", mode, str(data_path),
+                ],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+            peaks[mode] = json.loads(result.stdout.strip().splitlines()[-1])["max_rss_kb"] / 1024
+        print(f"{rows:>10} {peaks['batch']:>10.1f} {peaks['stream']:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
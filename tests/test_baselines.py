@@ -0,0 +1,287 @@
+import contextlib
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from statistics import fmean, pstdev
+from unittest import mock
+
+from nsms import baselines, model as model_module, preprocessing
+from nsms.baselines import EntityBaselines, EntityTable, SeasonalBaselines, entity_key, hour_of_week
+from nsms.config import Config
+from nsms.csv_fast import to_epoch_micros
+from nsms.data import LogBatch, LogRecord
+from nsms.model import ModelTrainer
+from nsms.model_io import load_model, save_model
+from nsms.monitoring import run_pipeline, run_pipeline_streaming, train_model
+from nsms.preprocessing import extract_feature_matrix
+
+
+START = datetime(2024, 1, 1)
+
+
+def _record(
+    idx: int, user: str, source_ip: str, nbytes: int, timestamp: datetime | None = None
+) -> LogRecord:
+    return LogRecord(
+        timestamp=timestamp or START + timedelta(seconds=idx),
+        source_ip=source_ip,
+        destination_ip="10.0.0.1",
+        protocol="HTTPS",
+        bytes_transferred=nbytes,
+        action="READ",
+        region="us-east-1",
+        user=user,
+        resource="/app/service/1",
+        status="OK",
+    )
+
+
+def _training_records():
+    rng = random.Random(3)
+    records = []
+    for idx in range(1200):
+        if idx % 20 == 0:
+            records.append(
+                _record(idx, "svc-backup", "10.9.9.9", rng.randrange(90_000_000, 110_000_000))
+            )
+        elif idx % 20 == 1:
+            records.append(_record(idx, "alice", "10.1.1.1", rng.randrange(1_000, 2_000)))
+        else:
+            records.append(
+                _record(idx, f"user{idx % 40}", f"10.2.2.{idx % 40}", rng.randrange(10_000, 50_000))
+            )
+    return records
+
+
+class TestEntityTable(unittest.TestCase):
+    def test_grows_merges_and_round_trips(self):
+        rng = random.Random(1)
+        values = {
+            f"10.0.{idx // 256}.{idx % 256}": [rng.randrange(1, 10_000) for _ in range(5)]
+            for idx in range(5000)
+        }
+        table = EntityTable(capacity=8)
+        other = EntityTable()
+        for value, samples in values.items():
+            table.add(entity_key(value), 3, fmean(samples[:3]), pstdev(samples[:3]) ** 2 * 3)
+            other.add(entity_key(value), 2, fmean(samples[3:]), pstdev(samples[3:]) ** 2 * 2)
+        table.merge(other)
+        self.assertEqual(len(table), len(values))
+        self.assertLessEqual(len(table), 0.7 * table.capacity)
+
+        restored = EntityTable.from_dict(table.as_dict())
+        for value, samples in list(values.items())[::97]:
+            count, mean, std = restored.lookup(entity_key(value))
+            self.assertEqual(count, 5)
+            self.assertAlmostEqual(mean, fmean(samples))
+            self.assertAlmostEqual(std, pstdev(samples))
+        self.assertIsNone(restored.lookup(entity_key("192.0.2.1")))
+
+
+class TestEntityBaselines(unittest.TestCase):
+    def test_busy_host_is_normal_and_quiet_account_is_not(self):
+        train = LogBatch.from_records(_training_records())
+        score = LogBatch.from_records(
+            [
+                _record(0, "svc-backup", "10.9.9.9", 105_000_000),
+                _record(1, "alice", "10.1.1.1", 900_000),
+                _record(2, "newcomer", "192.0.2.7", 900_000),
+            ]
+        )
+        variants = [None] if preprocessing.np is None else [preprocessing.np, None]
+        for numpy_module in variants:
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                global_model = (
+                    ModelTrainer().update(extract_feature_matrix(train)).model(threshold=3.0)
+                )
+                self.assertEqual(
+                    global_model.predict(extract_feature_matrix(score)), [True, False, False]
+                )
+
+                trainer = ModelTrainer(["user", "source_ip"], entity_min_count=30)
+                for start in range(0, len(train), 128):
+                    chunk = train.slice(start, start + 128)
+                    trainer.update(extract_feature_matrix(chunk), chunk)
+                model = trainer.model(threshold=3.0)
+                matrix = extract_feature_matrix(score)
+                # The newcomer has no baseline and is scored against the global one.
+                self.assertEqual(model.predict(matrix, score), [False, True, False])
+                with self.assertRaises(ValueError):
+                    model.predict(matrix)
+
+                path = Path(tempfile.mkdtemp()) / "model.json"
+                self.addCleanup(shutil.rmtree, path.parent)
+                save_model(model, path)
+                loaded = load_model(path)
+                self.assertEqual(
+                    list(loaded.score_batch(matrix, score)), list(model.score_batch(matrix, score))
+                )
+
+    def test_rejects_unknown_fields(self):
+        with self.assertRaises(ValueError):
+            EntityBaselines(["region"])
+
+
+def _seasonal_records():
+    """Three weeks, one row per ten minutes: busy office hours, quiet nights,
+    and a backup account moving 100 MB every night at 03:00."""
+
+    rng = random.Random(7)
+    records = []
+    for idx in range(3 * 7 * 24 * 6):
+        timestamp = START + timedelta(minutes=10 * idx)
+        office = timestamp.weekday() < 5 and 9 <= timestamp.hour < 18
+        nbytes = rng.randrange(700_000, 1_300_000) if office else rng.randrange(5_000, 15_000)
+        records.append(_record(idx, f"user{idx % 40}", f"10.2.2.{idx % 40}", nbytes, timestamp))
+        if timestamp.hour == 3:
+            records.append(
+                _record(
+                    idx, "svc-backup", "10.9.9.9", rng.randrange(90_000_000, 110_000_000), timestamp
+                )
+            )
+    return records
+
+
+class TestSeasonalBaselines(unittest.TestCase):
+    def test_hour_of_week_starts_on_monday(self):
+        stamps = [
+            to_epoch_micros(START + timedelta(hours=hours)) for hours in (0, 14 + 24, 167, 168, -1)
+        ]
+        self.assertEqual(list(hour_of_week(stamps)), [0, 38, 167, 0, 167])
+
+    def test_night_traffic_is_scored_against_its_hour(self):
+        train = LogBatch.from_records(
+            [record for record in _seasonal_records() if record.user != "svc-backup"]
+        )
+        sunday_night, tuesday_afternoon = datetime(2024, 1, 28, 3, 30), datetime(2024, 1, 23, 14, 0)
+        score = LogBatch.from_records(
+            [
+                _record(0, "user1", "10.2.2.1", 1_000_000, sunday_night),
+                _record(0, "user1", "10.2.2.1", 1_200_000, tuesday_afternoon),
+                _record(0, "user1", "10.2.2.1", 12_000, sunday_night),
+            ]
+        )
+        variants = [None] if preprocessing.np is None else [preprocessing.np, None]
+        for numpy_module in variants:
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                matrix = extract_feature_matrix(score)
+                global_model = (
+                    ModelTrainer().update(extract_feature_matrix(train)).model(threshold=3.0)
+                )
+                self.assertEqual(global_model.predict(matrix), [False, False, False])
+
+                whole = ModelTrainer(entity_min_count=10, seasonal_baselines="global")
+                whole.update(extract_feature_matrix(train), train)
+                merged = ModelTrainer(entity_min_count=10, seasonal_baselines="global")
+                for start in range(0, len(train), 500):
+                    chunk = train.slice(start, start + 500)
+                    shard = ModelTrainer(entity_min_count=10, seasonal_baselines="global")
+                    merged.merge(shard.update(extract_feature_matrix(chunk), chunk))
+                self.assertEqual(
+                    list(merged.seasonal_baselines.counts), list(whole.seasonal_baselines.counts)
+                )
+                for left, right in zip(
+                    merged.seasonal_baselines.means, whole.seasonal_baselines.means
+                ):
+                    self.assertAlmostEqual(left, right, delta=1e-6 * right)
+
+                model = merged.model(threshold=3.0)
+                self.assertEqual(model.predict(matrix, score), [True, False, False])
+                with self.assertRaises(ValueError):
+                    model.predict(matrix)
+
+    def test_per_entity_hours_and_round_trip(self):
+        train = LogBatch.from_records(_seasonal_records())
+        sunday_night, tuesday_afternoon = datetime(2024, 1, 28, 3, 30), datetime(2024, 1, 23, 14, 0)
+        score = LogBatch.from_records(
+            [
+                _record(0, "svc-backup", "10.9.9.9", 100_000_000, sunday_night),
+                _record(0, "svc-backup", "10.9.9.9", 100_000_000, tuesday_afternoon),
+                _record(0, "newcomer", "192.0.2.7", 9_000, sunday_night),
+            ]
+        )
+        variants = [None] if preprocessing.np is None else [preprocessing.np, None]
+        for numpy_module in variants:
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                trainer = ModelTrainer(entity_min_count=10, seasonal_baselines="user")
+                model = trainer.update(extract_feature_matrix(train), train).model(threshold=3.0)
+                self.assertGreater(len(model.seasonal_baselines.table), 0)
+                matrix = extract_feature_matrix(score)
+                # Off its 03:00 slot the backup account falls back to the
+                # 14:00 baseline of everyone else.
+                self.assertEqual(model.predict(matrix, score), [False, True, False])
+
+                path = Path(tempfile.mkdtemp()) / "model.json"
+                self.addCleanup(shutil.rmtree, path.parent)
+                save_model(model, path)
+                loaded = load_model(path)
+                self.assertEqual(
+                    list(loaded.score_batch(matrix, score)), list(model.score_batch(matrix, score))
+                )
+
+    def test_rejects_unknown_entity(self):
+        with self.assertRaises(ValueError):
+            SeasonalBaselines("region")
+
+
+class TestEntityPipeline(unittest.TestCase):
+    def test_streaming_matches_batch_with_entity_baselines(self):
+        base = Config.load()
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        config = base.from_mapping(
+            {
+                **base.__dict__,
+                "output_dir": str(temp_dir / "batch"),
+                "model_path": str(temp_dir / "model.json"),
+                "entity_baselines": "user,source_ip",
+                "entity_min_count": 5,
+            }
+        )
+        model = train_model(config)
+        self.assertGreater(load_model(config.model_path).entity_baselines.entities, 0)
+        batch_dir = run_pipeline(config, model=model)
+        stream_config = config.from_mapping(
+            {**config.__dict__, "output_dir": str(temp_dir / "stream")}
+        )
+        stream_dir = run_pipeline_streaming(stream_config, model=model, chunk_size=7)
+        self.assertEqual(
+            (batch_dir / "alerts.jsonl").read_bytes(), (stream_dir / "alerts.jsonl").read_bytes()
+        )
+
+    def test_train_model_with_seasonal_baselines(self):
+        base = Config.load()
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        config = base.from_mapping(
+            {
+                **base.__dict__,
+                "output_dir": str(temp_dir / "out"),
+                "model_path": str(temp_dir / "model.json"),
+                "seasonal_baselines": "source_ip",
+                "entity_min_count": 1,
+            }
+        )
+        model = train_model(config)
+        loaded = load_model(config.model_path)
+        self.assertEqual(loaded.seasonal_baselines.entity, "source_ip")
+        self.assertEqual(
+            list(loaded.seasonal_baselines.counts), list(model.seasonal_baselines.counts)
+        )
+        run_pipeline(config, model=loaded)
+        with self.assertRaises(ValueError):
+            base.from_mapping({**base.__dict__, "seasonal_baselines": "region"})
+
+
+def _patched_numpy(numpy_module):
+    stack = contextlib.ExitStack()
+    for module in (preprocessing, model_module, baselines):
+        stack.enter_context(mock.patch.object(module, "np", numpy_module))
+    return stack
+
+
+if __name__ == "__main__":
+    unittest.main()
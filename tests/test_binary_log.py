@@ -0,0 +1,67 @@
+import mmap
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nsms.binary_log import convert_csv_to_binary, is_binary_log, read_binary_log
+from nsms.config import Config
+from nsms.data import iter_batches, load_batch, load_logs
+from nsms.monitoring import run_pipeline, train_model
+
+
+class TestBinaryLog(unittest.TestCase):
+    def setUp(self):
+        self.csv_path = Path("data/sample_logs.csv")
+        self.binary_path = Path("outputs") / "binary-log" / "sample_logs.nsmscol"
+        convert_csv_to_binary(self.csv_path, self.binary_path, batch_size=250)
+
+    def test_round_trip_matches_csv(self):
+        self.assertTrue(is_binary_log(self.binary_path))
+        self.assertFalse(is_binary_log(self.csv_path))
+        batch = read_binary_log(self.binary_path)
+        self.assertIsInstance(batch.timestamps, memoryview)
+        self.assertEqual(list(batch.records()), load_logs(self.csv_path))
+        sliced = [len(item) for item in iter_batches(self.binary_path, 500)]
+        self.assertEqual(sliced, [500, 500, 200])
+        self.assertEqual(load_logs(self.binary_path), load_logs(self.csv_path))
+
+    def test_incompatible_item_size_closes_the_mapping(self):
+        data = self.binary_path.read_bytes()
+        corrupt = self.binary_path.with_name("corrupt.nsmscol")
+        corrupt.write_bytes(data.replace(b'"itemsize": 8', b'"itemsize": 9', 1))
+        opened = []
+        real_mmap = mmap.mmap
+
+        def tracking_mmap(*args, **kwargs):
+            opened.append(real_mmap(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch("mmap.mmap", tracking_mmap):
+            with self.assertRaisesRegex(ValueError, "incompatible item size"):
+                read_binary_log(corrupt)
+        self.assertTrue(opened[0].closed)
+
+    def test_pipeline_accepts_binary_data_path(self):
+        base = Config.load()
+        outputs = {}
+        for label, data_path in (("csv", self.csv_path), ("binary", self.binary_path)):
+            temp_dir = Path("outputs") / f"binary-log-{label}"
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            config = base.from_mapping(
+                {
+                    **base.__dict__,
+                    "data_path": str(data_path),
+                    "output_dir": str(temp_dir),
+                    "model_path": str(temp_dir / "model.json"),
+                }
+            )
+            outputs[label] = run_pipeline(config, model=train_model(config))
+        self.assertEqual(
+            (outputs["csv"] / "alerts.jsonl").read_bytes(),
+            (outputs["binary"] / "alerts.jsonl").read_bytes(),
+        )
+        self.assertEqual(len(load_batch(self.binary_path)), 1200)
+
+
+if __name__ == "__main__":
+    unittest.main()
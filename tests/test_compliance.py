@@ -1,8 +1,12 @@
+import random
 import unittest
+from dataclasses import replace
 from pathlib import Path
+from unittest import mock
 
-from nsms.compliance import ComplianceChecker
-from nsms.data import load_logs
+from nsms import compliance
+from nsms.compliance import ComplianceChecker, ComplianceRule
+from nsms.data import load_batch, load_logs
 
 
 class TestCompliance(unittest.TestCase):
@@ -12,6 +16,61 @@ class TestCompliance(unittest.TestCase):
         violations = [checker.evaluate(record) for record in records]
         self.assertTrue(any(violations))
 
+    def test_evaluate_batch_matches_per_record(self):
+        checker = ComplianceChecker.load(Path("data/compliance_rules.json"))
+        records = load_logs(Path("data/sample_logs.csv"))
+        batch_results = checker.evaluate_batch(load_batch(Path("data/sample_logs.csv")))
+        self.assertEqual(
+            [list(item) for item in batch_results], [checker.evaluate(r) for r in records]
+        )
+
+    def test_violation_masks_match_rule_ids(self):
+        rules = ComplianceChecker.load(Path("data/compliance_rules.json")).rules
+        batch = load_batch(Path("data/sample_logs.csv"))
+        # 70 copies of the rules need masks wider than 64 bits.
+        for copies in (1, 70):
+            checker = ComplianceChecker(rules * copies)
+            expected = [checker.evaluate(record) for record in batch.records()]
+            for numpy_module in [None] if compliance.np is None else [compliance.np, None]:
+                with self.subTest(copies=copies, numpy=numpy_module is not None), mock.patch.object(
+                    compliance, "np", numpy_module
+                ):
+                    masks = checker.violation_masks(batch)
+                    self.assertEqual([list(checker.rule_ids(mask)) for mask in masks], expected)
+                    self.assertEqual(
+                        sum(1 for mask in masks if mask), sum(1 for item in expected if item)
+                    )
+
+    def test_compiled_rules_match_rule_by_rule_checks(self):
+        rng = random.Random(3)
+        regions = ["us-east-1", "us-west-2", "eu-west-1", "ap-south-1"]
+        protocols = ["HTTPS", "SSH", "DNS", "FTP"]
+        actions = ["READ", "WRITE", "DELETE", "ROOT_LOGIN"]
+        rules = [
+            ComplianceRule(
+                rule_id=f"R{index}",
+                description="",
+                allowed_regions=rng.sample(regions, rng.randint(0, 3)),
+                allowed_protocols=rng.sample(protocols, rng.randint(0, 3)),
+                high_risk_actions=rng.sample(actions, rng.randint(0, 2)),
+            )
+            for index in range(40)
+        ]
+        checker = ComplianceChecker(rules)
+        record = load_logs(Path("data/sample_logs.csv"))[0]
+        for region in regions + ["unknown"]:
+            for protocol in protocols + ["TELNET"]:
+                for action in actions + ["LIST"]:
+                    expected = [
+                        rule.rule_id
+                        for rule in rules
+                        if region not in rule.allowed_regions
+                        or protocol not in rule.allowed_protocols
+                        or action in rule.high_risk_actions
+                    ]
+                    checked = replace(record, region=region, protocol=protocol, action=action)
+                    self.assertEqual(checker.evaluate(checked), expected)
+
 
 if __name__ == "__main__":
     unittest.main()
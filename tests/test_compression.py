@@ -0,0 +1,40 @@
+import bz2
+import gzip
+import lzma
+import unittest
+from pathlib import Path
+
+from nsms.binary_log import default_binary_path
+from nsms.compression import detect_compression
+from nsms.data import iter_batches, iter_logs, load_batch, load_logs
+
+
+class TestCompressedInput(unittest.TestCase):
+    def setUp(self):
+        self.csv_path = Path("data/sample_logs.csv")
+        self.temp_dir = Path("outputs") / "compressed-input"
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.expected = load_logs(self.csv_path)
+
+    def test_codecs_match_plain_csv(self):
+        payload = self.csv_path.read_bytes()
+        for suffix, codec in ((".gz", gzip), (".bz2", bz2), (".xz", lzma)):
+            path = self.temp_dir / f"sample_logs.csv{suffix}"
+            path.write_bytes(codec.compress(payload))
+            with self.subTest(codec=suffix):
+                self.assertEqual(load_logs(path), self.expected)
+                self.assertEqual(list(iter_logs(path, use_mmap=True)), self.expected)
+                self.assertEqual(list(load_batch(path).records()), self.expected)
+                self.assertEqual([len(batch) for batch in iter_batches(path, 500)], [500, 500, 200])
+
+    def test_detects_magic_bytes_without_extension(self):
+        path = self.temp_dir / "archive.log"
+        path.write_bytes(gzip.compress(self.csv_path.read_bytes()))
+        self.assertEqual(detect_compression(path), "gzip")
+        self.assertIsNone(detect_compression(self.csv_path))
+        self.assertEqual(load_logs(path), self.expected)
+        self.assertEqual(default_binary_path(Path("logs.csv.gz")), Path("logs.nsmscol"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,6 +27,15 @@ class TestConfig(unittest.TestCase):
         )
         self.assertEqual(config.anomaly_threshold, 1.0)
 
+    def test_data_path_accepts_glob(self):
+        base = Config.load()
+        config = base.from_mapping({**base.__dict__, "data_path": "data/*.csv", "workers": 2})
+        self.assertEqual(config.workers, 2)
+        with self.assertRaises(FileNotFoundError):
+            base.from_mapping({**base.__dict__, "data_path": "data/*.missing"})
+        with self.assertRaises(ValueError):
+            base.from_mapping({**base.__dict__, "workers": 0})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+import csv
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from nsms.csv_fast import TimestampCache, to_epoch_micros
+from nsms.data import LOG_FIELDNAMES, LogRecord, load_batch, load_logs
+
+
+class TestCsvFast(unittest.TestCase):
+    def test_timestamp_cache_matches_fromisoformat(self):
+        cache = TimestampCache()
+        values = [
+            "2024-01-01T00:01:00",
+            "2024-01-01T00:01:59",
+            "2024-01-01T00:01:02.500000",
+            "2024-01-01T00:02",
+            "2024-01-01T01:01:02+01:00",
+        ]
+        expected = [to_epoch_micros(datetime.fromisoformat(value)) for value in values]
+        self.assertEqual(cache.to_micros_many(values), expected)
+        self.assertEqual(cache.to_micros_many(values[:2]), expected[:2])
+        with self.assertRaises(ValueError):
+            cache.to_micros("2024-01-01T00:01:60")
+
+    def test_fast_paths_match_dictreader(self):
+        path = Path("outputs") / "csv-fast" / "quoted.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(LOG_FIELDNAMES)
+            writer.writerow(
+                [
+                    "2024-01-01T00:01:00",
+                    "1.1.1.1",
+                    "2.2.2.2",
+                    "SSH",
+                    "5",
+                    "READ",
+                    "us-west-2",
+                    "a,b",
+                    "/x",
+                    "OK",
+                ]
+            )
+            writer.writerow(
+                [
+                    "2024-01-01T00:01:02.5",
+                    "1.1.1.1",
+                    "2.2.2.2",
+                    "SSH",
+                    "7",
+                    "READ",
+                    "us-west-2",
+                    "multi\nline",
+                    "/x",
+                    "OK",
+                ]
+            )
+        with path.open(newline="", encoding="utf-8") as handle:
+            expected = [LogRecord.from_row(row) for row in csv.DictReader(handle)]
+
+        for use_mmap in (False, True):
+            self.assertEqual(load_logs(path, use_mmap=use_mmap), expected)
+            self.assertEqual(list(load_batch(path, use_mmap=use_mmap).records()), expected)
+
+    def test_row_width_is_checked(self):
+        path = Path("outputs") / "csv-fast" / "ragged.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = Path("data/sample_logs.csv").read_text().splitlines()[:3]
+        path.write_text("\n".join([lines[0], lines[1] + ",extra", lines[2]]) + "\n")
+        with self.assertRaises(ValueError):
+            load_batch(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,18 @@
 import unittest
 from pathlib import Path
 
-from nsms.data import load_logs, summarize_protocols
+from nsms.data import (
+    SYMBOLS,
+    FactTables,
+    StringColumn,
+    Vocabulary,
+    iter_batches,
+    iter_chunks,
+    iter_logs,
+    load_batch,
+    load_logs,
+    summarize_protocols,
+)
 
 
 class TestData(unittest.TestCase):
@@ -16,6 +27,59 @@ class TestData(unittest.TestCase):
         self.assertEqual(sum(summary.values()), len(records))
         self.assertIn("HTTPS", summary)
 
+    def test_iter_logs_chunks_match_load_logs(self):
+        records = load_logs(Path("data/sample_logs.csv"))
+        chunks = list(iter_chunks(iter_logs(Path("data/sample_logs.csv")), 500))
+        self.assertEqual([len(chunk) for chunk in chunks], [500, 500, 200])
+        self.assertEqual([record for chunk in chunks for record in chunk], records)
+
+    def test_load_batch_round_trips_records(self):
+        records = load_logs(Path("data/sample_logs.csv"))
+        batch = load_batch(Path("data/sample_logs.csv"))
+        self.assertEqual(len(batch), len(records))
+        self.assertEqual(list(batch.records()), records)
+        self.assertLess(len(batch.protocol.values), 10)
+        self.assertEqual(
+            list(summarize_protocols(batch).items()), list(summarize_protocols(records).items())
+        )
+
+    def test_iter_batches_respects_batch_size(self):
+        batches = list(iter_batches(Path("data/sample_logs.csv"), 512))
+        self.assertEqual([len(batch) for batch in batches], [512, 512, 176])
+
+    def test_low_cardinality_fields_share_symbol_table(self):
+        first, second = list(iter_batches(Path("data/sample_logs.csv"), 600))
+        self.assertIs(first.status.vocabulary, SYMBOLS.vocabulary("status"))
+        self.assertIs(first.protocol.vocabulary, second.protocol.vocabulary)
+        self.assertIsNot(first.source_ip.vocabulary, second.source_ip.vocabulary)
+        records = load_logs(Path("data/sample_logs.csv"))
+        self.assertIs(records[0].protocol, records[3].protocol)
+
+    def test_vocabulary_facts_are_derived_once_per_value(self):
+        calls = []
+        vocabulary = Vocabulary(["OK", "DENIED"])
+        vocabulary.facts("denied", lambda value: calls.append(value) or value != "OK")
+        vocabulary.encode("ERROR")
+        facts = vocabulary.facts("denied", lambda value: calls.append(value) or value != "OK")
+        self.assertEqual(facts, [False, True, True])
+        self.assertEqual(calls, ["OK", "DENIED", "ERROR"])
+
+    def test_fact_tables_are_cleared_when_full(self):
+        tables = FactTables(limit=2)
+        columns = [StringColumn(Vocabulary(["OK", "DENIED"])) for _ in range(3)]
+        for column in columns[:2]:
+            self.assertEqual(
+                tables.facts(column, "denied", lambda value: value != "OK"), [False, True]
+            )
+        column = columns[0]
+        column.vocabulary.encode("ERROR")
+        self.assertEqual(
+            tables.facts(column, "denied", lambda value: value != "OK"), [False, True, True]
+        )
+        self.assertEqual(len(tables), 2)
+        tables.facts(columns[2], "denied", lambda value: value != "OK")
+        self.assertEqual(len(tables), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+import json
+import unittest
+from pathlib import Path
+
+from nsms.data import load_batch
+from nsms.feature_registry import (
+    REGISTRY,
+    FeatureDefinition,
+    FeatureExtractor,
+    FeatureRegistry,
+    feature_names,
+)
+from nsms.model import AnomalyModel
+from nsms.preprocessing import WindowedFeatureEngine, extract_feature_matrix
+
+
+SAMPLE = Path("data/sample_logs.csv")
+
+
+class TestFeatureRegistry(unittest.TestCase):
+    def test_resolve_orders_dependencies_first(self):
+        plan = [
+            definition.name
+            for definition in REGISTRY.resolve(["user_bytes_300s", "bytes_transferred"])
+        ]
+        self.assertEqual(
+            plan, ["is_denied", "user_window_300s", "user_bytes_300s", "bytes_transferred"]
+        )
+
+    def test_unknown_feature_and_cycle(self):
+        with self.assertRaises(KeyError):
+            REGISTRY.resolve(["source_ip_median_300s"])
+        registry = FeatureRegistry()
+        registry.register(FeatureDefinition("a", lambda context: None, depends_on=("b",)))
+        registry.register(FeatureDefinition("b", lambda context: None, depends_on=("a",)))
+        with self.assertRaises(ValueError):
+            registry.resolve(["a"])
+
+    def test_extractor_matches_eager_extraction(self):
+        batch = load_batch(SAMPLE)
+        extractor = FeatureExtractor(feature_names([300, 3600]))
+        matrix = extractor.extract(batch)
+        expected = extract_feature_matrix(batch, WindowedFeatureEngine([300, 3600]))
+        self.assertEqual(list(matrix), list(expected))
+        self.assertEqual(list(matrix.windowed), list(expected.windowed))
+        for name, column in expected.windowed.items():
+            self.assertEqual(list(matrix.windowed[name]), list(column))
+        self.assertEqual(extractor.timings.rows["user_window_300s"], len(batch))
+
+    def test_only_required_features_are_computed(self):
+        batch = load_batch(SAMPLE)
+        model = AnomalyModel.train(
+            FeatureExtractor(["bytes_transferred", "source_ip_count_300s"]).extract(batch)
+        )
+        extractor = FeatureExtractor(model.required_features)
+        extractor.extract(batch)
+        self.assertEqual(list(extractor.states), ["source_ip_window_300s"])
+        self.assertNotIn("user_window_300s", extractor.timings.seconds)
+        self.assertNotIn("source_ip_bytes_300s", extractor.timings.seconds)
+
+    def test_state_round_trips_between_batches(self):
+        batch = load_batch(SAMPLE)
+        names = ["source_ip_bytes_3600s", "user_deny_rate_300s"]
+        whole = FeatureExtractor(names).extract(batch)
+        extractor = FeatureExtractor(names)
+        first = extractor.extract(batch.slice(0, 500))
+        restored = FeatureExtractor.from_dict(json.loads(json.dumps(extractor.as_dict())))
+        second = restored.extract(batch.slice(500, len(batch)))
+        for name in names:
+            self.assertEqual(
+                list(first.windowed[name]) + list(second.windowed[name]), list(whole.windowed[name])
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nsms import feature_store, preprocessing
+from nsms.config import Config
+from nsms.data import load_batch
+from nsms.feature_store import (
+    FeatureStore,
+    load_features,
+    read_feature_matrix,
+    write_feature_matrix,
+)
+from nsms.preprocessing import extract_feature_matrix
+
+
+SAMPLE = Path("data/sample_logs.csv")
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def _config(self, data_path: Path, **overrides) -> Config:
+        base = Config.load()
+        return base.from_mapping(
+            {
+                **base.__dict__,
+                "data_path": str(data_path),
+                "feature_cache_dir": str(self.temp_dir / "cache"),
+                **overrides,
+            }
+        )
+
+    def test_round_trip_with_and_without_numpy(self):
+        variants = [None] if preprocessing.np is None else [preprocessing.np, None]
+        batch = load_batch(SAMPLE)
+        for numpy_module in variants:
+            with self.subTest(numpy=numpy_module is not None), mock.patch.object(
+                preprocessing, "np", numpy_module
+            ), mock.patch.object(feature_store, "np", numpy_module):
+                matrix = extract_feature_matrix(batch)
+                path = self.temp_dir / "entry.nsmsfeat"
+                write_feature_matrix(path, matrix)
+                cached = read_feature_matrix(path)
+                self.assertEqual(cached.is_ndarray, numpy_module is not None)
+                self.assertEqual(list(cached), list(matrix))
+                self.assertEqual(list(cached.slice(10, 20)), list(matrix.slice(10, 20)))
+
+    def test_load_features_reuses_cache_until_input_changes(self):
+        data_path = self.temp_dir / "logs.csv"
+        shutil.copy(SAMPLE, data_path)
+        config = self._config(data_path)
+        first = load_features(config)
+        with mock.patch.object(feature_store, "_extract") as extract:
+            cached = load_features(config)
+        extract.assert_not_called()
+        self.assertEqual(list(cached), list(first))
+
+        with data_path.open("a", encoding="utf-8") as handle:
+            handle.write(SAMPLE.read_text(encoding="utf-8").splitlines()[1] + "\n")
+        refreshed = load_features(config)
+        self.assertEqual(len(refreshed), len(first) + 1)
+
+    def test_window_is_part_of_the_key(self):
+        config = self._config(SAMPLE)
+        windowed = self._config(SAMPLE, window_start="2024-01-01T00:30:00")
+        self.assertNotEqual(len(load_features(config)), len(load_features(windowed)))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        matrix = extract_feature_matrix(load_batch(SAMPLE))
+        store = FeatureStore(self.temp_dir / "cache")
+        for key in ("a", "b", "c"):
+            store.put(key, matrix)
+        entry_size = store.entry_path("a").stat().st_size
+        for age, key in enumerate(("b", "a", "c")):
+            os.utime(store.entry_path(key), ns=(age * 10**9, age * 10**9))
+
+        store.max_bytes = 2 * entry_size
+        self.assertEqual(store.evict(), 1)
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("a"))
+
+    def test_corrupt_entry_is_a_miss(self):
+        store = FeatureStore(self.temp_dir / "cache")
+        store.directory.mkdir(parents=True)
+        store.entry_path("bad").write_bytes(b"NSMSFEA1\xff")
+        self.assertIsNone(store.get("bad"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+from nsms.config import Config
+from nsms.follow import CHECKPOINT_NAME, STATUS_NAME, LogFollower
+from nsms.monitoring import run_pipeline, train_model
+
+
+class TestFollow(unittest.TestCase):
+    def setUp(self):
+        self.root = Path("outputs") / "follow"
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True)
+        self.header, *self.rows = (
+            Path("data/sample_logs.csv").read_text(encoding="utf-8").splitlines(keepends=True)
+        )
+        self.log_path = self.root / "live.csv"
+        self.log_path.write_text(self.header, encoding="utf-8")
+        base = Config.load()
+        self.model = train_model(
+            base.from_mapping({**base.__dict__, "model_path": str(self.root / "model.json")})
+        )
+        self.config = base.from_mapping(
+            {
+                **base.__dict__,
+                "data_path": str(self.log_path),
+                "output_dir": str(self.root / "out"),
+                "model_path": str(self.root / "model.json"),
+            }
+        )
+
+    def append(self, text):
+        with self.log_path.open("a", encoding="utf-8") as handle:
+            handle.write(text)
+
+    def expected_alerts(self, rows):
+        source = self.root / "expected.csv"
+        source.write_text(self.header + "".join(rows), encoding="utf-8")
+        config = self.config.from_mapping(
+            {
+                **self.config.__dict__,
+                "data_path": str(source),
+                "output_dir": str(self.root / "expected"),
+            }
+        )
+        return (run_pipeline(config, model=self.model) / "alerts.jsonl").read_bytes()
+
+    def test_resume_after_crash_has_no_duplicates(self):
+        follower = LogFollower(self.config, self.model, max_batch_bytes=4096)
+        self.append("".join(self.rows[:400]))
+        self.assertEqual(follower.poll(), 400)
+        partial = self.rows[400]
+        self.append(partial[:20])
+        self.assertEqual(follower.poll(), 0)
+        follower.close()
+
+        # Simulate a crash after outputs were written but before the checkpoint.
+        with (self.config.output_dir / "alerts.jsonl").open("a", encoding="utf-8") as handle:
+            handle.write('{"record_index": 400}\n')
+        self.append(partial[20:] + "".join(self.rows[401:700]))
+
+        follower = LogFollower(self.config, self.model)
+        self.assertEqual(follower.poll(), 300)
+        follower.close()
+
+        self.assertEqual(
+            (self.config.output_dir / "alerts.jsonl").read_bytes(),
+            self.expected_alerts(self.rows[:700]),
+        )
+        metrics = json.loads((self.config.output_dir / "metrics.json").read_text())
+        self.assertEqual(metrics["total_records"], 700)
+        incident_ids = [
+            json.loads(line)["incident_id"]
+            for line in (self.config.output_dir / "incidents.jsonl").open()
+        ]
+        self.assertEqual(len(incident_ids), len(set(incident_ids)))
+        status = json.loads((self.config.output_dir / STATUS_NAME).read_text())
+        self.assertEqual(status["offset"], self.log_path.stat().st_size)
+        self.assertGreater(status["latency"]["batches"], 0)
+
+    def test_rotation_and_truncation(self):
+        follower = LogFollower(self.config, self.model)
+        self.append("".join(self.rows[:100]))
+        self.assertEqual(follower.poll(), 100)
+
+        # Rows written just before rotation are drained from the old file.
+        self.append("".join(self.rows[100:150]))
+        os.replace(self.log_path, self.root / "live.csv.1")
+        self.log_path.write_text(self.header + "".join(self.rows[150:200]), encoding="utf-8")
+        self.assertEqual(follower.poll(), 100)
+
+        self.log_path.write_text(self.header + "".join(self.rows[200:210]), encoding="utf-8")
+        self.assertEqual(follower.poll(), 10)
+        follower.close()
+
+        self.assertEqual(
+            (self.config.output_dir / "alerts.jsonl").read_bytes(),
+            self.expected_alerts(self.rows[:210]),
+        )
+        self.assertTrue((self.config.output_dir / CHECKPOINT_NAME).exists())
+
+    def test_truncation_followed_by_regrowth(self):
+        follower = LogFollower(self.config, self.model)
+        self.append("".join(self.rows[:100]))
+        self.assertEqual(follower.poll(), 100)
+
+        # copytruncate, then more rows than before arrive before the next poll.
+        with self.log_path.open("r+", encoding="utf-8") as handle:
+            handle.truncate(0)
+            handle.write(self.header + "".join(self.rows[100:300]))
+        with self.assertLogs("nsms.follow", "WARNING"):
+            self.assertEqual(follower.poll(), 200)
+        follower.close()
+
+        # The same while stopped: the restart must not seek into the middle of a row.
+        with self.log_path.open("r+", encoding="utf-8") as handle:
+            handle.truncate(0)
+            handle.write(self.header + "".join(self.rows[300:600]))
+        follower = LogFollower(self.config, self.model)
+        with self.assertLogs("nsms.follow", "WARNING"):
+            self.assertEqual(follower.poll(), 300)
+        follower.close()
+
+        self.assertEqual(
+            (self.config.output_dir / "alerts.jsonl").read_bytes(),
+            self.expected_alerts(self.rows[:600]),
+        )
+
+    def test_malformed_batch_is_skipped(self):
+        follower = LogFollower(self.config, self.model)
+        self.append("".join(self.rows[:100]))
+        self.assertEqual(follower.poll(), 100)
+        self.append("not,a,record\n")
+        with self.assertLogs("nsms.follow", "WARNING"):
+            self.assertEqual(follower.poll(), 0)
+        self.append("".join(self.rows[100:200]))
+        self.assertEqual(follower.poll(), 100)
+        follower.close()
+
+        self.assertEqual(
+            (self.config.output_dir / "alerts.jsonl").read_bytes(),
+            self.expected_alerts(self.rows[:200]),
+        )
+        status = json.loads((self.config.output_dir / STATUS_NAME).read_text())
+        self.assertEqual(status["offset"], self.log_path.stat().st_size)
+
+    def test_malformed_row_between_good_rows_drops_only_that_row(self):
+        follower = LogFollower(self.config, self.model)
+        self.append("".join(self.rows[:500]))
+        bad_offset = self.log_path.stat().st_size
+        self.append("bad,row\n" + "".join(self.rows[500:1000]))
+        with self.assertLogs("nsms.follow", "WARNING") as logs:
+            self.assertEqual(follower.poll(), 1000)
+        follower.close()
+
+        self.assertIn(f"at byte {bad_offset} ", "\n".join(logs.output))
+        self.assertEqual(
+            (self.config.output_dir / "alerts.jsonl").read_bytes(),
+            self.expected_alerts(self.rows[:1000]),
+        )
+        metrics = json.loads((self.config.output_dir / "metrics.json").read_text())
+        self.assertEqual(metrics["total_records"], 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import gzip
+import shutil
+import unittest
+from pathlib import Path
+
+from nsms.config import Config
+from nsms.data import iter_batches, load_batch, load_logs
+from nsms.ingest import resolve_log_paths
+from nsms.monitoring import run_pipeline, run_pipeline_streaming, train_model
+
+
+class TestMultiFileIngest(unittest.TestCase):
+    def setUp(self):
+        self.csv_path = Path("data/sample_logs.csv")
+        self.log_dir = Path("outputs") / "ingest" / "hourly"
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+        self.log_dir.mkdir(parents=True)
+        header, *rows = self.csv_path.read_text(encoding="utf-8").splitlines(keepends=True)
+        # Names sort opposite to the data so ordering must come from timestamps.
+        parts = [rows[:400], rows[400:900], rows[900:]]
+        for name, part in zip(["c.csv", "b.csv.gz", "a.csv"], parts):
+            payload = (header + "".join(part)).encode("utf-8")
+            path = self.log_dir / name
+            path.write_bytes(gzip.compress(payload) if name.endswith(".gz") else payload)
+        (self.log_dir / "notes.txt").write_text("not a log file", encoding="utf-8")
+
+    def test_directory_and_glob_merge_in_timestamp_order(self):
+        self.assertEqual(
+            [path.name for path in resolve_log_paths(self.log_dir)], ["c.csv", "b.csv.gz", "a.csv"]
+        )
+        expected = load_logs(self.csv_path)
+        self.assertEqual(load_logs(self.log_dir), expected)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                batch = load_batch(self.log_dir, workers=workers)
+                self.assertEqual(list(batch.records()), expected)
+                streamed = [len(item) for item in iter_batches(self.log_dir, 300, workers=workers)]
+                self.assertEqual(streamed, [300, 100, 300, 200, 300])
+        self.assertEqual(len(load_batch(self.log_dir / "*.csv")), 700)
+        with self.assertRaises(FileNotFoundError):
+            resolve_log_paths(self.log_dir / "*.json")
+
+    def test_short_or_unparsable_first_row_sorts_last(self):
+        header, first = self.csv_path.read_text(encoding="utf-8").splitlines(keepends=True)[:2]
+        (self.log_dir / "blank.csv").write_text(header + "\n" + first, encoding="utf-8")
+        (self.log_dir / "short.csv").write_text("source_ip,timestamp\n10.0.0.1\n", encoding="utf-8")
+        (self.log_dir / "unparsable.csv").write_text(
+            header + "yesterday" + first[first.index(",") :], encoding="utf-8"
+        )
+        names = [path.name for path in resolve_log_paths(self.log_dir)]
+        self.assertEqual(
+            names, ["c.csv", "b.csv.gz", "a.csv", "blank.csv", "short.csv", "unparsable.csv"]
+        )
+
+    def test_pipeline_over_directory_matches_single_file(self):
+        base = Config.load()
+        outputs = {}
+        for label, data_path, workers in (("file", self.csv_path, 1), ("dir", self.log_dir, 2)):
+            temp_dir = Path("outputs") / f"ingest-{label}"
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            config = base.from_mapping(
+                {
+                    **base.__dict__,
+                    "data_path": str(data_path),
+                    "output_dir": str(temp_dir),
+                    "model_path": str(temp_dir / "model.json"),
+                    "workers": workers,
+                }
+            )
+            model = train_model(config)
+            outputs[label] = (run_pipeline(config, model=model) / "alerts.jsonl").read_bytes()
+            streamed = run_pipeline_streaming(config, model=model, chunk_size=250)
+            self.assertEqual((streamed / "alerts.jsonl").read_bytes(), outputs[label])
+        self.assertEqual(outputs["file"], outputs["dir"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import shutil
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from nsms.csv_fast import to_epoch_micros
+from nsms.data import iter_batches, load_batch, load_logs
+from nsms.log_index import build_log_index, index_path, indexed_byte_range, update_log_index
+
+
+class TestLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = Path("outputs") / "log-index"
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True)
+        self.header, *self.rows = (
+            Path("data/sample_logs.csv").read_text(encoding="utf-8").splitlines(keepends=True)
+        )
+        self.path = self.root / "logs.csv"
+        self.path.write_text(self.header + "".join(self.rows[:1000]), encoding="utf-8")
+
+    def window(self, start, end):
+        return [record for record in load_logs(self.path) if start <= record.timestamp < end]
+
+    def test_seek_matches_full_scan(self):
+        index = build_log_index(self.path, stride=64)
+        self.assertTrue(index_path(self.path).exists())
+        self.assertEqual(len(index.offsets), 16)
+        for start, end in (
+            (datetime(2024, 1, 1, 7, 15), datetime(2024, 1, 1, 9, 1)),
+            (datetime(2023, 1, 1), datetime(2024, 1, 1, 0, 30)),
+            (datetime(2024, 1, 1, 15), datetime(2030, 1, 1)),
+        ):
+            with self.subTest(start=start):
+                expected = self.window(start, end)
+                self.assertEqual(
+                    list(load_batch(self.path, start=start, end=end).records()), expected
+                )
+                streamed = [
+                    r
+                    for b in iter_batches(self.path, 50, start=start, end=end)
+                    for r in b.records()
+                ]
+                self.assertEqual(streamed, expected)
+        first, stop = indexed_byte_range(self.path, to_epoch_micros(datetime(2024, 1, 1, 7)), None)
+        self.assertGreater(first, index.data_offset)
+        self.assertIsNone(stop)
+
+    def test_incremental_update_after_append(self):
+        built = build_log_index(self.path, stride=64)
+        offsets = list(built.offsets)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write("".join(self.rows[1000:]))
+        updated = update_log_index(self.path)
+        self.assertEqual(updated.rows, 1200)
+        self.assertEqual(updated.offsets[: len(offsets)], offsets)
+        self.assertEqual(updated.offsets, build_log_index(self.path, stride=64).offsets)
+
+        self.path.write_text(self.header + "".join(self.rows[:10]), encoding="utf-8")
+        self.assertEqual(update_log_index(self.path).rows, 10)
+
+    def test_quoted_rows_and_unsorted_files(self):
+        quoted = self.rows[5].replace("/app/service/5", '"/app/\nservice,5"')
+        self.path.write_text(
+            self.header + "".join(self.rows[:5]) + quoted + "".join(self.rows[6:300]),
+            encoding="utf-8",
+        )
+        index = build_log_index(self.path, stride=3)
+        self.assertEqual(index.rows, 300)
+        start, end = datetime(2024, 1, 1, 0, 3), datetime(2024, 1, 1, 2)
+        self.assertEqual(
+            list(load_batch(self.path, start=start, end=end).records()), self.window(start, end)
+        )
+
+        self.path.write_text(self.header + "".join(reversed(self.rows[:300])), encoding="utf-8")
+        self.assertFalse(build_log_index(self.path).is_sorted)
+        self.assertIsNone(indexed_byte_range(self.path, 0, None))
+        self.assertEqual(
+            list(load_batch(self.path, start=start, end=end).records()), self.window(start, end)
+        )
+
+    def test_loads_only_read_the_index(self):
+        start, end = datetime(2024, 1, 1, 7), datetime(2030, 1, 1)
+        load_batch(self.path, start=start, end=end)
+        self.assertFalse(index_path(self.path).exists())
+
+        build_log_index(self.path, stride=64)
+        sidecar = index_path(self.path).read_bytes()
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write("".join(self.rows[1000:]))
+        self.assertIsNone(
+            indexed_byte_range(self.path, 0, to_epoch_micros(datetime(2024, 1, 1, 1)))[1]
+        )
+        self.assertEqual(
+            list(load_batch(self.path, start=start, end=end).records()), self.window(start, end)
+        )
+        self.assertEqual(index_path(self.path).read_bytes(), sidecar)
+
+        self.path.write_text(self.header + "".join(self.rows[500:]), encoding="utf-8")
+        with self.assertLogs("nsms.log_index", "WARNING"):
+            self.assertIsNone(indexed_byte_range(self.path, 0, None))
+        self.assertEqual(
+            list(load_batch(self.path, start=start, end=end).records()), self.window(start, end)
+        )
+        self.assertEqual(index_path(self.path).read_bytes(), sidecar)
+
+
+if __name__ == "__main__":
+    unittest.main()
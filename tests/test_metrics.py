@@ -1,7 +1,8 @@
 import unittest
+from array import array
 from datetime import datetime
 
-from nsms.metrics import compute_metrics
+from nsms.metrics import MetricsCounter, compute_metrics, count_bits
 from nsms.data import LogRecord
 
 
@@ -27,6 +28,31 @@ class TestMetrics(unittest.TestCase):
         self.assertEqual(metrics.anomalous_records, 1)
         self.assertEqual(metrics.threat_intel_hits, 1)
 
+    def test_compliance_masks_count_records_with_any_violation(self):
+        records = [self._record()] * 3
+        self.assertEqual(
+            compute_metrics(
+                records, [False] * 3, [False] * 3, [0, 5, 1 << 70]
+            ).compliance_violations,
+            2,
+        )
+        counter = MetricsCounter()
+        counter.update([False] * 3, [False] * 3, array("q", [3, 0, 0]))
+        counter.update([False] * 2, [False] * 2, iter([0, 2]))
+        self.assertEqual((counter.total_records, counter.compliance_violations), (5, 2))
+
+
+    def test_count_bits_of_lists_arrays_and_ndarrays(self):
+        masks = [0, 5, 1, 4, 5, 1 << 70]
+        self.assertEqual(count_bits(masks, 3), [3, 0, 3])
+        self.assertEqual(count_bits(array("q", masks[:5]), 3), [3, 0, 3])
+        self.assertEqual(count_bits(iter(masks), 71)[70], 1)
+        try:
+            import numpy as np
+        except ImportError:
+            return
+        self.assertEqual(count_bits(np.array(masks[:5], dtype=np.int64), 3), [3, 0, 3])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,19 @@
+import contextlib
 import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest import mock
 
-from nsms.model import AnomalyModel
-from nsms.preprocessing import FeatureVector
+from nsms import model as model_module
+from nsms import preprocessing
+from nsms.data import LogBatch, load_batch, load_logs
+from nsms.model import AnomalyModel, ModelTrainer
+from nsms.preprocessing import (
+    FeatureMatrix,
+    FeatureVector,
+    extract_feature_matrix,
+    extract_features,
+)
 
 
 class TestModel(unittest.TestCase):
@@ -16,6 +28,108 @@ class TestModel(unittest.TestCase):
         predictions = model.predict(features)
         self.assertEqual(len(predictions), 2)
 
+    def test_feature_matrix_matches_row_features(self):
+        row_features = extract_features(load_logs(Path("data/sample_logs.csv")))
+        batch = load_batch(Path("data/sample_logs.csv"))
+        for numpy_module in _numpy_variants():
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                reference = AnomalyModel.train(row_features, threshold=1.5)
+                matrix = extract_feature_matrix(batch)
+                self.assertIsInstance(matrix, FeatureMatrix)
+                self.assertEqual(list(matrix), row_features)
+                self.assertEqual(reference.predict(matrix), reference.predict(row_features))
+                # One training implementation: the container does not change a bit.
+                self.assertEqual(AnomalyModel.train(matrix, threshold=1.5).stats, reference.stats)
+                self.assertEqual(
+                    AnomalyModel.train(iter(row_features), threshold=1.5).stats, reference.stats
+                )
+
+    def test_feature_matrix_keeps_large_byte_counts_exact(self):
+        record = next(iter(load_logs(Path("data/sample_logs.csv"))))
+        batch = LogBatch.from_records([record, record])
+        batch.bytes_transferred[1] = 2**24 + 1
+        for numpy_module in _numpy_variants():
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                matrix = extract_feature_matrix(batch)
+                self.assertEqual(matrix[1].bytes_transferred, float(2**24 + 1))
+
+    def test_empty_feature_matrix_cannot_train(self):
+        with self.assertRaises(ValueError):
+            AnomalyModel.train(extract_feature_matrix(LogBatch()))
+
+    def test_trainer_chunks_and_merged_shards_match_one_shot_training(self):
+        batch = load_batch(Path("data/sample_logs.csv"))
+        for numpy_module in _numpy_variants():
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                matrix = extract_feature_matrix(batch)
+                reference = AnomalyModel.train(matrix, threshold=2.0)
+                chunked = ModelTrainer()
+                for start in range(0, len(batch), 97):
+                    chunked.update(extract_feature_matrix(batch.slice(start, start + 97)))
+                merged = ModelTrainer()
+                for start in range(0, len(batch), 400):
+                    merged.merge(
+                        ModelTrainer().update(
+                            extract_feature_matrix(batch.slice(start, start + 400))
+                        )
+                    )
+                for trainer in (chunked, merged):
+                    model = trainer.model(threshold=2.0)
+                    self.assertAlmostEqual(
+                        model.stats.mean_bytes, reference.stats.mean_bytes, places=6
+                    )
+                    self.assertAlmostEqual(
+                        model.stats.std_bytes, reference.stats.std_bytes, places=6
+                    )
+                    self.assertEqual(model.stats.mean_denied, reference.stats.mean_denied)
+                    self.assertEqual(model.stats.mean_sensitive, reference.stats.mean_sensitive)
+                    self.assertEqual(model.stats.mean_admin, reference.stats.mean_admin)
+                    self.assertEqual(model.predict(matrix), reference.predict(matrix))
+
+    def test_predict_batch_matches_scalar_path(self):
+        records = list(load_logs(Path("data/sample_logs.csv")))
+        edge = records[0]
+        extremes = [
+            replace(edge, bytes_transferred=10**9, status="OK", user="alice", resource="/tmp"),
+            replace(
+                edge, bytes_transferred=0, status="DENIED", user="admin1", resource="/sensitive/db"
+            ),
+            replace(
+                edge, bytes_transferred=2**24 + 3, status="DENIED", user="admin2", resource="/app"
+            ),
+        ]
+        batch = LogBatch.from_records(records + extremes)
+        for numpy_module in _numpy_variants():
+            with self.subTest(numpy=numpy_module is not None), _patched_numpy(numpy_module):
+                matrix = extract_feature_matrix(batch)
+                model = AnomalyModel.train(matrix.slice(0, len(records)), threshold=1.5)
+                mask, scores = model.predict_batch(matrix)
+                self.assertEqual(list(scores), [model.score(vector) for vector in matrix])
+                self.assertEqual(
+                    [bool(flag) for flag in mask], [model.is_anomalous(vector) for vector in matrix]
+                )
+                self.assertEqual(model.predict(matrix), [bool(flag) for flag in mask])
+                self.assertTrue(all(mask[-3:-1]))
+
+    def test_trainer_streams_feature_vectors(self):
+        features = extract_features(load_logs(Path("data/sample_logs.csv")))
+        reference = AnomalyModel.train(features)
+        model = ModelTrainer().update(iter(features)).model()
+        self.assertEqual(model.stats, reference.stats)
+        with self.assertRaises(ValueError):
+            ModelTrainer().model()
+
+
+def _numpy_variants():
+    return [None] if preprocessing.np is None else [preprocessing.np, None]
+
+
+def _patched_numpy(numpy_module):
+    stack = contextlib.ExitStack()
+    stack.enter_context(mock.patch.object(preprocessing, "np", numpy_module))
+    stack.enter_context(mock.patch.object(model_module, "np", numpy_module))
+    return stack
+
 
 if __name__ == "__main__":
     unittest.main()
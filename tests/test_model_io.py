@@ -1,9 +1,13 @@
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
 
-from nsms.model import AnomalyModel
+from nsms.data import load_batch
+from nsms.model import AnomalyModel, ModelTrainer
+from nsms.model_format import ModelFile
 from nsms.model_io import load_model, save_model
-from nsms.preprocessing import FeatureVector
+from nsms.preprocessing import FeatureVector, extract_feature_matrix
 
 
 class TestModelIO(unittest.TestCase):
@@ -16,5 +20,56 @@ class TestModelIO(unittest.TestCase):
         self.assertEqual(loaded.stats.mean_bytes, model.stats.mean_bytes)
 
 
+class TestBinaryModel(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.batch = load_batch(Path("data/sample_logs.csv"))
+        self.matrix = extract_feature_matrix(self.batch)
+        trainer = ModelTrainer(
+            ["user", "source_ip"], 5, threshold_quantile=0.99, seasonal_baselines="user"
+        )
+        self.model = trainer.update(self.matrix, self.batch).model(threshold=3.0)
+
+    def test_round_trip_maps_tables_lazily(self):
+        path = self.temp_dir / "model.nsmsmodel"
+        save_model(self.model, path)
+        loaded = load_model(path, verify=True)
+        table = loaded.entity_baselines.tables["user"]
+        self.assertIsInstance(table.keys, memoryview)
+        self.assertEqual(len(table), len(self.model.entity_baselines.tables["user"]))
+        self.assertEqual(
+            list(loaded.score_batch(self.matrix, self.batch)),
+            list(self.model.score_batch(self.matrix, self.batch)),
+        )
+        self.assertEqual(loaded.bytes_cutoff, self.model.bytes_cutoff)
+
+        # A loaded model can be saved again, in either format.
+        save_model(loaded, self.temp_dir / "copy.json")
+        self.assertEqual(load_model(self.temp_dir / "copy.json").stats, self.model.stats)
+
+    def test_checksums_catch_corruption(self):
+        path = self.temp_dir / "model.nsmsmodel"
+        save_model(self.model, path)
+        data = bytearray(path.read_bytes())
+        corrupt_section = bytearray(data)
+        corrupt_section[-70] ^= 0xFF
+        path.write_bytes(corrupt_section)
+        load_model(path)  # Sections are only checked on request.
+        with self.assertRaises(ValueError):
+            load_model(path, verify=True)
+        with self.assertRaises(ValueError):
+            ModelFile(path).verify()
+
+        corrupt_header = bytearray(data)
+        corrupt_header[20] ^= 0xFF
+        path.write_bytes(corrupt_header)
+        with self.assertRaises(ValueError):
+            load_model(path)
+        path.write_bytes(bytes(data[: len(data) // 2]))
+        with self.assertRaises(ValueError):
+            load_model(path)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from nsms.config import Config
+from nsms.follow import LogFollower
+from nsms.model import AnomalyModel, ModelStats
+from nsms.model_registry import ModelRegistry, ModelWatcher
+from nsms.monitoring import load_current_model, train_model
+
+
+def _model(threshold: float) -> AnomalyModel:
+    return AnomalyModel(ModelStats(1000.0, 500.0, 0.0, 0.0, 0.0), threshold=threshold)
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_publish_activate_and_watch(self):
+        registry = ModelRegistry(self.root / "registry")
+        self.assertIsNone(registry.current())
+        with self.assertRaises(FileNotFoundError):
+            registry.load()
+        self.assertEqual(registry.publish(_model(3.0)), 1)
+        watcher = ModelWatcher(registry, interval=3600)
+        self.assertEqual((watcher.version, watcher.model.threshold), (1, 3.0))
+        self.assertFalse(watcher.poll())
+
+        self.assertEqual(registry.publish(_model(1.0)), 2)
+        self.assertEqual((registry.versions(), registry.current()), ([1, 2], 2))
+        # No temporary files are left next to the published versions.
+        names = sorted(path.name for path in registry.versions_dir.iterdir())
+        self.assertEqual(names, ["000001.nsmsmodel", "000002.nsmsmodel"])
+        self.assertTrue(watcher.poll())
+        self.assertEqual((watcher.version, watcher.model.threshold), (2, 1.0))
+
+        registry.activate(1)
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.model.threshold, 3.0)
+        with self.assertRaises(FileNotFoundError):
+            registry.activate(7)
+
+        # A broken version is not swapped in; the watcher keeps the last good one.
+        registry.path(2).write_bytes(b"NSMSMDL1 truncated")
+        registry.activate(2)
+        self.assertFalse(watcher.poll())
+        self.assertEqual(watcher.version, 1)
+
+    def test_follow_swaps_models_between_batches(self):
+        header, *rows = (
+            Path("data/sample_logs.csv").read_text(encoding="utf-8").splitlines(keepends=True)
+        )
+        log_path = self.root / "live.csv"
+        log_path.write_text(header, encoding="utf-8")
+        base = Config.load()
+        config = base.from_mapping(
+            {
+                **base.__dict__,
+                "model_path": str(self.root / "model.json"),
+                "output_dir": str(self.root / "out"),
+                "model_registry": str(self.root / "registry"),
+                "model_reload_seconds": 3600,
+            }
+        )
+        train_model(config)
+        registry = ModelRegistry(config.model_registry)
+        self.assertEqual(registry.current(), 1)
+        self.assertEqual(load_current_model(config).stats, registry.load(1).stats)
+
+        follower = LogFollower(config.from_mapping({**config.__dict__, "data_path": str(log_path)}))
+        try:
+            with log_path.open("a", encoding="utf-8") as handle:
+                handle.write("".join(rows[:100]))
+            follower.poll()
+            # Every row scores at least -2 standard deviations, so this flags all.
+            registry.publish(_model(-2.0))
+            self.assertTrue(follower.watcher.poll())
+            with log_path.open("a", encoding="utf-8") as handle:
+                handle.write("".join(rows[100:200]))
+            follower.poll()
+        finally:
+            follower.close()
+        alerts = [json.loads(line) for line in (config.output_dir / "alerts.jsonl").open()]
+        self.assertEqual(len(alerts), 200)
+        self.assertLess(sum(alert["anomaly"] for alert in alerts[:100]), 100)
+        self.assertTrue(all(alert["anomaly"] for alert in alerts[100:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import shutil
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from nsms.config import Config
+from nsms.data import iter_batches, load_batch, load_logs
+from nsms.monitoring import run_pipeline, train_model
+from nsms.partitions import partition_files, partition_log_file, write_partitioned_logs
+
+
+class TestPartitions(unittest.TestCase):
+    def setUp(self):
+        self.csv_path = Path("data/sample_logs.csv")
+        self.root = Path("outputs") / "partitions"
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.rows = partition_log_file(self.csv_path, self.root)
+
+    def test_layout_and_full_read(self):
+        self.assertEqual(self.rows, 1200)
+        files = partition_files(self.root)
+        self.assertEqual(files[0], self.root / "dt=2024-01-01" / "hour=00" / "part-00000.csv")
+        self.assertEqual(len(files), 21)
+        self.assertEqual(load_logs(self.root), load_logs(self.csv_path))
+
+        written = write_partitioned_logs(self.root, load_logs(self.csv_path)[:3])
+        self.assertEqual([path.name for path in written], ["part-00001.csv"])
+
+    def test_window_prunes_partitions_and_rows(self):
+        start, end = datetime(2024, 1, 1, 5, 30), datetime(2024, 1, 1, 8)
+        files = partition_files(self.root, start, end)
+        self.assertEqual([path.parent.name for path in files], ["hour=05", "hour=06", "hour=07"])
+
+        expected = [
+            record for record in load_logs(self.csv_path) if start <= record.timestamp < end
+        ]
+        self.assertTrue(expected)
+        self.assertEqual(list(load_batch(self.root, start=start, end=end).records()), expected)
+        self.assertEqual(load_logs(self.csv_path, start=start, end=end), expected)
+        streamed = [
+            record
+            for batch in iter_batches(self.root, 7, start=start, end=end)
+            for record in batch.records()
+        ]
+        self.assertEqual(streamed, expected)
+        self.assertEqual(len(load_batch(self.root, start=datetime(2030, 1, 1))), 0)
+
+        base = Config.load()
+        temp_dir = Path("outputs") / "partitions-run"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        config = base.from_mapping(
+            {
+                **base.__dict__,
+                "data_path": str(self.root),
+                "output_dir": str(temp_dir),
+                "model_path": str(temp_dir / "model.json"),
+                "window_start": start.isoformat(),
+                "window_end": end.isoformat(),
+            }
+        )
+        run_pipeline(config, model=train_model(config))
+        metrics = json.loads((temp_dir / "metrics.json").read_text())
+        self.assertEqual(metrics["total_records"], len(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
+import json
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
 
 from nsms.config import Config
-from nsms.monitoring import run_pipeline, train_model
+from nsms.monitoring import run_pipeline, run_pipeline_streaming, train_model, train_model_streaming
 
 
 class TestPipeline(unittest.TestCase):
@@ -22,6 +25,74 @@ class TestPipeline(unittest.TestCase):
         self.assertTrue((output_dir / "alerts.jsonl").exists())
         self.assertTrue((output_dir / "metrics.json").exists())
 
+    def test_streaming_pipeline_matches_batch_outputs(self):
+        base = Config.load()
+        outputs = {}
+        for mode in ("batch", "stream"):
+            temp_dir = Path("outputs") / f"test-{mode}"
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            config = base.from_mapping(
+                {
+                    **base.__dict__,
+                    "output_dir": str(temp_dir),
+                    "model_path": str(temp_dir / "model.json"),
+                }
+            )
+            model = train_model(config)
+            if mode == "batch":
+                outputs[mode] = run_pipeline(config, model=model)
+            else:
+                outputs[mode] = run_pipeline_streaming(config, model=model, chunk_size=7)
+
+        for name in ("alerts.jsonl", "metrics.json", "run_summary.json", "summary.md"):
+            self.assertEqual(
+                (outputs["batch"] / name).read_bytes(), (outputs["stream"] / name).read_bytes()
+            )
+        incidents = {
+            mode: [_without_created_at(line) for line in (path / "incidents.jsonl").open()]
+            for mode, path in outputs.items()
+        }
+        self.assertEqual(incidents["batch"], incidents["stream"])
+
+    def test_streaming_training_matches_in_memory_training(self):
+        base = Config.load()
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        lines = Path("data/sample_logs.csv").read_text(encoding="utf-8").splitlines()
+        shard_dir = temp_dir / "logs"
+        shard_dir.mkdir()
+        for number, start in enumerate(range(1, len(lines), 300)):
+            (shard_dir / f"part-{number}.csv").write_text(
+                "\n".join([lines[0]] + lines[start : start + 300]) + "\n"
+            )
+
+        def config(**overrides):
+            return base.from_mapping(
+                {
+                    **base.__dict__,
+                    "model_path": str(temp_dir / "model.json"),
+                    "feature_cache_dir": None,
+                    **overrides,
+                }
+            )
+
+        reference = train_model(config()).stats
+        for workers, data_path in ((1, base.data_path), (1, shard_dir), (2, shard_dir)):
+            with self.subTest(workers=workers, data_path=str(data_path)):
+                stats = train_model_streaming(
+                    config(workers=workers, data_path=str(data_path)), chunk_size=64
+                ).stats
+                self.assertAlmostEqual(stats.mean_bytes, reference.mean_bytes, places=6)
+                self.assertAlmostEqual(stats.std_bytes, reference.std_bytes, places=6)
+                self.assertEqual(stats.mean_denied, reference.mean_denied)
+                self.assertEqual(stats.mean_admin, reference.mean_admin)
+
+
+def _without_created_at(line: str) -> dict:
+    payload = json.loads(line)
+    payload.pop("created_at")
+    return payload
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from nsms.config import Config
+from nsms.data import INTERNED_COLUMNS, SYMBOLS, load_batch
+from nsms.follow import STATUS_NAME, LogFollower
+from nsms.model import AnomalyModel, ModelStats
+from nsms.reference_data import ReferenceData, ReferenceWatcher
+
+
+class TestReferenceWatcher(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        self.rules_path = self.root / "rules.json"
+        self.intel_path = self.root / "intel.json"
+        shutil.copy("data/compliance_rules.json", self.rules_path)
+        shutil.copy("data/threat_intel.json", self.intel_path)
+        base = Config.load()
+        self.config = base.from_mapping(
+            {
+                **base.__dict__,
+                "compliance_rules_path": str(self.rules_path),
+                "threat_intel_path": str(self.intel_path),
+                "output_dir": str(self.root / "out"),
+                "reference_reload_seconds": 3600,
+            }
+        )
+
+    def add_indicator(self, ip_address):
+        payload = json.loads(self.intel_path.read_text())
+        payload["indicators"].append(
+            {"ip_address": ip_address, "severity": "high", "description": "test"}
+        )
+        self.intel_path.write_text(json.dumps(payload))
+
+    def test_reloads_changed_files_and_keeps_the_last_good_version(self):
+        watcher = ReferenceWatcher(self.config, interval=3600)
+        first = watcher.data
+        self.assertEqual(first.version, ReferenceData.load(self.config).version)
+        self.assertFalse(watcher.poll())
+        self.assertIsNone(first.threat_store.check_ip("192.0.2.1"))
+
+        self.add_indicator("192.0.2.1")
+        self.assertTrue(watcher.poll())
+        second = watcher.data
+        self.assertNotEqual(second.version, first.version)
+        self.assertIsNotNone(second.threat_store.check_ip("192.0.2.1"))
+        self.assertEqual(watcher.reloads, 1)
+        self.assertEqual(watcher.summary()["recent_reloads"][0]["version"], second.version)
+
+        # Touching a file without changing it keeps the compiled version.
+        os.utime(self.rules_path, ns=(1, 1))
+        self.assertFalse(watcher.poll())
+        self.assertIs(watcher.data, second)
+
+        self.rules_path.write_text(
+            '{"rules": [{"rule_id": "BAD", "description": "", "condition": "bytes >"}]}'
+        )
+        with self.assertLogs("nsms.reference_data", "WARNING"):
+            self.assertFalse(watcher.poll())
+        self.assertIs(watcher.data, second)
+
+        shutil.copy("data/compliance_rules.json", self.rules_path)
+        self.assertFalse(watcher.poll())
+        self.assertIs(watcher.data, second)
+        self.rules_path.write_text(self.rules_path.read_text().replace("ROOT_LOGIN", "WRITE"))
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.reloads, 2)
+
+    def test_reloads_keep_fact_memos_bounded(self):
+        watcher = ReferenceWatcher(self.config, interval=3600)
+        batch = load_batch(Path("data/sample_logs.csv"))
+        vocabularies = [SYMBOLS.vocabulary(name) for name in INTERNED_COLUMNS]
+        sizes = None
+        for reload in range(5):
+            checker = watcher.data.compliance_checker
+            checker.violation_masks(batch)
+            checker.violation_masks(batch)
+            current = (
+                [len(vocabulary._facts) for vocabulary in vocabularies],
+                len(checker._facts),
+                len(checker.program._facts),
+            )
+            sizes = sizes or current
+            self.assertEqual(current, sizes)
+            self.add_indicator(f"192.0.2.{reload + 1}")
+            self.assertTrue(watcher.poll())
+
+    def test_follow_swaps_reference_data_between_batches(self):
+        header, *rows = (
+            Path("data/sample_logs.csv").read_text(encoding="utf-8").splitlines(keepends=True)
+        )
+        log_path = self.root / "live.csv"
+        log_path.write_text(header, encoding="utf-8")
+        config = self.config.from_mapping({**self.config.__dict__, "data_path": str(log_path)})
+        model = AnomalyModel(ModelStats(1000.0, 500.0, 0.0, 0.0, 0.0), threshold=3.0)
+        # Pick a source address of the second batch that is not yet an indicator.
+        first_version = ReferenceData.load(config)
+        target = next(
+            row.split(",")[1]
+            for row in rows[100:200]
+            if first_version.threat_store.check_ip(row.split(",")[1]) is None
+        )
+
+        follower = LogFollower(config, model)
+        try:
+            with log_path.open("a", encoding="utf-8") as handle:
+                handle.write("".join(rows[:100]))
+            follower.poll()
+            self.add_indicator(target)
+            self.assertTrue(follower.references.poll())
+            with log_path.open("a", encoding="utf-8") as handle:
+                handle.write("".join(rows[100:200]))
+            follower.poll()
+        finally:
+            follower.close()
+
+        alerts = [json.loads(line) for line in (config.output_dir / "alerts.jsonl").open()]
+        hits = [alert for alert in alerts if alert["source_ip"] == target]
+        self.assertTrue(hits)
+        self.assertTrue(
+            all(alert["threat_intel_hit"] == (alert["record_index"] >= 100) for alert in hits)
+        )
+
+        status = json.loads((config.output_dir / STATUS_NAME).read_text())["reference_data"]
+        second_version = follower.references.data.version
+        self.assertEqual((status["version"], status["reloads"]), (second_version, 1))
+        self.assertEqual(sorted(status["hits"]), sorted([first_version.version, second_version]))
+        self.assertEqual([counts["records"] for counts in status["hits"].values()], [100, 100])
+        self.assertEqual(
+            sum(counts["threat_intel_hits"] for counts in status["hits"].values()),
+            sum(alert["threat_intel_hit"] for alert in alerts),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nsms import rule_expressions
+from nsms.compliance import ComplianceChecker, ComplianceRule
+from nsms.data import load_batch
+from nsms.rule_expressions import RuleProgram
+
+
+CONDITIONS = [
+    "bytes > 1e9 and region != 'us-east-1' and user startswith 'svc-'",
+    "bytes > 2000 and region != 'us-east-1'",
+    "not protocol in ['HTTPS', 'SSH'] or (user contains 'admin' and region != 'us-east-1')",
+    "status == 'DENIED' and bytes not in [540, 1200]",
+    "(resource endswith '/export' or action == 'DELETE') and bytes >= 500",
+]
+
+
+def _variants():
+    return [None] if rule_expressions.np is None else [rule_expressions.np, None]
+
+
+class TestRuleProgram(unittest.TestCase):
+    def test_batch_and_record_masks_match_python_semantics(self):
+        batch = load_batch(Path("data/sample_logs.csv"))
+        records = list(batch.records())
+        expected = [
+            sum(
+                1 << bit
+                for bit, hit in enumerate(
+                    [
+                        r.bytes_transferred > 1e9
+                        and r.region != "us-east-1"
+                        and r.user.startswith("svc-"),
+                        r.bytes_transferred > 2000 and r.region != "us-east-1",
+                        r.protocol not in ("HTTPS", "SSH")
+                        or ("admin" in r.user and r.region != "us-east-1"),
+                        r.status == "DENIED" and r.bytes_transferred not in (540, 1200),
+                        (r.resource.endswith("/export") or r.action == "DELETE")
+                        and r.bytes_transferred >= 500,
+                    ]
+                )
+                if hit
+            )
+            for r in records
+        ]
+        program = RuleProgram(CONDITIONS)
+        self.assertEqual([program.record_mask(record) for record in records], expected)
+        for numpy_module in _variants():
+            for int64 in (True, False):
+                with self.subTest(numpy=numpy_module is not None, int64=int64), mock.patch.object(
+                    rule_expressions, "np", numpy_module
+                ):
+                    self.assertEqual(list(program.batch_masks(batch, int64)), expected)
+
+    def test_subexpressions_are_shared_across_conditions(self):
+        program = RuleProgram(
+            [
+                "bytes > 100 and region != 'us-east-1'",
+                "region != 'us-east-1' and bytes > 100",
+                "(bytes > 100 and region != 'us-east-1') or user == 'root'",
+            ],
+            bits=[4, 0, 9],
+        )
+        # bytes > 100, region != ..., their conjunction, user == 'root', the disjunction.
+        self.assertEqual(len(program), 5)
+        self.assertEqual(program.roots[0], program.roots[1])
+
+    def test_invalid_conditions_raise_value_error(self):
+        for text in [
+            "",
+            "bytes > 'big'",
+            "user > 'a'",
+            "hostname == 'a'",
+            "user ==",
+            "(user == 'a'",
+            "user in 'a'",
+            "bytes in ['a']",
+            "user == 'a' xor user == 'b'",
+            "user == 'a' ; import os",
+        ]:
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                RuleProgram([text])
+
+
+class TestConditionRules(unittest.TestCase):
+    def test_condition_rules_combine_with_list_rules(self):
+        rules = ComplianceChecker.load(Path("data/compliance_rules.json")).rules
+        self.assertEqual(rules[-1].condition, CONDITIONS[0])
+        rules = rules + [
+            ComplianceRule.from_mapping(
+                {"rule_id": "X-1", "description": "", "condition": CONDITIONS[1]}
+            ),
+            ComplianceRule.from_mapping(
+                {"rule_id": "X-2", "description": "", "condition": CONDITIONS[3]}
+            ),
+        ]
+        checker = ComplianceChecker(rules)
+        batch = load_batch(Path("data/sample_logs.csv"))
+        per_record = [checker.evaluate(record) for record in batch.records()]
+        self.assertEqual(
+            [list(checker.rule_ids(mask)) for mask in checker.violation_masks(batch)], per_record
+        )
+        list_only = ComplianceChecker(rules[:2])
+        for record, violations in zip(batch.records(), per_record):
+            extra = [
+                rule_id
+                for rule_id, hit in [
+                    ("X-1", record.bytes_transferred > 2000 and record.region != "us-east-1"),
+                    (
+                        "X-2",
+                        record.status == "DENIED" and record.bytes_transferred not in (540, 1200),
+                    ),
+                ]
+                if hit
+            ]
+            self.assertEqual(violations, list_only.evaluate(record) + extra)
+
+    def test_condition_cannot_be_mixed_with_lists(self):
+        with self.assertRaises(ValueError):
+            ComplianceRule.from_mapping(
+                {
+                    "rule_id": "X",
+                    "description": "",
+                    "condition": "bytes > 1",
+                    "allowed_regions": ["us-east-1"],
+                }
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from statistics import fmean
+from unittest import mock
+
+from nsms import sampling
+from nsms.config import Config
+from nsms.data import LogBatch, LogRecord
+from nsms.model_io import load_model
+from nsms.monitoring import compare_sampled_model, sample_logs, train_model, train_on_sample
+from nsms.sampling import ReservoirSampler
+
+
+START = datetime(2024, 1, 1)
+
+
+def _batch(start: int, stop: int) -> LogBatch:
+    return LogBatch.from_records(
+        LogRecord(
+            timestamp=START + timedelta(seconds=idx),
+            source_ip=f"10.0.0.{idx % 200}",
+            destination_ip="10.0.0.1",
+            protocol="TELNET" if idx % 2000 == 0 else "HTTPS",
+            bytes_transferred=idx,
+            action="READ",
+            region="us-east-1",
+            user=f"user{idx % 10}",
+            resource="/app/service/1",
+            status="OK",
+        )
+        for idx in range(start, stop)
+    )
+
+
+def _variants():
+    return [None] if sampling.np is None else [sampling.np, None]
+
+
+class TestReservoirSampler(unittest.TestCase):
+    def test_uniform_sample_has_fixed_size_and_covers_the_stream(self):
+        for numpy_module in _variants():
+            with self.subTest(numpy=numpy_module is not None), mock.patch.object(
+                sampling, "np", numpy_module
+            ):
+                sampler = ReservoirSampler(500, seed=1)
+                for start in range(0, 20_000, 1000):
+                    sampler.update(_batch(start, start + 1000))
+                sample = sampler.sample()
+                self.assertEqual((len(sample), sampler.seen), (500, 20_000))
+                values = list(sample.bytes_transferred)
+                self.assertEqual(values, sorted(set(values)))
+                # The mean of 500 uniform draws from 0..19999 is within about
+                # 260 of 10,000 (one standard error); allow four.
+                self.assertLess(abs(fmean(values) - 10_000), 1100)
+                self.assertTrue(any(value < 2000 for value in values))
+
+    def test_merged_shards_keep_the_smallest_priorities(self):
+        first = ReservoirSampler(300, seed=1).update(_batch(0, 5000))
+        second = ReservoirSampler(300, seed=2).update(_batch(5000, 10_000))
+        union = set(first.sample().bytes_transferred) | set(second.sample().bytes_transferred)
+        merged = first.merge(second).sample()
+        self.assertEqual(len(merged), 300)
+        self.assertTrue(set(merged.bytes_transferred) <= union)
+        self.assertEqual(first.seen, 10_000)
+        with self.assertRaises(ValueError):
+            first.merge(ReservoirSampler(300, "user"))
+
+    def test_stratified_sample_keeps_rare_strata(self):
+        for numpy_module in _variants():
+            with self.subTest(numpy=numpy_module is not None), mock.patch.object(
+                sampling, "np", numpy_module
+            ):
+                sampler = ReservoirSampler(100, "protocol", seed=3)
+                for start in range(0, 10_000, 700):
+                    sampler.update(_batch(start, min(start + 700, 10_000)))
+                sample = sampler.sample()
+                protocols = sample.protocol.values
+                counts = {}
+                for code in sample.protocol.codes:
+                    counts[protocols[code]] = counts.get(protocols[code], 0) + 1
+                # Five TELNET rows in 10,000: a uniform sample of 100 would
+                # usually miss them all.
+                self.assertEqual(counts, {"TELNET": 5, "HTTPS": 50})
+                self.assertEqual(dict(sampler.strata), {"TELNET": 5, "HTTPS": 9995})
+
+    def test_rejects_unknown_strata(self):
+        with self.assertRaises(ValueError):
+            ReservoirSampler(10, "region")
+        with self.assertRaises(ValueError):
+            ReservoirSampler(0)
+
+
+class TestSampledTraining(unittest.TestCase):
+    def test_train_model_with_sample_size_and_report(self):
+        base = Config.load()
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        config = base.from_mapping(
+            {
+                **base.__dict__,
+                "output_dir": str(temp_dir / "out"),
+                "model_path": str(temp_dir / "model.json"),
+                "sample_size": 400,
+                "sample_stratify": "status",
+                "chunk_size": 250,
+            }
+        )
+        model = train_model(config)
+        self.assertEqual(load_model(config.model_path).stats, model.stats)
+
+        sampler = sample_logs(config)
+        report = compare_sampled_model(config, train_on_sample(config, sampler), sampler)
+        payload = json.loads((config.output_dir / "sampling_report.json").read_text())
+        self.assertEqual(payload, report.as_dict())
+        self.assertEqual(payload["predictions"]["rows"], payload["total_rows"])
+        self.assertLessEqual(payload["sample_rows"], 400)
+        self.assertEqual(set(payload["strata"]), {"OK", "DENIED"})
+        self.assertGreaterEqual(payload["predictions"]["agreement"], 0.9)
+
+        windowed = config.from_mapping({**config.__dict__, "feature_windows": [60]})
+        with self.assertRaises(ValueError):
+            train_model(windowed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import random
+import shutil
+import tempfile
+import unittest
+from array import array
+from pathlib import Path
+
+from nsms import sketches
+from nsms.data import LogBatch, load_batch
+from nsms.model import ModelTrainer
+from nsms.model_io import load_model, save_model
+from nsms.preprocessing import extract_feature_matrix
+from nsms.sketches import QuantileSketch
+
+
+def _heavy_tailed(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    return [0] * 50 + [int(rng.lognormvariate(8, 2.5)) for _ in range(count)]
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantiles_are_within_relative_accuracy(self):
+        values = _heavy_tailed(50_000)
+        ordered = sorted(values)
+        sketch = QuantileSketch(0.01)
+        sketch.update(array("d", values), is_ndarray=False)
+        self.assertEqual(sketch.count, len(values))
+        self.assertEqual(sketch.quantile(0.0), 0.0)
+        for q in (0.5, 0.9, 0.99, 0.999):
+            exact = ordered[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.01 * exact, q)
+        self.assertLess(len(sketch.buckets), 2000)
+
+    def test_merged_shards_equal_single_pass(self):
+        values = _heavy_tailed(20_000)
+        whole = QuantileSketch()
+        for value in values:
+            whole.add(value)
+        merged = QuantileSketch()
+        for start in range(0, len(values), 3000):
+            shard = QuantileSketch()
+            shard.update(array("d", values[start : start + 3000]), is_ndarray=False)
+            merged.merge(shard)
+        self.assertEqual(merged.as_dict(), whole.as_dict())
+        if sketches.np is not None:
+            vectorized = QuantileSketch()
+            vectorized.update(
+                sketches.np.asarray(values, dtype=sketches.np.float32), is_ndarray=True
+            )
+            self.assertAlmostEqual(
+                vectorized.quantile(0.999),
+                whole.quantile(0.999),
+                delta=0.03 * whole.quantile(0.999),
+            )
+        with self.assertRaises(ValueError):
+            merged.merge(QuantileSketch(0.05))
+
+    def test_quantile_threshold_model(self):
+        template = load_batch(Path("data/sample_logs.csv")).slice(0, 1)
+        batch = LogBatch()
+        values = _heavy_tailed(20_000)
+        for _ in values:
+            batch.extend_batch(template)
+        batch.bytes_transferred = array("q", values)
+        matrix = extract_feature_matrix(batch)
+
+        trainer = ModelTrainer(threshold_quantile=0.999)
+        for start in range(0, len(batch), 4096):
+            trainer.update(matrix.slice(start, start + 4096))
+        model = trainer.model(threshold=3.0)
+        cutoff = sorted(values)[int(0.999 * (len(values) - 1))]
+        self.assertLessEqual(abs(model.bytes_cutoff - cutoff), 0.01 * cutoff)
+
+        # The template row carries no penalty flags, so exactly the rows at
+        # or above the cutoff are flagged.
+        self.assertEqual(
+            (matrix[0].is_denied, matrix[0].is_sensitive_resource, matrix[0].is_admin_user),
+            (0, 0, 0),
+        )
+        mask, _ = model.predict_batch(matrix)
+        self.assertEqual(
+            [bool(flag) for flag in mask], [value >= model.bytes_cutoff for value in values]
+        )
+        self.assertTrue(5 <= sum(value >= model.bytes_cutoff for value in values) <= 60)
+
+        path = Path(tempfile.mkdtemp()) / "model.json"
+        self.addCleanup(shutil.rmtree, path.parent)
+        save_model(model, path)
+        loaded = load_model(path)
+        self.assertEqual(loaded.bytes_cutoff, model.bytes_cutoff)
+        self.assertEqual(loaded.predict(matrix), model.predict(matrix))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from nsms.config import Config
+from nsms.data import LogBatch, LogRecord
+from nsms.model import AnomalyModel
+from nsms.model_io import load_model, save_model
+from nsms.monitoring import run_pipeline, run_pipeline_streaming, train_model
+from nsms.preprocessing import WindowedFeatureEngine, extract_feature_matrix, window_feature_names
+
+
+START = datetime(2024, 1, 1)
+
+
+def _record(
+    seconds: int, source_ip: str = "203.0.113.1", nbytes: int = 100, status: str = "OK"
+) -> LogRecord:
+    return LogRecord(
+        timestamp=START + timedelta(seconds=seconds),
+        source_ip=source_ip,
+        destination_ip="10.0.0.1",
+        protocol="HTTPS",
+        bytes_transferred=nbytes,
+        action="READ",
+        region="us-east-1",
+        user="user1",
+        resource="/app/service/1",
+        status=status,
+    )
+
+
+class TestWindowedFeatureEngine(unittest.TestCase):
+    def test_window_counts_bytes_and_deny_rate(self):
+        engine = WindowedFeatureEngine([60], buckets=6)
+        batch = LogBatch.from_records(
+            [
+                _record(0),
+                _record(10, status="DENIED"),
+                _record(20, source_ip="203.0.113.9"),
+                _record(65),
+                _record(200),
+            ]
+        )
+        columns = engine.update(batch)
+        self.assertEqual(list(columns["source_ip_count_60s"]), [1, 2, 1, 2, 1])
+        self.assertEqual(list(columns["source_ip_bytes_60s"]), [100, 200, 100, 200, 100])
+        self.assertEqual(list(columns["source_ip_deny_rate_60s"]), [0.0, 0.5, 0.0, 0.5, 0.0])
+        # Per-user windows see every row, since all rows share one user.
+        self.assertEqual(list(columns["user_count_60s"]), [1, 2, 3, 3, 1])
+
+    def test_late_rows(self):
+        engine = WindowedFeatureEngine([60], buckets=6)
+        columns = engine.update(
+            LogBatch.from_records([_record(100), _record(95), _record(30), _record(101)])
+        )
+        # 95s falls inside the window and counts; 30s is already outside it.
+        self.assertEqual(list(columns["source_ip_count_60s"]), [1, 2, 2, 3])
+
+    def test_state_carries_across_batches_and_round_trips(self):
+        records = [_record(seconds, nbytes=seconds + 1) for seconds in range(0, 600, 7)]
+        whole = WindowedFeatureEngine([60, 300]).update(LogBatch.from_records(records))
+
+        engine = WindowedFeatureEngine([60, 300])
+        first = engine.update(LogBatch.from_records(records[:40]))
+        restored = WindowedFeatureEngine.from_dict(json.loads(json.dumps(engine.as_dict())))
+        second = restored.update(LogBatch.from_records(records[40:]))
+        for name in window_feature_names([60, 300]):
+            self.assertEqual(list(first[name]) + list(second[name]), list(whole[name]))
+
+    def test_idle_entities_are_evicted(self):
+        engine = WindowedFeatureEngine([60])
+        engine.update(
+            LogBatch.from_records([_record(0, source_ip=f"198.51.100.{idx}") for idx in range(50)])
+        )
+        self.assertEqual(engine.tracked_entities, 51)
+        engine.update(LogBatch.from_records([_record(3600)]))
+        self.assertEqual(engine.tracked_entities, 2)
+        self.assertEqual(engine.evicted, 50)
+
+    def test_model_flags_many_small_transfers_from_one_source(self):
+        normal = [_record(idx * 60, source_ip=f"198.51.100.{idx % 40}") for idx in range(400)]
+        model = AnomalyModel.train(
+            extract_feature_matrix(LogBatch.from_records(normal), WindowedFeatureEngine([300])),
+            threshold=3.0,
+        )
+        self.assertEqual(model.feature_windows, [300])
+
+        burst = [_record(24000 + idx, source_ip="203.0.113.66") for idx in range(30)]
+        matrix = extract_feature_matrix(LogBatch.from_records(burst), WindowedFeatureEngine([300]))
+        flags = model.predict(matrix)
+        self.assertFalse(flags[0])
+        self.assertTrue(flags[-1])
+        with self.assertRaises(ValueError):
+            model.predict(extract_feature_matrix(LogBatch.from_records(burst)))
+
+        path = Path(tempfile.mkdtemp()) / "model.json"
+        self.addCleanup(shutil.rmtree, path.parent)
+        save_model(model, path)
+        self.assertEqual(load_model(path).window_stats, model.window_stats)
+
+
+class TestWindowedPipeline(unittest.TestCase):
+    def test_streaming_matches_batch_with_windowed_model(self):
+        base = Config.load()
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        outputs = {}
+        for mode in ("batch", "stream"):
+            config = base.from_mapping(
+                {
+                    **base.__dict__,
+                    "output_dir": str(temp_dir / mode),
+                    "model_path": str(temp_dir / "model.json"),
+                    "feature_cache_dir": None,
+                    "feature_windows": [300, 3600],
+                }
+            )
+            model = train_model(config)
+            if mode == "batch":
+                outputs[mode] = run_pipeline(config, model=model)
+            else:
+                outputs[mode] = run_pipeline_streaming(config, model=model, chunk_size=7)
+        self.assertEqual(
+            (outputs["batch"] / "alerts.jsonl").read_bytes(),
+            (outputs["stream"] / "alerts.jsonl").read_bytes(),
+        )
+        self.assertEqual(load_model(temp_dir / "model.json").feature_windows, [300, 3600])
+
+
+if __name__ == "__main__":
+    unittest.main()
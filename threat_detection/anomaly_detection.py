@@ -5,17 +5,17 @@ from __future__ import annotations
 from pathlib import Path
 
 from nsms.model_io import load_model
-from nsms.preprocessing import extract_features
-from nsms.data import load_logs
+from nsms.feature_registry import FeatureExtractor
+from nsms.data import load_batch
 
 
 def detect_anomalies(log_path: str, model_path: str) -> list[bool]:
     """Load logs and detect anomalies using the saved model."""
 
     model = load_model(Path(model_path))
-    records = load_logs(Path(log_path))
-    features = extract_features(records)
-    return model.predict(features)
+    batch = load_batch(Path(log_path))
+    features = FeatureExtractor(model.required_features).extract(batch)
+    return model.predict(features, batch)
 
 
 if __name__ == "__main__":
@@ -23,7 +23,7 @@ if __name__ == "__main__":
 
     config = Config.load()
     model = load_model(config.model_path)
-    records = load_logs(config.data_path)
-    features = extract_features(records)
-    results = model.predict(features)
+    batch = load_batch(config.data_path, start=config.window_start, end=config.window_end)
+    features = FeatureExtractor(model.required_features).extract(batch)
+    results = model.predict(features, batch)
     print(f"Detected {sum(1 for flag in results if flag)} anomalies")